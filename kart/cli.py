@@ -3,6 +3,7 @@ import importlib
 import importlib.util
 import inspect
 import logging
+import multiprocessing
 import os
 import pathlib
 import re
@@ -245,14 +246,29 @@ def push(ctx, do_progress, args):
 @click.argument("args", nargs=-1, type=click.UNPROCESSED)
 def fetch(ctx, do_progress, args):
     """Download objects and refs from another repository"""
-    ctx.invoke(
-        git,
-        args=[
-            "fetch",
-            "--progress" if do_progress else "--quiet",
-            *args,
-        ],
-    )
+    from .exceptions import NotFound
+    from .repo import KartRepoState
+    from .spatial_filter.index import update_spatial_filter_index_after_fetch
+
+    fetch_args = ["fetch", "--progress" if do_progress else "--quiet", *args]
+    try:
+        repo = ctx.obj.get_repo(
+            allow_unsupported_versions=True,
+            allowed_states=KartRepoState.ALL_STATES,
+        )
+    except NotFound:
+        repo = None
+
+    if repo is None or repo.spatial_filter.match_all:
+        ctx.invoke(git, args=fetch_args)
+        return
+
+    # With a spatial filter active, the newly fetched commits are added to the spatial filter index.
+    # So git can't replace this process.
+    p = subprocess.run(["git", "-C", repo.path, *fetch_args], env=tool_environment())
+    if p.returncode:
+        sys.exit(p.returncode)
+    update_spatial_filter_index_after_fetch(repo)
 
 
 @cli.command(context_settings=dict(ignore_unknown_options=True))
@@ -411,6 +427,8 @@ def load_commands_from_args(args, skip_first_arg=True):
 
 
 def entrypoint():
+    # Some commands (eg import) use worker processes - which need this when Kart is frozen by PyInstaller.
+    multiprocessing.freeze_support()
     load_commands_from_args(sys.argv)
     cli()
 
@@ -1,9 +1,19 @@
+import collections
+import io
+import itertools
+import json
 import logging
 import math
+import multiprocessing
+import os
+import queue
 import subprocess
+import threading
 import time
 import uuid
-from contextlib import ExitStack, contextmanager
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager, nullcontext
 from enum import Enum, auto
 
 import click
@@ -12,16 +22,19 @@ import pygit2
 from .cli_util import tool_environment
 from .exceptions import NO_CHANGES, InvalidOperation, NotFound, SubprocessError
 from .object_builder import ObjectBuilder
+from .output_util import dump_json_output
+from .pack_util import PackfileWriter
 from kart.tabular.version import (
     SUPPORTED_VERSIONS,
     dataset_class_for_version,
     extra_blobs_for_version,
 )
-from .structure import Datasets
 from .tabular.import_source import TableImportSource
 from .tabular.pk_generation import PkGeneratingTableImportSource
+from .schema import Schema
+from .serialise_util import hexhash
 from .timestamps import minutes_to_tz_offset
-from .utils import get_num_available_cores
+from .utils import chunk, get_num_available_cores, submit_with_bounded_in_flight
 
 L = logging.getLogger("kart.fast_import")
 
@@ -38,12 +51,60 @@ class FastImportSettings:
     If not set, reasonable defaults are used.
     """
 
-    def __init__(self, *, num_processes=None, max_pack_size=None, max_delta_depth=None):
+    # Number of features sent to an encoding worker at a time.
+    DEFAULT_ENCODING_BATCH_SIZE = 2000
+    # Sources with fewer features than this are encoded by the main process, since each worker process has to
+    # start up and open the repo before it can encode anything, which isn't worth it for only a few features.
+    DEFAULT_ENCODING_POOL_MIN_FEATURES = 20000
+    # Number of import sources that are read from at once.
+    DEFAULT_NUM_CONCURRENT_SOURCES = 4
+
+    def __init__(
+        self,
+        *,
+        num_processes=None,
+        max_pack_size=None,
+        max_delta_depth=None,
+        encoding_batch_size=None,
+        encoding_pool_min_features=None,
+        checkpoint_interval=None,
+        num_concurrent_sources=None,
+        backend=None,
+    ):
         self.num_processes = num_processes or get_default_num_processes()
         # Maximum size of pack files
         self.max_pack_size = max_pack_size or "2G"
         # Maximum depth of delta-compression chains
         self.max_delta_depth = max_delta_depth or 0
+        # Features are encoded in batches of this size by a pool of num_processes worker processes.
+        self.encoding_batch_size = (
+            encoding_batch_size or self.DEFAULT_ENCODING_BATCH_SIZE
+        )
+        # Sources with fewer features than this aren't encoded by a pool of worker processes.
+        self.encoding_pool_min_features = (
+            encoding_pool_min_features
+            if encoding_pool_min_features is not None
+            else self.DEFAULT_ENCODING_POOL_MIN_FEATURES
+        )
+        # If set, the import is checkpointed every time this many features are written - see ImportCheckpointer.
+        self.checkpoint_interval = checkpoint_interval or None
+        # When importing several sources, this many are read from at once - see ConcurrentSourceReader.
+        self.num_concurrent_sources = (
+            num_concurrent_sources or self.DEFAULT_NUM_CONCURRENT_SOURCES
+        )
+        # How the imported objects are written to the repository - see ImportBackend.
+        self.backend = backend or ImportBackend.FAST_IMPORT
+
+    def num_encoding_workers(self, num_features):
+        """
+        Returns how many worker processes should encode the given number of features - never more than there are
+        batches of features for them to encode - or zero if the features should be encoded by the main process.
+        """
+        if self.num_processes <= 1 or num_features < self.encoding_pool_min_features:
+            return 0
+        num_batches = math.ceil(num_features / self.encoding_batch_size)
+        num_workers = min(self.num_processes, num_batches)
+        return num_workers if num_workers > 1 else 0
 
     def as_args(self):
         args = []
@@ -67,6 +128,15 @@ class ReplaceExisting(Enum):
     ALL = auto()
 
 
+class ImportBackend(Enum):
+    # Features are streamed to git-fast-import processes, which write them to packfiles.
+    FAST_IMPORT = auto()
+
+    # Blobs are written straight to packfiles by the encoding workers, and trees by the main process.
+    # See _fast_import_tables_using_packfiles.
+    PACKFILE = auto()
+
+
 class _CommitMissing(Exception):
     pass
 
@@ -148,12 +218,33 @@ def should_compare_imported_features_against_old_features(
     return False
 
 
+def proc_index_for_subtree(subtree_name, num_procs):
+    """
+    Returns which of the parallel git-fast-import processes a feature subtree is assigned to.
+    This has to be stable across processes (unlike hash(str), which is randomised per process),
+    since the encoding workers and the main process must agree on where each subtree goes.
+    """
+    return zlib.crc32(subtree_name.encode("utf8")) % num_procs
+
+
+def proc_index_for_feature_path(feature_path, num_procs):
+    """Returns which of the parallel git-fast-import processes the given feature path is assigned to."""
+    feature_rel_path = feature_path.rsplit("/feature/", 1)[1]
+    first_subtree_name = feature_rel_path.split("/", 1)[0]
+    return proc_index_for_subtree(first_subtree_name, num_procs)
+
+
 @contextmanager
-def git_fast_import(repo, *args):
+def git_fast_import(repo, *args, read_progress=False):
+    """
+    Runs git-fast-import, yielding the process, so that commands can be written to its stdin.
+    If read_progress is True, the process's stdout is also available to read the output of any progress commands.
+    """
     p = subprocess.Popen(
         ["git", "fast-import", "--done", *args],
         cwd=repo.path,
         stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE if read_progress else None,
         env=tool_environment(),
         bufsize=128 * 1024,
         stderr=subprocess.DEVNULL,
@@ -202,7 +293,7 @@ def fast_import_clear_trees(*, procs, replace_ids, replacing_dataset, source):
             # we also delete the features that *do*, but we do it further down
             # so that we don't have to iterate the IDs more than once.
             for subtree in replacing_dataset.feature_path_encoder.tree_names():
-                if hash(subtree) % len(procs) != i:
+                if proc_index_for_subtree(subtree, len(procs)) != i:
                     proc.stdin.write(
                         f"D {dest_inner_path}/feature/{subtree}\n".encode("utf8")
                     )
@@ -215,6 +306,372 @@ def fast_import_clear_trees(*, procs, replace_ids, replacing_dataset, source):
             pass
 
 
+class ImportCheckpointer:
+    """
+    Periodically checkpoints a long-running import, so that if it is interrupted, rerunning the same import
+    can continue from the last checkpoint instead of starting again from scratch.
+
+    At each checkpoint, every git-fast-import process is told to finish its current commit and write everything
+    it has so far to disk, including the temporary import refs. Once they have all confirmed this, the number of
+    features written so far from each source is recorded in a small state file in the repo. When an import is
+    resumed, git-fast-import continues on from the temporary import refs, any sources that were completed are
+    skipped, and the features that were already written from the source in progress are skipped too.
+    This relies on each source yielding its features in the same order every time they are read.
+    """
+
+    STATE_FILE_NAME = "kart-import-checkpoint.json"
+
+    def __init__(self, repo, key, interval):
+        self.repo = repo
+        self.key = key
+        self.interval = interval
+        self.state_path = repo.gitdir_path / self.STATE_FILE_NAME
+        self.import_refs = []
+        self.procs = []
+        self.sources = {}
+        self.continuation_headers = []
+        self.num_checkpoints = 0
+        self.next_checkpoint_at = None
+
+    @classmethod
+    def key_for_import(cls, sources, replace_existing, from_commit, num_processes):
+        """Identifies an import, so that we only resume a previous import if it was the same import."""
+        return hexhash(
+            json.dumps(
+                [
+                    [[str(s), s.dest_path] for s in sources],
+                    replace_existing.name,
+                    from_commit.id.hex if from_commit else None,
+                    num_processes,
+                ]
+            )
+        )
+
+    def load(self):
+        """
+        Loads the state of a previous interrupted import. Returns the list of import refs to continue from,
+        or None if there is no matching import to resume.
+        """
+        if not self.state_path.is_file():
+            return None
+        state = json.loads(self.state_path.read_text())
+        import_refs = state.get("importRefs", [])
+        if state.get("key") != self.key or not all(
+            r in self.repo.references for r in import_refs
+        ):
+            click.secho(
+                "Discarding checkpoint from a previous import that doesn't match this one",
+                fg="yellow",
+            )
+            self.discard(import_refs)
+            return None
+
+        self.import_refs = import_refs
+        self.sources = state["sources"]
+        return import_refs
+
+    def start(self, procs, import_refs, continuation_headers):
+        """
+        procs - the git-fast-import processes.
+        import_refs - the temporary branch that each process is importing onto.
+        continuation_headers - the commit header to send each process after each checkpoint.
+        """
+        self.procs = procs
+        self.import_refs = import_refs
+        self.continuation_headers = continuation_headers
+
+    def is_source_complete(self, source):
+        return self.sources.get(source.dest_path, {}).get("complete", False)
+
+    def features_already_written(self, source):
+        return self.sources.get(source.dest_path, {}).get("featuresWritten", 0)
+
+    def start_source(self, source, features_written):
+        self.sources[source.dest_path] = {
+            "featuresWritten": features_written,
+            "complete": False,
+        }
+        self.next_checkpoint_at = features_written + self.interval
+
+    def features_written(self, source, features_written):
+        """Called as features are written - checkpoints whenever another interval's worth have been written."""
+        self.sources[source.dest_path]["featuresWritten"] = features_written
+        if features_written >= self.next_checkpoint_at:
+            self.checkpoint()
+            self.next_checkpoint_at = features_written + self.interval
+
+    def source_complete(self, source):
+        self.sources[source.dest_path]["complete"] = True
+        self.checkpoint()
+
+    def checkpoint(self):
+        self.num_checkpoints += 1
+        token = f"kart-checkpoint-{self.num_checkpoints}"
+        t0 = time.monotonic()
+        for proc, header in zip(self.procs, self.continuation_headers):
+            # Checkpoint ends the current commit. Then a new commit is started on the same branch,
+            # which continues on from the same tree.
+            proc.stdin.write(f"\ncheckpoint\n\nprogress {token}\n\n".encode("utf8"))
+            proc.stdin.write(header.encode("utf8"))
+            proc.stdin.flush()
+        for proc in self.procs:
+            # The progress line isn't output until the checkpoint is finished.
+            while True:
+                line = proc.stdout.readline()
+                if not line:
+                    raise SubprocessError("git-fast-import exited during checkpoint")
+                if line.decode("utf8").strip() == f"progress {token}":
+                    break
+        self._write_state()
+        L.info("Checkpointed import in %.1fs", time.monotonic() - t0)
+
+    def _write_state(self):
+        state = {
+            "key": self.key,
+            "importRefs": self.import_refs,
+            "sources": self.sources,
+        }
+        tmp_path = self.state_path.with_name(self.state_path.name + ".tmp")
+        tmp_path.write_text(json.dumps(state))
+        os.replace(tmp_path, self.state_path)
+
+    @property
+    def is_resumable(self):
+        return self.state_path.is_file()
+
+    def discard(self, import_refs=None):
+        """Deletes the state file, and any import refs that were kept around so that the import could be resumed."""
+        for r in import_refs or ():
+            if r in self.repo.references:
+                self.repo.references.delete(r)
+        if self.state_path.is_file():
+            self.state_path.unlink()
+
+
+class ImportStats:
+    """
+    Records the time spent in each stage of an import - both wall-clock time and CPU time - along with the number
+    of features and bytes that pass through each stage, so that slow imports can be diagnosed and tuned.
+    Stages are timed in the main thread, and time spent in a nested stage isn't counted towards the outer stage -
+    for instance, time spent reading features from the source isn't counted as encoding time.
+    Encoding worker processes and concurrent source reader threads measure their own time, and report it using add().
+    """
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.stages = collections.defaultdict(collections.Counter)
+        self.sources = []
+        self._stack = []
+        self._last = None
+        self._lock = threading.Lock()
+
+    def _charge_current_stage(self):
+        now = (time.perf_counter(), time.thread_time())
+        if self._stack:
+            stage = self.stages[self._stack[-1]]
+            stage["wallTime"] += now[0] - self._last[0]
+            stage["cpuTime"] += now[1] - self._last[1]
+        self._last = now
+
+    def enter(self, name):
+        self._charge_current_stage()
+        self._stack.append(name)
+
+    def exit(self):
+        self._charge_current_stage()
+        self._stack.pop()
+
+    @contextmanager
+    def stage(self, name):
+        self.enter(name)
+        try:
+            yield
+        finally:
+            self.exit()
+
+    def add(self, name, **values):
+        """Adds values that were measured elsewhere (eg in another thread or process) to the given stage."""
+        with self._lock:
+            self.stages[name].update(values)
+
+    def timed_iter(self, name, iterable):
+        """Wraps iterable, so that the time spent producing each item is recorded in the given stage."""
+        it = iter(iterable)
+        stage = self.stages[name]
+        while True:
+            self.enter(name)
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                self.exit()
+            stage["features"] += 1
+            yield item
+
+    def timed_stream(self, name, stream):
+        """Wraps a writeable stream, so that the time spent and bytes written are recorded in the given stage."""
+        return _TimedStream(self, name, stream)
+
+    def add_source(self, source, *, features, wall_time):
+        self.sources.append(
+            {
+                "source": str(source),
+                "destPath": source.dest_path,
+                "features": features,
+                "wallTime": round(wall_time, 3),
+                "featuresPerSecond": _rate(features, wall_time),
+            }
+        )
+
+    def to_json(self, settings):
+        wall_time = time.perf_counter() - self.t0
+        stages = {}
+        for name, values in self.stages.items():
+            stage = {
+                k: round(v, 3) if isinstance(v, float) else v for k, v in values.items()
+            }
+            if "features" in stage:
+                stage["featuresPerSecond"] = _rate(
+                    values["features"], values["wallTime"]
+                )
+            stages[name] = stage
+        num_features = sum(s["features"] for s in self.sources)
+        return {
+            "numProcesses": settings.num_processes,
+            "numConcurrentSources": settings.num_concurrent_sources,
+            "maxPackSize": settings.max_pack_size,
+            "maxDeltaDepth": settings.max_delta_depth,
+            "encodingBatchSize": settings.encoding_batch_size,
+            "wallTime": round(wall_time, 3),
+            "features": num_features,
+            "featuresPerSecond": _rate(num_features, wall_time),
+            "stages": stages,
+            "sources": self.sources,
+        }
+
+
+def _rate(count, seconds):
+    return round(count / seconds) if seconds else None
+
+
+class _TimedStream:
+    """A writeable stream which records the time spent writing, and the number of bytes written - see ImportStats."""
+
+    def __init__(self, stats, name, stream):
+        self.stats = stats
+        self.name = name
+        self.stream = stream
+
+    def write(self, data):
+        self.stats.enter(self.name)
+        try:
+            return self.stream.write(data)
+        finally:
+            self.stats.exit()
+            self.stats.stages[self.name]["bytes"] += len(data)
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.stream.close()
+
+
+class ConcurrentSourceReader:
+    """
+    Reads the features of several import sources at once. Each source is read in its own thread, using its own
+    connection or handle to the underlying data (see TableImportSource.clone_for_concurrent_reads), so the read
+    latency of each source overlaps with that of the others, rather than adding up.
+    Features are still consumed by the main thread one source at a time and in the original order, so that only
+    one thread writes to git-fast-import, and the import still results in one commit.
+    """
+
+    # Features are passed from the reader threads to the main thread in batches of this size.
+    BATCH_SIZE = 1000
+    # Maximum number of batches buffered for each source, so we don't read entire sources into memory.
+    MAX_BUFFERED_BATCHES = 20
+
+    _END = object()
+
+    def __init__(self, sources, *, num_threads, stats=None):
+        self.stats = stats
+        self._stopping = threading.Event()
+        self._queues = {}
+        # Sources are read in order - a source isn't started until an earlier one has been read completely.
+        self._executor = ThreadPoolExecutor(
+            max_workers=num_threads, thread_name_prefix="kart-import-reader"
+        )
+        for source in sources:
+            reader = source.clone_for_concurrent_reads()
+            if reader is None:
+                continue
+            q = queue.Queue(maxsize=self.MAX_BUFFERED_BATCHES)
+            self._queues[source.dest_path] = q
+            self._executor.submit(self._read_source, reader, q)
+
+    def _put(self, q, item):
+        while not self._stopping.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _read_source(self, reader, q):
+        t0 = (time.perf_counter(), time.thread_time())
+        count = 0
+        try:
+            with reader:
+                for batch in chunk(reader.features(), self.BATCH_SIZE):
+                    count += len(batch)
+                    if not self._put(q, batch):
+                        # The main thread has stopped consuming features.
+                        return
+        except Exception as e:
+            self._put(q, e)
+        else:
+            self._put(q, self._END)
+        finally:
+            if self.stats:
+                # This includes time spent blocked waiting for the main thread to catch up.
+                self.stats.add(
+                    "concurrentRead",
+                    wallTime=time.perf_counter() - t0[0],
+                    cpuTime=time.thread_time() - t0[1],
+                    features=count,
+                )
+
+    def features(self, source):
+        """
+        Yields every feature from the given source - from the thread that is reading it, or, if the source doesn't
+        support concurrent reads, just from source.features().
+        """
+        q = self._queues.pop(source.dest_path, None)
+        if q is None:
+            yield from source.features()
+            return
+
+        while True:
+            item = q.get()
+            if item is self._END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield from item
+
+    def close(self):
+        self._stopping.set()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
 UNSPECIFIED = object()
 
 
@@ -230,6 +687,7 @@ def fast_import_tables(
     replace_ids=None,
     allow_empty=False,
     limit=None,
+    stats_path=None,
     # Advanced use - used by kart upgrade.
     header=None,
     extra_cmd_args=(),
@@ -249,6 +707,7 @@ def fast_import_tables(
     from_commit - the commit to be used as a starting point before beginning the import.
     replace_ids - list of PK values to replace, or None
     limit - maximum number of features to import per source.
+    stats_path - if set, a JSON summary of the time spent in each stage of the import is written here - see ImportStats.
 
     The following extra options are used by kart upgrade.
     header - the commit-header to supply git-fast-import. Generated if not supplied - see generate_header.
@@ -298,6 +757,54 @@ def fast_import_tables(
     # Add primary keys if needed.
     sources = PkGeneratingTableImportSource.wrap_sources_if_needed(sources, repo)
 
+    stats = ImportStats() if stats_path else None
+
+    if settings.backend is ImportBackend.PACKFILE:
+        if (
+            header is not None
+            or extra_cmd_args
+            or replace_ids is not None
+            or settings.checkpoint_interval
+        ):
+            raise InvalidOperation(
+                "The packfile import backend doesn't support replacing specific features or checkpointing"
+            )
+        _fast_import_tables_using_packfiles(
+            repo,
+            sources,
+            settings=settings,
+            verbosity=verbosity,
+            message=message,
+            replace_existing=replace_existing,
+            from_commit=from_commit,
+            from_tree=from_tree,
+            extra_blobs=extra_blobs,
+            allow_empty=allow_empty,
+            limit=limit,
+            stats=stats,
+        )
+        if stats:
+            dump_json_output(stats.to_json(settings), stats_path)
+        return
+
+    checkpointer = None
+    resumed_import_refs = None
+    if settings.checkpoint_interval:
+        if header is not None or replace_ids is not None:
+            raise InvalidOperation(
+                "Checkpointing is not supported when replacing specific features"
+            )
+        checkpointer = ImportCheckpointer(
+            repo,
+            ImportCheckpointer.key_for_import(
+                sources, replace_existing, from_commit, settings.num_processes
+            ),
+            settings.checkpoint_interval,
+        )
+        resumed_import_refs = checkpointer.load()
+        if resumed_import_refs and verbosity >= 1:
+            click.echo("Resuming import from the last checkpoint...")
+
     cmd_args = settings.as_args()
     if verbosity < 2:
         cmd_args.append("--quiet")
@@ -315,8 +822,10 @@ def fast_import_tables(
 
             # PARALLEL IMPORTING
             # To do an import in parallel:
-            #   * we only have one Kart process, and one connection to the source.
+            #   * we only have one connection to the source, in the main Kart process.
             #   * we have multiple git-fast-import backend processes
+            #   * we have a pool of encoding worker processes, which turn batches of features
+            #     into ready-to-send git-fast-import records (see _encode_feature_batch)
             #   * we send all 'meta' blobs (anything that isn't a feature) to process 0
             #   * we assign feature blobs to a process based on it's first subtree.
             #     (all features in tree `datasetname/feature/01` will go to process 1, etc)
@@ -329,6 +838,15 @@ def fast_import_tables(
                     # Luckily only upgrade script passes a header in, so there we just use 1 proc.
                     proc_header = header
                     assert settings.num_processes == 1
+                elif resumed_import_refs:
+                    # continue on from where the interrupted import was checkpointed.
+                    import_ref = resumed_import_refs[i]
+                    import_refs.append(import_ref)
+                    orig_branch = repo.head_branch
+                    proc_header = generate_header(
+                        repo, sources, message, import_ref, None
+                    )
+                    proc_header += f"from {import_ref}^0\n"
                 else:
                     # import onto a temp branch. then reset the head branch afterwards.
                     import_ref = f"refs/kart-import/{uuid.uuid4()}"
@@ -342,10 +860,28 @@ def fast_import_tables(
                         repo, sources, message, import_ref, from_commit
                     )
 
-                proc = stack.enter_context(git_fast_import(repo, *cmd_args))
+                proc = stack.enter_context(
+                    git_fast_import(
+                        repo, *cmd_args, read_progress=checkpointer is not None
+                    )
+                )
+                if stats:
+                    proc.stdin = stats.timed_stream("write", proc.stdin)
                 procs.append(proc)
                 proc.stdin.write(proc_header.encode("utf8"))
 
+            if checkpointer:
+                # After a checkpoint, each process continues the import with a new commit on the same branch.
+                # Since there's no "from", this commit starts from the tree of the last one.
+                checkpointer.start(
+                    procs,
+                    import_refs,
+                    [
+                        generate_header(repo, sources, message, ref, None)
+                        for ref in import_refs
+                    ],
+                )
+
             # Write the extra blob that records the repo's version:
             for i, blob_path in write_blobs_to_stream(procs[0].stdin, extra_blobs):
                 if replace_existing != ReplaceExisting.ALL and blob_path in from_tree:
@@ -359,11 +895,33 @@ def fast_import_tables(
             else:
 
                 def proc_for_feature_path(path):
-                    feature_rel_path = path.rsplit("/feature/", 1)[1]
-                    first_subtree_name = feature_rel_path.split("/", 1)[0]
-                    return procs[hash(first_subtree_name) % len(procs)]
+                    return procs[proc_index_for_feature_path(path, len(procs))]
 
+            sources_to_import = []
             for source in sources:
+                if checkpointer and checkpointer.is_source_complete(source):
+                    if verbosity >= 1:
+                        click.echo(
+                            f"Skipping {source} - already imported to {source.dest_path}/ before the last checkpoint"
+                        )
+                    continue
+                sources_to_import.append(source)
+
+            source_reader = None
+            if (
+                replace_ids is None
+                and settings.num_concurrent_sources > 1
+                and len(sources_to_import) > 1
+            ):
+                source_reader = stack.enter_context(
+                    ConcurrentSourceReader(
+                        sources_to_import,
+                        num_threads=settings.num_concurrent_sources,
+                        stats=stats,
+                    )
+                )
+
+            for source in sources_to_import:
                 _import_single_source(
                     repo,
                     source,
@@ -374,8 +932,23 @@ def fast_import_tables(
                     replace_ids,
                     limit,
                     verbosity,
+                    settings,
+                    checkpointer,
+                    source_reader,
+                    stats,
                 )
 
+            if stats:
+                # Closing the git-fast-import processes waits for them to finish writing packs.
+                stats.enter("gitFastImportFinish")
+
+        if stats:
+            stats.exit()
+
+        if checkpointer:
+            # git-fast-import has finished, there's nothing left to resume.
+            checkpointer.discard()
+
         if import_refs:
             # we created temp branches for the import above.
             # each of the branches has _part_ of the import.
@@ -384,21 +957,10 @@ def fast_import_tables(
             if len(import_refs) > 1:
                 click.echo(f"Joining {len(import_refs)} parallel-imported trees...")
                 t1 = time.monotonic()
-                builder = ObjectBuilder(repo, trees[0])
-                for t in trees[1:]:
-                    datasets = Datasets(repo, t)
-                    for ds in datasets:
-                        try:
-                            feature_tree = ds.feature_tree
-                        except (KeyError, AttributeError):
-                            pass
-                        else:
-                            for subtree in feature_tree:
-                                builder.insert(
-                                    f"{ds.inner_path}/{ds.FEATURE_PATH}{subtree.name}",
-                                    subtree,
-                                )
-                new_tree = builder.flush()
+                with stats.stage("joinTrees") if stats else nullcontext():
+                    new_tree = join_parallel_imported_trees(
+                        repo, trees, [s.dest_path for s in sources]
+                    )
                 t2 = time.monotonic()
                 click.echo(f"Joined trees in {(t2-t1):.0f}s")
             else:
@@ -407,7 +969,8 @@ def fast_import_tables(
                 if new_tree == from_tree:
                     raise NotFound("No changes to commit", exit_code=NO_CHANGES)
 
-            # use the existing commit details we already imported, but use the new tree
+            # use the existing commit details we already imported, but use the new tree.
+            # (The parent is always from_commit - a checkpointed import is made up of several commits).
             existing_commit = repo.revparse_single(import_refs[0]).peel(pygit2.Commit)
             repo.create_commit(
                 orig_branch or "HEAD",
@@ -415,13 +978,343 @@ def fast_import_tables(
                 existing_commit.committer,
                 existing_commit.message,
                 new_tree.id,
-                existing_commit.parent_ids,
+                [from_commit.id] if from_commit else [],
+            )
+
+        if stats:
+            dump_json_output(stats.to_json(settings), stats_path)
+    finally:
+        # remove the import branches - unless we need them to resume the import from a checkpoint.
+        if not (checkpointer and checkpointer.is_resumable):
+            for b in import_refs:
+                if b in repo.references:
+                    repo.references.delete(b)
+
+
+def join_parallel_imported_trees(repo, trees, dataset_paths):
+    """
+    Joins the trees written by several parallel git-fast-import processes into a single tree.
+    trees - the tree written by each process. The first one also contains all of the meta items.
+    dataset_paths - the paths of the datasets that were imported.
+
+    Each process writes only the feature subtrees that were assigned to it (see proc_index_for_subtree) so within
+    each feature directory, the top-level entries written by each process are disjoint. This means the partitions
+    can be joined just by combining those top-level entries - no lower level trees need to be read or rewritten,
+    so the time taken doesn't depend on the number of features imported.
+    """
+    dataset_class = dataset_class_for_version(repo.table_dataset_version)
+    feature_dirname = dataset_class.FEATURE_PATH.rstrip("/")
+    builder = ObjectBuilder(repo, trees[0])
+    for ds_path in dataset_paths:
+        feature_path = f"{ds_path}/{dataset_class.DATASET_DIRNAME}/{feature_dirname}"
+        feature_trees = []
+        for tree in trees:
+            try:
+                feature_trees.append(tree / feature_path)
+            except KeyError:
+                pass
+        if not feature_trees:
+            continue
+
+        tree_builder = repo.TreeBuilder()
+        for feature_tree in feature_trees:
+            for entry in feature_tree:
+                tree_builder.insert(entry.name, entry.id, entry.filemode)
+        builder.insert(feature_path, repo[tree_builder.write()])
+    return builder.flush()
+
+
+def _fast_import_tables_using_packfiles(
+    repo,
+    sources,
+    *,
+    settings,
+    verbosity,
+    message,
+    replace_existing,
+    from_commit,
+    from_tree,
+    extra_blobs,
+    allow_empty,
+    limit,
+    stats,
+):
+    """
+    The packfile import backend - an alternative to streaming everything through git-fast-import.
+    Feature blobs are written straight to packfiles by the encoding workers, which send back only the ID of each
+    blob. The main process then builds the trees - with git, the tree that results from a given set of entries
+    doesn't depend on the order they were added in - and writes them, along with the meta items, to packfiles of its
+    own. Every process uses a PackfileWriter, so no process has to hold all of the objects it writes in memory.
+    See fast_import_tables for a description of the arguments.
+    """
+    if verbosity >= 1:
+        click.echo("Writing packfiles...")
+
+    pack_writer = PackfileWriter(repo)
+    try:
+        builder = ObjectBuilder(repo, from_tree)
+        for blob_path, blob_data in extra_blobs:
+            builder.insert(blob_path, blob_data)
+
+        for source in sources:
+            _import_single_source_using_packfiles(
+                repo,
+                source,
+                builder,
+                pack_writer,
+                replace_existing=replace_existing,
+                from_commit=from_commit,
+                limit=limit,
+                verbosity=verbosity,
+                settings=settings,
+                stats=stats,
             )
+
+        with stats.stage("writeTrees") if stats else nullcontext():
+            new_tree = builder.flush()
     finally:
-        # remove the import branches
-        for b in import_refs:
-            if b in repo.references:
-                repo.references.delete(b)
+        pack_writer.close()
+
+    if not allow_empty:
+        if new_tree == from_tree:
+            raise NotFound("No changes to commit", exit_code=NO_CHANGES)
+
+    if message is None:
+        message = generate_message(sources)
+    repo.create_commit(
+        repo.head_branch or "HEAD",
+        repo.author_signature(),
+        repo.committer_signature(),
+        message,
+        new_tree.id,
+        [from_commit.id] if from_commit else [],
+    )
+
+
+def _import_single_source_using_packfiles(
+    repo,
+    source,
+    builder,
+    pack_writer,
+    *,
+    replace_existing,
+    from_commit,
+    limit,
+    verbosity,
+    settings,
+    stats,
+):
+    """
+    Writes the blobs and trees for a single source to packfiles using the given PackfileWriter, and adds the
+    resulting dataset to the given ObjectBuilder - see _fast_import_tables_using_packfiles.
+    """
+    replacing_dataset = None
+    if replace_existing == ReplaceExisting.GIVEN:
+        try:
+            replacing_dataset = repo.datasets(refish=from_commit)[source.dest_path]
+        except KeyError:
+            # no such dataset; no problem
+            replacing_dataset = None
+
+    dataset_class = dataset_class_for_version(repo.table_dataset_version)
+    dataset = dataset_class.new_dataset_for_writing(
+        source.dest_path, source.schema, repo
+    )
+
+    # The dataset is written from scratch, and then replaces any existing dataset at the same path.
+    dataset_builder = ObjectBuilder(repo, None)
+    if replacing_dataset is not None:
+        # We still need the old legends to reimport data efficiently. Copy them from the original dataset.
+        for blob_path, blob_data in replacing_dataset.iter_legend_blob_data():
+            dataset_builder.insert(blob_path, blob_data)
+
+    with source:
+        if limit:
+            num_rows = min(limit, source.feature_count)
+            num_rows_text = f"{num_rows:,d} of {source.feature_count:,d}"
+        else:
+            num_rows = source.feature_count
+            num_rows_text = f"{num_rows:,d}"
+        num_encoding_workers = settings.num_encoding_workers(num_rows)
+
+        if verbosity >= 1:
+            click.echo(
+                f"Importing {num_rows_text} features from {source} to {source.dest_path}/ ..."
+            )
+
+        t1 = time.monotonic()
+        src_iterator = source.features()
+        if stats:
+            num_read_before = stats.stages["read"]["features"]
+            src_iterator = stats.timed_iter("read", src_iterator)
+
+        progress_every = None
+        if verbosity >= 1:
+            progress_every = max(100, 100_000 // (10 ** (verbosity - 1)))
+
+        feature_blobs_already_written = getattr(
+            source, "feature_blobs_already_written", False
+        )
+        if feature_blobs_already_written:
+            feature_blob_iter = source.feature_iter_with_reused_blobs(dataset, None)
+        elif should_compare_imported_features_against_old_features(
+            repo,
+            source,
+            replacing_dataset,
+            from_commit,
+        ):
+            feature_blob_iter = dataset.import_iter_feature_blobs(
+                repo,
+                src_iterator,
+                source,
+                replacing_dataset=replacing_dataset,
+            )
+        elif num_encoding_workers:
+            feature_blob_iter = None
+        else:
+            feature_blob_iter = dataset.import_iter_feature_blobs(
+                repo, src_iterator, source
+            )
+
+        # Features mostly arrive in path order if they are in PK order and the PKs aren't hashed to make the path.
+        tree_writer = FeatureTreeWriter(
+            pack_writer,
+            in_path_order=(
+                source.features_are_pk_ordered
+                and not feature_blobs_already_written
+                and not dataset.feature_path_encoder.DISTRIBUTED_FEATURES
+            ),
+        )
+
+        if feature_blob_iter is None:
+            _write_features_to_packfiles_using_encoding_pool(
+                repo,
+                source,
+                dataset,
+                src_iterator,
+                tree_writer,
+                num_workers=num_encoding_workers,
+                limit=limit,
+                progress_every=progress_every,
+                settings=settings,
+                t0=t1,
+                stats=stats,
+            )
+        else:
+            # Features that must be compared against the old features are written by the main process.
+            if stats:
+                feature_blob_iter = stats.timed_iter("encode", feature_blob_iter)
+            for i, (feature_path, blob_data) in enumerate(feature_blob_iter):
+                if feature_blobs_already_written:
+                    blob_id = pygit2.Oid(hex=blob_data)
+                else:
+                    blob_id = pack_writer.write_blob(blob_data)
+                tree_writer.add(dataset.ensure_rel_path(feature_path), blob_id)
+
+                if i and progress_every and i % progress_every == 0:
+                    click.echo(f"  {i:,d} features... @{time.monotonic()-t1:.1f}s")
+
+                if limit is not None and i == (limit - 1):
+                    click.secho(f"  Stopping at {limit:,d} features", fg="yellow")
+                    break
+
+        t2 = time.monotonic()
+        if verbosity >= 1:
+            click.echo(f"Added {num_rows:,d} Features to packfiles in {t2-t1:.1f}s")
+            click.echo(f"Overall rate: {(num_rows/(t2-t1 or 1E-3)):.0f} features/s)")
+        if stats:
+            stats.add_source(
+                source,
+                features=stats.stages["read"]["features"] - num_read_before,
+                wall_time=t2 - t1,
+            )
+
+        with stats.stage("writeTrees") if stats else nullcontext():
+            for entry in repo[tree_writer.write()]:
+                dataset_builder.insert(
+                    f"{dataset.inner_path}/{entry.name}", repo[entry.id]
+                )
+
+        # Meta items - written second as certain importers generate extra metadata as they import features.
+        meta_blobs = dataset.import_iter_meta_blobs(repo, source)
+        if stats:
+            meta_blobs = stats.timed_iter("meta", meta_blobs)
+        for blob_path, blob_data in meta_blobs:
+            dataset_builder.insert(blob_path, blob_data)
+
+    builder.insert(source.dest_path, dataset_builder.flush() / source.dest_path)
+
+
+class FeatureTreeWriter:
+    """
+    Builds the trees for the packfile import backend, given the path and blob ID of each feature in a dataset.
+    Entries are held in memory as nested dicts until the subtree they are in is complete - then that subtree is
+    written, using the PackfileWriter, and only its ID is kept.
+
+    If in_path_order is set, features are expected to arrive grouped by the subtrees they are in - as they do when
+    sequential PKs are stored in the same subtree - so a subtree is complete as soon as a feature arrives that is
+    outside it, and memory use depends only on the depth of the tree. (A written subtree is read back in if more
+    features arrive for it after all). Otherwise, subtrees aren't known to be complete until every feature has
+    been added.
+    """
+
+    def __init__(self, pack_writer, *, in_path_order):
+        self.pack_writer = pack_writer
+        self.in_path_order = in_path_order
+        # Nested dicts of {name: subtree-dict}, or {name: (ID, filemode)} once written.
+        self._root = {}
+        # The names of the subtrees, from the root down, that the last feature was added to.
+        self._open_path = []
+
+    def add(self, path, blob_id):
+        """Adds the blob with the given ID at the given path."""
+        *dir_names, name = path.split("/")
+        if self.in_path_order:
+            self._write_subtrees_outside(dir_names)
+        entries = self._root
+        for dir_name in dir_names:
+            subtree = entries.get(dir_name)
+            if subtree is None:
+                subtree = entries[dir_name] = {}
+            elif not isinstance(subtree, dict):
+                subtree = entries[dir_name] = self._read_tree_entries(subtree[0])
+            entries = subtree
+        entries[name] = (blob_id, pygit2.GIT_FILEMODE_BLOB)
+
+    def write(self):
+        """Writes every subtree that is not yet written, and returns the ID of the root tree."""
+        return self._write_tree(self._root)
+
+    def _write_subtrees_outside(self, dir_names):
+        """Writes the subtrees the last feature was added to, that don't contain the given path."""
+        open_path = self._open_path
+        common = 0
+        while (
+            common < min(len(open_path), len(dir_names))
+            and open_path[common] == dir_names[common]
+        ):
+            common += 1
+        for depth in range(len(open_path), common, -1):
+            entries = self._root
+            for dir_name in open_path[: depth - 1]:
+                entries = entries[dir_name]
+            name = open_path[depth - 1]
+            entries[name] = (
+                self._write_tree(entries[name]),
+                pygit2.GIT_FILEMODE_TREE,
+            )
+        self._open_path = dir_names
+
+    def _write_tree(self, entries):
+        for name, value in entries.items():
+            if isinstance(value, dict):
+                entries[name] = (self._write_tree(value), pygit2.GIT_FILEMODE_TREE)
+        return self.pack_writer.write_tree(entries)
+
+    def _read_tree_entries(self, tree_id):
+        return {
+            obj.name: (obj.id, obj.filemode) for obj in self.pack_writer.repo[tree_id]
+        }
 
 
 def _import_single_source(
@@ -434,6 +1327,10 @@ def _import_single_source(
     replace_ids,
     limit,
     verbosity,
+    settings,
+    checkpointer=None,
+    source_reader=None,
+    stats=None,
 ):
     """
     repo - the Kart repo to import into.
@@ -448,7 +1345,17 @@ def _import_single_source(
         0: no progress information is printed to stdout.
         1: basic status information
         2: full output of `git-fast-import --stats ...`
+    settings - FastImportSettings: Tuneable settings which affect performance.
+    checkpointer - ImportCheckpointer, or None if the import is not being checkpointed.
+    source_reader - ConcurrentSourceReader which is already reading features from this source, or None.
+    stats - ImportStats to record the time spent in each stage of the import, or None.
     """
+    # When resuming an import, any features written before the last checkpoint are skipped.
+    features_to_skip = 0
+    if checkpointer:
+        features_to_skip = checkpointer.features_already_written(source)
+        checkpointer.start_source(source, features_to_skip)
+
     replacing_dataset = None
     if replace_existing == ReplaceExisting.GIVEN:
         try:
@@ -457,12 +1364,14 @@ def _import_single_source(
             # no such dataset; no problem
             replacing_dataset = None
 
-        fast_import_clear_trees(
-            procs=procs,
-            replace_ids=replace_ids,
-            replacing_dataset=replacing_dataset,
-            source=source,
-        )
+        if not features_to_skip:
+            # (If we are skipping features, the trees were cleared before the last checkpoint).
+            fast_import_clear_trees(
+                procs=procs,
+                replace_ids=replace_ids,
+                replacing_dataset=replacing_dataset,
+                source=source,
+            )
 
     dataset_class = dataset_class_for_version(repo.table_dataset_version)
     dataset = dataset_class.new_dataset_for_writing(
@@ -476,6 +1385,7 @@ def _import_single_source(
         else:
             num_rows = source.feature_count
             num_rows_text = f"{num_rows:,d}"
+        num_encoding_workers = settings.num_encoding_workers(num_rows)
 
         if verbosity >= 1:
             click.echo(
@@ -499,9 +1409,33 @@ def _import_single_source(
 
             id_iterator = _ids()
             src_iterator = source.get_features(id_iterator, ignore_missing=True)
+            src_is_pk_ordered = source.get_features_are_pk_ordered
+        elif source_reader is not None:
+            id_iterator = None
+            src_iterator = source_reader.features(source)
+            src_is_pk_ordered = source.features_are_pk_ordered
         else:
             id_iterator = None
             src_iterator = source.features()
+            src_is_pk_ordered = source.features_are_pk_ordered
+
+        if features_to_skip:
+            if verbosity >= 1:
+                click.echo(
+                    f"  Skipping {features_to_skip:,d} features imported before the last checkpoint"
+                )
+            # These features are still read, so that the source sees the same features in the same order.
+            src_iterator = itertools.islice(src_iterator, features_to_skip, None)
+
+        if stats:
+            num_read_before = stats.stages["read"]["features"]
+            src_iterator = stats.timed_iter("read", src_iterator)
+
+        on_features_written = None
+        if checkpointer:
+
+            def on_features_written(count):
+                checkpointer.features_written(source, features_to_skip + count)
 
         progress_every = None
         if verbosity >= 1:
@@ -528,41 +1462,323 @@ def _import_single_source(
                 src_iterator,
                 source,
                 replacing_dataset=replacing_dataset,
+                pk_ordered=src_is_pk_ordered,
             )
+        elif num_encoding_workers:
+            # Nothing to compare against - every feature is encoded from scratch,
+            # so the encoding can be done in parallel by a pool of worker processes.
+            feature_blob_iter = None
         else:
             feature_blob_iter = dataset.import_iter_feature_blobs(
                 repo, src_iterator, source
             )
 
-        for i, (feature_path, blob_data) in enumerate(feature_blob_iter):
-            stream = proc_for_feature_path(feature_path).stdin
-            if feature_blobs_already_written:
-                copy_existing_blob_to_stream(stream, feature_path, blob_data)
-            else:
-                write_blob_to_stream(stream, feature_path, blob_data)
+        if feature_blob_iter is None:
+            _import_features_using_encoding_pool(
+                repo,
+                source,
+                dataset,
+                src_iterator,
+                procs,
+                num_workers=num_encoding_workers,
+                limit=limit,
+                progress_every=progress_every,
+                settings=settings,
+                t0=t1,
+                on_features_written=on_features_written,
+                stats=stats,
+            )
+        else:
+            if stats:
+                feature_blob_iter = stats.timed_iter("encode", feature_blob_iter)
+            for i, (feature_path, blob_data) in enumerate(feature_blob_iter):
+                stream = proc_for_feature_path(feature_path).stdin
+                if feature_blobs_already_written:
+                    copy_existing_blob_to_stream(stream, feature_path, blob_data)
+                else:
+                    write_blob_to_stream(stream, feature_path, blob_data)
+
+                if on_features_written:
+                    on_features_written(i + 1)
 
-            if i and progress_every and i % progress_every == 0:
-                click.echo(f"  {i:,d} features... @{time.monotonic()-t1:.1f}s")
+                if i and progress_every and i % progress_every == 0:
+                    click.echo(f"  {i:,d} features... @{time.monotonic()-t1:.1f}s")
 
-            if limit is not None and i == (limit - 1):
-                click.secho(f"  Stopping at {limit:,d} features", fg="yellow")
-                break
+                if limit is not None and i == (limit - 1):
+                    click.secho(f"  Stopping at {limit:,d} features", fg="yellow")
+                    break
         t2 = time.monotonic()
         if verbosity >= 1:
             click.echo(f"Added {num_rows:,d} Features to index in {t2-t1:.1f}s")
             click.echo(f"Overall rate: {(num_rows/(t2-t1 or 1E-3)):.0f} features/s)")
 
+        if stats:
+            stats.add_source(
+                source,
+                features=stats.stages["read"]["features"] - num_read_before,
+                wall_time=t2 - t1,
+            )
+
         # Meta items - written second as certain importers generate extra metadata as they import features.
-        for x in write_blobs_to_stream(
-            procs[0].stdin, dataset.import_iter_meta_blobs(repo, source)
-        ):
+        meta_blobs = dataset.import_iter_meta_blobs(repo, source)
+        if stats:
+            meta_blobs = stats.timed_iter("meta", meta_blobs)
+        for x in write_blobs_to_stream(procs[0].stdin, meta_blobs):
             pass
 
+        if checkpointer:
+            checkpointer.source_complete(source)
+
     t3 = time.monotonic()
     if verbosity >= 1:
         click.echo(f"Closed in {(t3-t2):.0f}s")
 
 
+def _import_features_using_encoding_pool(
+    repo,
+    source,
+    dataset,
+    src_iterator,
+    procs,
+    *,
+    num_workers,
+    limit,
+    progress_every,
+    settings,
+    t0,
+    on_features_written=None,
+    stats=None,
+):
+    """
+    Reads features from src_iterator in the main process, and farms them out in batches to a pool of
+    num_workers worker processes which encode them. Each worker returns one chunk of ready-to-send git-fast-import
+    records per git-fast-import process, so all that's left to do here is write each chunk to its pipe.
+    on_features_written - optional callback, called with the total number of features written so far.
+    stats - optional ImportStats, to which each worker's encoding time is added.
+    """
+    if limit is not None:
+        src_iterator = itertools.islice(src_iterator, limit)
+    batches = chunk(src_iterator, settings.encoding_batch_size)
+
+    count = 0
+    next_progress = progress_every
+
+    def _write_result(future):
+        nonlocal count, next_progress
+        if stats:
+            with stats.stage("waitForEncoding"):
+                batch_size, proc_chunks, wall_time, cpu_time = future.result()
+            stats.add(
+                "encode", wallTime=wall_time, cpuTime=cpu_time, features=batch_size
+            )
+        else:
+            batch_size, proc_chunks, wall_time, cpu_time = future.result()
+        for proc, proc_chunk in zip(procs, proc_chunks):
+            if proc_chunk:
+                proc.stdin.write(proc_chunk)
+        count += batch_size
+        if on_features_written:
+            on_features_written(count)
+        if progress_every and count >= next_progress:
+            click.echo(f"  {count:,d} features... @{time.monotonic()-t0:.1f}s")
+            next_progress += progress_every
+
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=_encoding_worker_context(),
+        initializer=_init_encoding_worker,
+        initargs=(
+            repo.path,
+            dataset.path,
+            source.schema.to_column_dicts(),
+            len(procs),
+        ),
+    ) as executor:
+        for future in submit_with_bounded_in_flight(
+            executor, _encode_feature_batch, batches, num_workers * 2
+        ):
+            _write_result(future)
+
+    if limit is not None and count == limit:
+        click.secho(f"  Stopping at {limit:,d} features", fg="yellow")
+
+
+def _write_features_to_packfiles_using_encoding_pool(
+    repo,
+    source,
+    dataset,
+    src_iterator,
+    tree_writer,
+    *,
+    num_workers,
+    limit,
+    progress_every,
+    settings,
+    t0,
+    stats=None,
+):
+    """
+    Like _import_features_using_encoding_pool, but for the packfile import backend. Each worker writes the blobs
+    it encodes to its own packfiles, and returns only the path and ID of each blob, which are added to the given
+    FeatureTreeWriter.
+    """
+    if limit is not None:
+        src_iterator = itertools.islice(src_iterator, limit)
+    batches = chunk(src_iterator, settings.encoding_batch_size)
+    count = 0
+    next_progress = progress_every
+
+    mp_context = _encoding_worker_context()
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=mp_context,
+        initializer=_init_encoding_worker,
+        initargs=(
+            repo.path,
+            dataset.path,
+            source.schema.to_column_dicts(),
+            None,
+            mp_context.Barrier(num_workers),
+        ),
+    ) as executor:
+        # Make sure all the workers are started now, so that later there's exactly one flush task for each of them.
+        _run_once_per_packfile_worker(executor, num_workers, _sync_packfile_worker)
+
+        for future in submit_with_bounded_in_flight(
+            executor, _write_feature_batch_to_packfile, batches, num_workers * 2
+        ):
+            batch_size, entries, wall_time, cpu_time = future.result()
+            if stats:
+                stats.add(
+                    "encode", wallTime=wall_time, cpuTime=cpu_time, features=batch_size
+                )
+            for feature_path, blob_id in entries:
+                tree_writer.add(feature_path, pygit2.Oid(raw=blob_id))
+            count += batch_size
+            if progress_every and count >= next_progress:
+                click.echo(f"  {count:,d} features... @{time.monotonic()-t0:.1f}s")
+                next_progress += progress_every
+
+        # Each worker still has some blobs buffered in memory, which must be written before it exits.
+        _run_once_per_packfile_worker(executor, num_workers, _flush_packfile_worker)
+
+    if limit is not None and count == limit:
+        click.secho(f"  Stopping at {limit:,d} features", fg="yellow")
+
+
+def _encoding_worker_context():
+    """
+    Returns the multiprocessing context used to start encoding worker processes. They are started by a fresh server
+    process, rather than forked from this one - while importing several sources at once, this process has other
+    threads (see ConcurrentSourceReader), and a process forked from a multi-threaded one can deadlock on a lock
+    that one of those threads was holding at the time.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def _run_once_per_packfile_worker(executor, num_workers, fn):
+    """
+    Runs fn once in each of the executor's worker processes. This relies on fn waiting at the flush barrier
+    until every worker is running it - so no worker can run it twice - see _sync_packfile_worker.
+    """
+    futures = [executor.submit(fn) for i in range(num_workers)]
+    for future in futures:
+        future.result()
+
+
+# The dataset that features are being encoded for, in an encoding worker process.
+_worker_dataset = None
+_worker_schema = None
+_worker_num_procs = None
+# Only used by the packfile import backend - see _write_features_to_packfiles_using_encoding_pool.
+_worker_pack_writer = None
+_worker_flush_barrier = None
+
+
+def _init_encoding_worker(
+    repo_path, dataset_path, schema_column_dicts, num_procs, flush_barrier=None
+):
+    """
+    Initialises an encoding worker process - see _import_features_using_encoding_pool.
+    If a flush_barrier is supplied, the worker writes blobs straight to packfiles instead -
+    see _write_features_to_packfiles_using_encoding_pool.
+    """
+    global _worker_dataset, _worker_schema, _worker_num_procs
+    global _worker_pack_writer, _worker_flush_barrier
+    from .repo import KartRepo
+
+    repo = KartRepo(repo_path, validate=False)
+    _worker_schema = Schema.from_column_dicts(schema_column_dicts)
+    dataset_class = dataset_class_for_version(repo.table_dataset_version)
+    _worker_dataset = dataset_class.new_dataset_for_writing(
+        dataset_path, _worker_schema, repo
+    )
+    _worker_num_procs = num_procs
+    if flush_barrier is not None:
+        _worker_pack_writer = PackfileWriter(repo)
+        _worker_flush_barrier = flush_barrier
+
+
+def _encode_feature_batch(features):
+    """
+    Runs in an encoding worker process. Encodes the given features, and returns a tuple -
+    (number of features encoded, [bytes to be written to git-fast-import process N, for each N], wall time, CPU time)
+    """
+    t0 = (time.perf_counter(), time.process_time())
+    streams = [io.BytesIO() for i in range(_worker_num_procs)]
+    for feature_path, blob_data in _worker_dataset.encode_features(
+        features, _worker_schema
+    ):
+        stream = streams[proc_index_for_feature_path(feature_path, _worker_num_procs)]
+        write_blob_to_stream(stream, feature_path, blob_data)
+    return (
+        len(features),
+        [s.getvalue() for s in streams],
+        time.perf_counter() - t0[0],
+        time.process_time() - t0[1],
+    )
+
+
+def _write_feature_batch_to_packfile(features):
+    """
+    Runs in an encoding worker process which is using the packfile import backend. Encodes the given features
+    and writes them as blobs, and returns a tuple -
+    (number of features written, [(path relative to the dataset, raw blob ID) for each feature], wall time, CPU time)
+    """
+    t0 = (time.perf_counter(), time.process_time())
+    entries = [
+        (feature_path, _worker_pack_writer.write_blob(blob_data).raw)
+        for feature_path, blob_data in _worker_dataset.encode_features(
+            features, _worker_schema, relative=True
+        )
+    ]
+    return (
+        len(features),
+        entries,
+        time.perf_counter() - t0[0],
+        time.process_time() - t0[1],
+    )
+
+
+def _sync_packfile_worker():
+    """
+    Runs in an encoding worker process which is using the packfile import backend.
+    Doesn't return until every worker is running this same task - so that no worker gets two of them.
+    """
+    _worker_flush_barrier.wait()
+
+
+def _flush_packfile_worker():
+    """
+    Runs in an encoding worker process which is using the packfile import backend.
+    Dumps any blobs that are still buffered in memory to a packfile.
+    """
+    _worker_pack_writer.flush()
+    _sync_packfile_worker()
+
+
 def write_blob_to_stream(stream, blob_path, blob_data):
     stream.write(f"M 644 inline {blob_path}\ndata {len(blob_data)}\n".encode("utf8"))
     stream.write(blob_data)
@@ -698,3 +698,85 @@ def geom_envelope(gpkg_geom, only_2d=False, calculate_if_missing=False):
         return None
     else:
         return envelope
+
+
+# WKB geometry types of points - in 2D, Z, M, ZM, and the older 2.5D encoding.
+_WKB_POINT_TYPES = (1, 1001, 2001, 3001, 0x80000001)
+
+
+def geom_envelopes(gpkg_geoms, calculate_if_missing=False):
+    """
+    Parse a list of GeoPackage geometries to 2D envelopes, as a NumPy array with one row per geometry.
+    This gives the same results as calling geom_envelope(gpkg_geom, only_2d=True) for each geometry, but the headers
+    are all parsed at once - and when calculate_if_missing is True, the envelope of a point (which never has an
+    envelope stored) is read straight from its WKB, instead of instantiating an OGR geometry.
+
+    Returns an array of shape (len(gpkg_geoms), 4), where each row is (minx, maxx, miny, maxy), or all NaNs in the
+    cases where geom_envelope would return None.
+    """
+    import numpy as np
+
+    count = len(gpkg_geoms)
+    result = np.full((count, 4), np.nan)
+    if not count:
+        return result
+
+    # The first 40 bytes contain the header and a 2D envelope, or the header and a point's WKB.
+    headers = np.frombuffer(
+        b"".join((g or b"")[:40].ljust(40, b"\0") for g in gpkg_geoms),
+        dtype=np.uint8,
+    ).reshape(count, 40)
+    lengths = np.fromiter(
+        (len(g or b"") for g in gpkg_geoms), dtype=np.int64, count=count
+    )
+    is_none = np.fromiter((g is None for g in gpkg_geoms), dtype=bool, count=count)
+
+    def doubles(start, stop, is_le):
+        values = headers[:, start:stop].copy()
+        return np.where(is_le[:, None], values.view("<f8"), values.view(">f8"))
+
+    flags = headers[:, 3]
+    is_gpkg = (
+        (headers[:, 0] == ord("G"))
+        & (headers[:, 1] == ord("P"))
+        & (headers[:, 2] == 0)
+        & ((flags & 0b00100000) == 0)
+    )
+    is_empty = is_gpkg & ((flags & _GPKG_EMPTY_BIT) != 0)
+    envelope_type = (flags & _GPKG_ENVELOPE_BITS) >> 1
+    has_envelope = (
+        is_gpkg
+        & ~is_empty
+        & (envelope_type >= GPKG_ENVELOPE_XY)
+        & (envelope_type <= GPKG_ENVELOPE_XYZM)
+        & (lengths >= 40)
+    )
+    is_gpkg_le = (flags & _GPKG_LE_BIT) != 0
+    result[has_envelope] = doubles(8, 40, is_gpkg_le)[has_envelope]
+    done = is_none | is_empty | has_envelope
+
+    no_envelope = is_gpkg & ~is_empty & (envelope_type == GPKG_ENVELOPE_NONE)
+    if calculate_if_missing:
+        # Points never have an envelope stored, but the point itself is at a fixed offset in the WKB.
+        is_wkb_le = headers[:, 8] == 1
+        wkb_type = np.where(
+            is_wkb_le,
+            headers[:, 9:13].copy().view("<u4")[:, 0],
+            headers[:, 9:13].copy().view(">u4")[:, 0],
+        )
+        is_point = no_envelope & np.isin(wkb_type, _WKB_POINT_TYPES) & (lengths >= 29)
+        result[is_point] = doubles(13, 29, is_wkb_le)[is_point][:, [0, 0, 1, 1]]
+        done |= is_point
+    else:
+        done |= no_envelope
+
+    # Anything else - including anything invalid - is handled one at a time, so the same errors are raised.
+    for i in np.flatnonzero(~done):
+        envelope = geom_envelope(
+            gpkg_geoms[i], only_2d=True, calculate_if_missing=calculate_if_missing
+        )
+        if envelope is not None:
+            result[i] = envelope[:4]
+
+    result[np.isnan(result).any(axis=1)] = np.nan
+    return result
@@ -58,6 +58,87 @@ def write_to_packfile(repo, mark_as_promisor=None):
     repo.set_odb(original_odb)
 
 
+class PackfileWriter:
+    """
+    Writes blobs and trees to the repository through a MemPack ODB backend, like write_to_packfile - except that
+    memory use is bounded, however many objects are written: whenever more than max_buffered_bytes of object data
+    have been written, the MemPack is dumped to a new packfile and replaced with an empty one.
+    Note that this affects the given repo's backend ODB until close() is called.
+    """
+
+    DEFAULT_MAX_BUFFERED_BYTES = 256 * 1024 * 1024
+
+    def __init__(self, repo, *, max_buffered_bytes=None, mark_as_promisor=None):
+        self.repo = repo
+        self.max_buffered_bytes = max_buffered_bytes or self.DEFAULT_MAX_BUFFERED_BYTES
+        if mark_as_promisor is None:
+            mark_as_promisor = repo.is_partial_clone
+        self.mark_as_promisor = mark_as_promisor
+        self.objects_path = repo.gitdir_path / "objects"
+        self.original_odb = repo.odb
+        self.pack_filenames = []
+        self._mempack_backend = None
+        self._buffered_bytes = 0
+        self._start_mempack()
+
+    def _start_mempack(self):
+        self._buffered_bytes = 0
+        if not pygit2_supports_mempack():
+            return
+        modified_odb = pygit2.Odb(str(self.objects_path))
+        self._mempack_backend = pygit2.OdbBackendMemPack(False)
+        modified_odb.add_backend(self._mempack_backend, 1000)
+        self.repo.set_odb(modified_odb)
+
+    def write_blob(self, data):
+        """Writes a blob with the given data, and returns its ID."""
+        oid = self.repo.create_blob(data)
+        self._add_buffered_bytes(len(data))
+        return oid
+
+    def write_tree(self, entries):
+        """
+        Writes a tree, given a dict of {name: (object ID, filemode)}, and returns its ID.
+        Unlike a pygit2.TreeBuilder, this doesn't check that the objects the tree refers to exist -
+        so a tree can refer to blobs that another process has written, but not yet flushed.
+        """
+        data = b"".join(
+            b"%o %s\0%s" % (filemode, name.encode("utf8"), oid.raw)
+            for name, (oid, filemode) in sorted(entries.items(), key=_tree_entry_key)
+        )
+        oid = self.repo.odb.write(pygit2.GIT_OBJ_TREE, data)
+        self._add_buffered_bytes(len(data))
+        return oid
+
+    def _add_buffered_bytes(self, num_bytes):
+        self._buffered_bytes += num_bytes
+        if self._buffered_bytes >= self.max_buffered_bytes:
+            self.flush()
+
+    def flush(self):
+        """Dumps any blobs written so far to a new packfile."""
+        if self._mempack_backend is None or not self._buffered_bytes:
+            return
+        pack_filename = self._mempack_backend.dump_to_pack_dir(self.repo)
+        if self.mark_as_promisor:
+            packfile_path = self.objects_path / "pack" / pack_filename
+            packfile_path.with_suffix(".promisor").touch()
+        self.pack_filenames.append(pack_filename)
+        self._start_mempack()
+
+    def close(self):
+        self.flush()
+        self.repo.set_odb(self.original_odb)
+        self._mempack_backend = None
+
+
+def _tree_entry_key(item):
+    # Git sorts tree entries by name, but compares the names of subtrees as if they end with a slash.
+    name, (oid, filemode) = item
+    name = name.encode("utf8")
+    return name + b"/" if filemode == pygit2.GIT_FILEMODE_TREE else name
+
+
 @contextlib.contextmanager
 def packfile_object_builder(repo, initial_root_tree, mark_as_promisor=None):
     """
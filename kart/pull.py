@@ -44,6 +44,8 @@ L = logging.getLogger("kart.pull")
 @click.pass_context
 def pull(ctx, ff, ff_only, do_progress, repository, refspecs):
     """Fetch from and integrate with another repository or a local branch"""
+    from .spatial_filter.index import update_spatial_filter_index_after_fetch
+
     repo = ctx.obj.repo
 
     if repository is None:
@@ -90,6 +92,7 @@ def pull(ctx, ff, ff_only, do_progress, repository, refspecs):
         ],
         env=tool_environment(),
     )
+    update_spatial_filter_index_after_fetch(repo)
 
     # now merge with FETCH_HEAD
     L.debug("Running merge:", {"ff": ff, "ff_only": ff_only, "commit": "FETCH_HEAD"})
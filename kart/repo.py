@@ -89,6 +89,9 @@ class KartConfigKeys:
     KART_WORKINGCOPY_LOCATION = "kart.workingcopy.location"
     SNO_WORKINGCOPY_PATH = "sno.workingcopy.path"
 
+    KART_WORKINGCOPY_CONCURRENTWRITES = "kart.workingcopy.concurrentWrites"
+    KART_WORKINGCOPY_RENAMELIMIT = "kart.workingcopy.renameLimit"
+
     KART_SPATIALFILTER_GEOMETRY = "kart.spatialfilter.geometry"
     KART_SPATIALFILTER_CRS = "kart.spatialfilter.crs"
     KART_SPATIALFILTER_REFERENCE = "kart.spatialfilter.reference"
@@ -44,6 +44,7 @@ class Legend:
         """
         self._pk_columns = tuple(pk_columns)
         self._non_pk_columns = tuple(non_pk_columns)
+        self._hexhash = None
 
     @property
     def pk_columns(self):
@@ -99,7 +100,100 @@ class Legend:
 
     def hexhash(self):
         """Like __hash__ but with platform-independent, 160-bit hex strings."""
-        return hexhash(self.dumps())
+        # Every feature blob contains its legend's hash, so this is called a lot - and legends are immutable.
+        if self._hexhash is None:
+            self._hexhash = hexhash(self.dumps())
+        return self._hexhash
+
+
+class FeatureCodec:
+    """
+    Converts features to and from the form in which they are stored: primary key values (which are
+    encoded into the feature's path) plus a msgpacked blob of [legend-hash, non-pk-values].
+
+    Everything that depends only on the schema - the legend hash, which column each value belongs to,
+    where the geometry columns are - is worked out once when the codec is created, instead of once
+    per feature. Use Schema.codec to get the codec for a particular schema.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.legend = schema.legend
+        self.legend_hash = self.legend.hexhash()
+
+        columns = schema.columns
+        self.column_names = tuple(c.name for c in columns)
+        index_by_id = {c.id: i for i, c in enumerate(columns)}
+        # Indices into schema.columns, in the order the values are stored:
+        self.pk_indices = tuple(index_by_id[c] for c in self.legend.pk_columns)
+        self.non_pk_indices = tuple(index_by_id[c] for c in self.legend.non_pk_columns)
+        self.pk_names = tuple(self.column_names[i] for i in self.pk_indices)
+        self.non_pk_names = tuple(self.column_names[i] for i in self.non_pk_indices)
+        self.geometry_indices = tuple(
+            i for i, c in enumerate(columns) if c.data_type == "geometry"
+        )
+
+        # Features can be stored using any legend that the dataset has ever had - keyed by legend hash.
+        self._decode_plans = {self.legend_hash: self._decode_plan(self.legend)}
+
+    def _decode_plan(self, legend):
+        # For each column in the schema, the position of its value in (*pk_values, *non_pk_values, None).
+        # Columns that the given legend doesn't have a value for point at the final None.
+        stored_column_ids = legend.pk_columns + legend.non_pk_columns
+        position_by_id = {c: i for i, c in enumerate(stored_column_ids)}
+        missing = len(stored_column_ids)
+        positions = tuple(position_by_id.get(c.id, missing) for c in self.schema)
+        return len(legend.pk_columns), len(legend.non_pk_columns), positions
+
+    def value_tuples(self, feature):
+        """
+        Takes a feature - either a dict of values keyed by column name, or a list / tuple of values in schema order.
+        Returns (pk_values, non_pk_values) - the same as legend.raw_dict_to_value_tuples(schema.feature_to_raw_dict(feature))
+        """
+        if isinstance(feature, dict) or hasattr(feature, "keys"):
+            pk_values = tuple(feature[n] for n in self.pk_names)
+            non_pk_values = tuple(feature[n] for n in self.non_pk_names)
+        else:
+            assert len(feature) == len(self.column_names)
+            pk_values = tuple(feature[i] for i in self.pk_indices)
+            non_pk_values = tuple(feature[i] for i in self.non_pk_indices)
+        return pk_values, non_pk_values
+
+    def encode(self, feature):
+        """Given a feature, returns (pk_values, data) - where data is the blob that should be written."""
+        pk_values, non_pk_values = self.value_tuples(feature)
+        return pk_values, msg_pack([self.legend_hash, non_pk_values])
+
+    def encode_many(self, features):
+        """Generator. Same as encode, but for an iterable of features."""
+        legend_hash = self.legend_hash
+        value_tuples = self.value_tuples
+        for feature in features:
+            pk_values, non_pk_values = value_tuples(feature)
+            yield pk_values, msg_pack([legend_hash, non_pk_values])
+
+    def decode(self, pk_values, data, get_legend):
+        """
+        Inverse of encode. Returns a dict of values keyed by column name, in schema order.
+        get_legend - a callable that returns the legend for a legend-hash, which is only called
+            the first time this codec encounters a feature stored with a legend other than its own.
+        """
+        legend_hash, non_pk_values = msg_unpack(data)
+        plan = self._decode_plans.get(legend_hash)
+        if plan is None:
+            plan = self._decode_plans[legend_hash] = self._decode_plan(
+                get_legend(legend_hash)
+            )
+        num_pks, num_non_pks, positions = plan
+        assert len(pk_values) == num_pks
+        assert len(non_pk_values) == num_non_pks
+        values = (*pk_values, *non_pk_values, None)
+        return {name: values[p] for name, p in zip(self.column_names, positions)}
+
+    def decode_many(self, items, get_legend):
+        """Generator. Same as decode, but for an iterable of (pk_values, data) tuples."""
+        for pk_values, data in items:
+            yield self.decode(pk_values, data, get_legend)
 
 
 def pk_index_ordering(column):
@@ -225,6 +319,7 @@ class Schema:
             c for c in sorted(columns, key=pk_index_ordering) if c.pk_index is not None
         )
         self._hash = hash(self._columns)
+        self._codec = None
 
     @property
     def columns(self):
@@ -242,6 +337,13 @@ class Schema:
     def pk_columns(self):
         return self._pk_columns
 
+    @property
+    def codec(self):
+        """The FeatureCodec for encoding and decoding features with this schema."""
+        if self._codec is None:
+            self._codec = FeatureCodec(self)
+        return self._codec
+
     @property
     @functools.lru_cache(maxsize=1)
     def non_pk_columns(self):
@@ -329,9 +431,8 @@ class Schema:
         Given a feature, encode it in binary using this schema.
         If without_pk is True, the resulting bytes don't depend on the feature's pk values.
         """
-        raw_dict = self.feature_to_raw_dict(feature)
-        pk_values, non_pk_values = self.legend.raw_dict_to_value_tuples(raw_dict)
-        legend_hash = self.legend.hexhash()
+        pk_values, non_pk_values = self.codec.value_tuples(feature)
+        legend_hash = self.codec.legend_hash
         data = (
             [legend_hash, non_pk_values]
             if without_pk
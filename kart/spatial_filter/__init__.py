@@ -123,6 +123,11 @@ def resolve(ctx, reference, do_envelope, output_format):
     default=False,
     help="Don't do any indexing, instead just output what would be indexed.",
 )
+@click.option(
+    "--num-processes",
+    type=click.INT,
+    help="How many processes to use to calculate feature envelopes. Defaults to the number of available CPU cores.",
+)
 @click.option(
     "--debug",
     hidden=True,
@@ -133,7 +138,7 @@ def resolve(ctx, reference, do_envelope, output_format):
     nargs=-1,
 )
 @click.pass_context
-def index(ctx, clear_existing, dry_run, debug, commits):
+def index(ctx, clear_existing, dry_run, num_processes, debug, commits):
     """
     Maintains the index needed to perform a spatially-filtered clone using this repo as the server.
     Indexes all features added by the supplied commits and their ancestors.
@@ -152,6 +157,11 @@ def index(ctx, clear_existing, dry_run, debug, commits):
         debug_index(repo, debug)
         return
 
+    # This is needed to allow just-in-time fetching features that are outside the spatial filter,
+    # but are needed by the client for some specific operation:
+    if "uploadpack.allowAnySHA1InWant" not in repo.config:
+        repo.config["uploadpack.allowAnySHA1InWant"] = True
+
     if not commits:
         commits = resolve_all_commit_refs(repo)
     else:
@@ -163,6 +173,7 @@ def index(ctx, clear_existing, dry_run, debug, commits):
         verbosity=ctx.obj.verbosity + 1,
         clear_existing=clear_existing,
         dry_run=dry_run,
+        num_processes=num_processes,
     )
 
 
@@ -601,6 +612,43 @@ class SpatialFilter:
         click.echo(f"Error applying spatial filter to geometry:\n{err}", err=True)
         return MatchResult.MATCHING
 
+    @property
+    @functools.lru_cache(maxsize=1)
+    def envelope_wgs84(self):
+        """
+        Returns a (w, s, e, n) envelope in EPSG:4326 that contains the filter geometry - calculated the same way as
+        the envelopes stored in the spatial filter index, so that the two can be compared. Returns None if this is
+        the match-all filter, or if the envelope can't be calculated.
+        """
+        if self.match_all or self.crs is None:
+            return None
+
+        from osgeo import osr
+
+        from .index import CannotIndex, transform_minmax_envelope
+
+        min_x, max_x, min_y, max_y = self.filter_env
+        try:
+            transform = osr.CoordinateTransformation(self.crs, make_crs("EPSG:4326"))
+            return transform_minmax_envelope((min_x, min_y, max_x, max_y), transform)
+        except (CannotIndex, RuntimeError):
+            return None
+
+    def filter_feature_blobs(self, repo, feature_blobs):
+        """
+        Yields each of the given feature blobs, except for those that the spatial filter index shows can't match
+        this spatial filter - None is yielded in place of each of those. The blobs that are yielded still need to be
+        decoded and checked using matches(). If there is no spatial filter index, every blob is yielded.
+        """
+        envelope_wgs84 = self.envelope_wgs84
+        if envelope_wgs84 is None:
+            yield from feature_blobs
+            return
+
+        from .index import filter_feature_blobs_using_index
+
+        yield from filter_feature_blobs_using_index(repo, feature_blobs, envelope_wgs84)
+
     def matches_delta_value(self, delta_key_value):
         # Returns a MatchResult describing whether the feature contained by the given Delta KeyValue matches this
         # spatial filter. The feature may need to be lazily loaded, or it may turn out not to be present in this repo,
@@ -1,10 +1,12 @@
 import functools
 import logging
 import math
+import os
 import re
 import subprocess
 import sys
 import time
+from concurrent.futures import ProcessPoolExecutor
 
 import click
 import pygit2
@@ -14,15 +16,16 @@ from pysqlite3 import dbapi2 as sqlite
 from kart.cli_util import tool_environment
 from kart.crs_util import make_crs, normalise_wkt
 from kart.exceptions import InvalidOperation, SubprocessError
-from kart.geometry import Geometry
+from kart.geometry import Geometry, geom_envelopes
 from kart.repo import KartRepoFiles
 from kart.serialise_util import msg_unpack
 from kart.sqlalchemy import TableSet
 from kart.sqlalchemy.sqlite import sqlite_engine
 from kart.structs import CommitWithReference
+from kart.utils import chunk, submit_with_bounded_in_flight
 from sqlalchemy import Column, Table
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.types import BLOB
+from sqlalchemy.types import BLOB, TEXT
 
 L = logging.getLogger("kart.spatial_filter.index")
 
@@ -43,6 +46,16 @@ def flush_bulk_warns(self):
             self.bulk_warns[message] = -occurrences
 
 
+def add_bulk_warns(self, bulk_warns):
+    """
+    Adds bulk warnings that were buffered elsewhere - eg by a worker process - as if buffered_bulk_warn had been
+    called for each occurrence. bulk_warns is a dict of {message: (occurrences, sample)}.
+    """
+    for message, (occurrences, sample) in bulk_warns.items():
+        self.bulk_warns[message] = abs(self.bulk_warns.get(message, 0)) + occurrences
+        self.bulk_warn_samples[message] = sample
+
+
 L.buffered_bulk_warn = buffered_bulk_warn.__get__(L)
 L.flush_bulk_warns = flush_bulk_warns.__get__(L)
 L.bulk_warns = {}
@@ -64,7 +77,12 @@ def _revlist_command(repo):
 DS_PATH_PATTERN = r"(.+)/\.(sno|table)-dataset/"
 
 
-def _parse_revlist_output(repo, line_iter, rel_path_pattern):
+def _parse_revlist_output(repo, line_iter, rel_path_pattern, *, read_objects=True):
+    """
+    Yields (commit_id, ds_path, blob) for every blob in the rev-list output with a path matching rel_path_pattern.
+    If read_objects is False, yields (commit_id, ds_path, oid) instead, without reading the object from the repo -
+    so the object could be a tree which happens to match the pattern, and the caller needs to check.
+    """
     full_path_pattern = re.compile(DS_PATH_PATTERN + rel_path_pattern)
 
     commit_id = None
@@ -81,6 +99,9 @@ def _parse_revlist_output(repo, line_iter, rel_path_pattern):
         if not m:
             continue
         ds_path = m.group(1)
+        if not read_objects:
+            yield commit_id, ds_path, oid
+            continue
         obj = repo[oid]
         if obj.type_str == "blob":
             yield commit_id, ds_path, obj
@@ -97,11 +118,25 @@ class CrsHelper:
     the feature was added (ie, we can be sure there is no overlap).
     """
 
-    def __init__(self, repo, start_commits=None, stop_commits=None):
+    def __init__(
+        self,
+        repo,
+        start_commits=None,
+        stop_commits=None,
+        crs_cache=None,
+        crs_history=None,
+    ):
         self.repo = repo
         self.ds_to_transforms = {}
         self.target_crs = make_crs("EPSG:4326")
         self._distinct_crs_list = []
+        # The normalised WKT of each CRS found in each dataset's history, keyed by (ds_path, crs_oid).
+        # This is persisted in the index database - see load_crs_cache and save_crs_cache.
+        self.crs_cache = crs_cache if crs_cache is not None else {}
+        self.new_crs_cache_entries = {}
+        # The WKT of each CRS that applies to the features of each dataset at each commit, as
+        # {ds_path: {commit_id: (wkt, ...)}}. This is all a CrsHelper in a worker process needs - see load_crs_history.
+        self.crs_history = crs_history if crs_history is not None else {}
         if start_commits is not None:
             self.start_stop_spec = [*start_commits, "--not", *stop_commits]
         else:
@@ -119,15 +154,62 @@ class CrsHelper:
             )
         return result
 
+    def load_crs_history(self):
+        """
+        Walks the commits being indexed to find the CRS history of every dataset in them - see crs_history - so that
+        it can be passed to the worker processes, which then needn't walk the commits themselves.
+        """
+        ds_paths = set()
+        for commit_id in self._all_commits():
+            datasets = self.repo.datasets(commit_id, filter_dataset_type="table")
+            ds_paths.update(ds.path for ds in datasets)
+        for ds_path in sorted(ds_paths):
+            if ds_path not in self.crs_history:
+                self._load_crs_history_for_dataset(ds_path)
+        return self.crs_history
+
     def _load_transforms_for_dataset(self, ds_path, verbose=False):
         if ds_path in self.ds_to_transforms:
             return self.ds_to_transforms[ds_path]
 
-        seen_crs_oid_set = set()
-        transform_set = set()
+        crs_history = self.crs_history.get(ds_path)
+        if crs_history is None:
+            crs_history = self._load_crs_history_for_dataset(ds_path)
+
+        # Commits with the same CRS definitions share the same list of transforms.
+        wkts_to_transform_list = {}
         transform_list = []
         commit_id_to_transform_list = {}
 
+        for commit_id, wkts in crs_history.items():
+            transform_list = wkts_to_transform_list.get(wkts)
+            if transform_list is None:
+                transform_list = []
+                for wkt in wkts:
+                    transform = self.transform_from_src_crs(self.crs_from_wkt(wkt))
+                    if transform not in transform_list:
+                        transform_list.append(transform)
+                wkts_to_transform_list[wkts] = transform_list
+            commit_id_to_transform_list[commit_id] = transform_list
+            if verbose:
+                descs = [t.desc for t in transform_list]
+                trunc = _truncate_oid(self.repo)
+                click.echo(
+                    f"Transforms for {ds_path} at {commit_id[:trunc]}: {', '.join(descs)}"
+                )
+
+        descs = [t.desc for t in transform_list]
+        info = click.echo if verbose else L.info
+        info(f"Loaded CRS transforms for {ds_path}: {', '.join(descs)}")
+
+        self.ds_to_transforms[ds_path] = commit_id_to_transform_list
+        return commit_id_to_transform_list
+
+    def _load_crs_history_for_dataset(self, ds_path):
+        seen_crs_oid_set = set()
+        wkts = ()
+        commit_id_to_wkts = {}
+
         for commit_id in self._all_commits():
             crs_tree = self._get_crs_tree_for_ds_at_commit(ds_path, commit_id)
             if crs_tree is not None and crs_tree.id.hex not in seen_crs_oid_set:
@@ -138,30 +220,21 @@ class CrsHelper:
                         continue
                     seen_crs_oid_set.add(crs_blob_oid)
                     try:
-                        crs = self.crs_from_oid(crs_blob.id.hex)
-                        transform = self.transform_from_src_crs(crs)
-                        if transform not in transform_set:
-                            transform_set.add(transform)
-                            transform_list = transform_list + [transform]
+                        wkt = self._crs_wkt(ds_path, crs_blob_oid)
+                        # Only CRS definitions that can be transformed are kept.
+                        self.transform_from_src_crs(self.crs_from_wkt(wkt))
                     except Exception:
                         L.warning(
                             f"Couldn't load transform for CRS {crs_blob_oid} ({crs_blob.name} at {ds_path})",
                             exc_info=True,
                         )
-            commit_id_to_transform_list[commit_id] = transform_list
-            if verbose:
-                descs = [t.desc for t in transform_list]
-                trunc = _truncate_oid(self.repo)
-                click.echo(
-                    f"Transforms for {ds_path} at {commit_id[:trunc]}: {', '.join(descs)}"
-                )
-
-        descs = [t.desc for t in transform_list]
-        info = click.echo if verbose else L.info
-        info(f"Loaded CRS transforms for {ds_path}: {', '.join(descs)}")
+                        continue
+                    if wkt not in wkts:
+                        wkts = wkts + (wkt,)
+            commit_id_to_wkts[commit_id] = wkts
 
-        self.ds_to_transforms[ds_path] = commit_id_to_transform_list
-        return commit_id_to_transform_list
+        self.crs_history[ds_path] = commit_id_to_wkts
+        return commit_id_to_wkts
 
     def _get_crs_tree_for_ds_at_commit(self, ds_path, commit_id):
         root_tree = self.repo[commit_id].peel(pygit2.Tree)
@@ -198,9 +271,23 @@ class CrsHelper:
             )
         return commits.splitlines()
 
+    def _crs_wkt(self, ds_path, crs_oid):
+        key = (ds_path, crs_oid)
+        wkt = self.crs_cache.get(key)
+        if wkt is None:
+            wkt = normalise_wkt(self.repo[crs_oid].data.decode("utf-8"))
+            self.crs_cache[key] = wkt
+            self.new_crs_cache_entries[key] = wkt
+        return wkt
+
+    def pop_new_crs_cache_entries(self):
+        """Returns the CRS definitions found since this was last called, which aren't yet persisted."""
+        result = self.new_crs_cache_entries
+        self.new_crs_cache_entries = {}
+        return result
+
     @functools.lru_cache()
-    def crs_from_oid(self, crs_oid):
-        wkt = normalise_wkt(self.repo[crs_oid].data.decode("utf-8"))
+    def crs_from_wkt(self, wkt):
         result = make_crs(wkt)
         for prior_result in self._distinct_crs_list:
             if result.IsSame(prior_result):
@@ -237,6 +324,21 @@ class SpatialTreeTables(TableSet):
             sqlite_with_rowid=False,
         )
 
+        # "crs_definitions" caches the normalised WKT of the CRS definitions found in the history of each dataset,
+        # so that a CRS definition isn't read and normalised again each time the index is updated. (The commits that
+        # aren't yet indexed are still walked to find which CRS applies at each one, and the CRS transforms are still
+        # created from the WKT each time).
+        self.crs_definitions = Table(
+            "crs_definitions",
+            self.sqlalchemy_metadata,
+            Column("ds_path", TEXT, nullable=False, primary_key=True),
+            # "crs_id" is the git object ID of a CRS definition, in binary (20 bytes).
+            Column("crs_id", BLOB, nullable=False, primary_key=True),
+            # "wkt" is the normalised WKT of the CRS definition.
+            Column("wkt", TEXT, nullable=False),
+            sqlite_with_rowid=False,
+        )
+
         # "feature_envelopes" maps every feature to its encoded envelope.
         # If a feature has no envelope (eg no geometry), then it is not found in this table.
         self.blobs = Table(
@@ -256,9 +358,29 @@ SpatialTreeTables.copy_tables_to_class()
 def drop_tables(sess):
     sess.execute("DROP TABLE IF EXISTS commits;")
     sess.execute("DROP TABLE IF EXISTS feature_envelopes;")
+    sess.execute("DROP TABLE IF EXISTS crs_definitions;")
+
+
+def load_crs_cache(sess):
+    """Loads the CRS definitions persisted in the index database - see CrsHelper.crs_cache."""
+    return {
+        (row[0], row[1].hex()): row[2]
+        for row in sess.execute("SELECT ds_path, crs_id, wkt FROM crs_definitions;")
+    }
+
+
+def save_crs_cache(dbcur, crs_cache_entries):
+    """Persists newly found CRS definitions to the index database - see CrsHelper.crs_cache."""
+    dbcur.executemany(
+        "INSERT OR REPLACE INTO crs_definitions (ds_path, crs_id, wkt) VALUES (?, ?, ?);",
+        [
+            (ds_path, bytes.fromhex(crs_oid), wkt)
+            for (ds_path, crs_oid), wkt in crs_cache_entries.items()
+        ],
+    )
 
 
-def iter_feature_blobs(repo, start_commits, stop_commits):
+def iter_feature_blobs(repo, start_commits, stop_commits, *, read_objects=True):
     cmd = [*_revlist_command(repo), *start_commits, "--not", *stop_commits]
     try:
         p = subprocess.Popen(
@@ -267,12 +389,76 @@ def iter_feature_blobs(repo, start_commits, stop_commits):
             encoding="utf8",
             env=tool_environment(),
         )
-        yield from _parse_revlist_output(repo, p.stdout, r"feature/.+")
+        yield from _parse_revlist_output(
+            repo, p.stdout, r"feature/.+", read_objects=read_objects
+        )
+    except subprocess.CalledProcessError as e:
+        raise SubprocessError(
+            f"There was a problem with git rev-list: {e}", called_process_error=e
+        )
+
+
+def iter_feature_oids_by_tree_diff(repo, start_commits, stop_commits):
+    """
+    Yields (commit_id, ds_path, oid) for every feature blob added or modified by a commit that is reachable from
+    start_commits but not from stop_commits. This visits the same feature blobs as iter_feature_blobs, but works by
+    diffing each commit's tree against its parents - so is much faster when building on an existing index, since
+    subtrees that are the same as in the (already indexed) parents are skipped without being read.
+    Feature blobs that are missing from the repo - ie promised - are still yielded, and the caller needs to check.
+    """
+    cmd = ["git", "-C", repo.path, "rev-list", *start_commits, "--not", *stop_commits]
+    try:
+        r = subprocess.run(
+            cmd,
+            encoding="utf8",
+            check=True,
+            capture_output=True,
+            env=tool_environment(),
+        )
     except subprocess.CalledProcessError as e:
         raise SubprocessError(
             f"There was a problem with git rev-list: {e}", called_process_error=e
         )
 
+    full_path_pattern = re.compile(DS_PATH_PATTERN + r"feature/.+")
+    for commit_id in r.stdout.splitlines():
+        commit = repo[commit_id]
+        if not commit.parents:
+            yield from _new_feature_oids(
+                commit_id, full_path_pattern, None, commit.tree
+            )
+            continue
+
+        # A merge commit only adds the features which aren't in any of its parents.
+        parent_trees = [parent.tree for parent in commit.parents]
+        new_feature_oids = _new_feature_oids(
+            commit_id, full_path_pattern, parent_trees[0], commit.tree
+        )
+        if len(parent_trees) > 1:
+            new_feature_oids = list(new_feature_oids)
+            for parent_tree in parent_trees[1:]:
+                oids = {
+                    f[2]
+                    for f in _new_feature_oids(
+                        commit_id, full_path_pattern, parent_tree, commit.tree
+                    )
+                }
+                new_feature_oids = [f for f in new_feature_oids if f[2] in oids]
+        yield from new_feature_oids
+
+
+def _new_feature_oids(commit_id, full_path_pattern, old_tree, new_tree):
+    if old_tree is None:
+        diff = new_tree.diff_to_tree(swap=True)
+    else:
+        diff = old_tree.diff_to_tree(new_tree)
+    for delta in diff.deltas:
+        if delta.status not in (pygit2.GIT_DELTA_ADDED, pygit2.GIT_DELTA_MODIFIED):
+            continue
+        m = full_path_pattern.match(delta.new_file.path)
+        if m:
+            yield commit_id, m.group(1), delta.new_file.id.hex
+
 
 def _minimal_description_of_commit_set(repo, commits):
     """
@@ -339,7 +525,12 @@ def _format_commits(repo, commit_ids):
 
 
 def update_spatial_filter_index(
-    repo, commits, verbosity=1, clear_existing=False, dry_run=False
+    repo,
+    commits,
+    verbosity=1,
+    clear_existing=False,
+    dry_run=False,
+    num_processes=None,
 ):
     """
     Index the commits given in commit_spec, and write them to the feature_envelopes.db repo file.
@@ -348,13 +539,9 @@ def update_spatial_filter_index(
     commits - a set of commit IDs to index (ancestors of these are implicitly included).
     verbosity - how much non-essential information to output.
     clear_existing - when true, deletes any pre-existing data before re-indexing.
+    num_processes - how many worker processes calculate envelopes. Defaults to the number of available CPU cores.
     """
 
-    # This is needed to allow just-in-time fetching features that are outside the spatial filter,
-    # but are needed by the client for some specific operation:
-    if "uploadpack.allowAnySHA1InWant" not in repo.config:
-        repo.config["uploadpack.allowAnySHA1InWant"] = True
-
     db_path = repo.gitdir_file(KartRepoFiles.FEATURE_ENVELOPES)
     engine = sqlite_engine(db_path)
 
@@ -363,17 +550,33 @@ def update_spatial_filter_index(
         repo, commits, engine, clear_existing=clear_existing
     )
 
-    crs_helper = CrsHelper(repo, start_commits, stop_commits)
+    echo = click.echo if verbosity >= 1 else L.info
 
     if not start_commits:
-        click.echo("Nothing to do: index already up to date.")
+        echo("Nothing to do: index already up to date.")
         return
 
-    feature_blob_iter = iter_feature_blobs(repo, start_commits, stop_commits)
+    if num_processes is None:
+        from kart.fast_import import get_default_num_processes
+
+        num_processes = get_default_num_processes()
+    num_processes = max(1, num_processes)
+
+    # When building on an existing index, only the trees that have changed since the indexed commits need to be read.
+    if stop_commits:
+        feature_oids = iter_feature_oids_by_tree_diff(repo, start_commits, stop_commits)
+    else:
+        feature_oids = iter_feature_blobs(
+            repo, start_commits, stop_commits, read_objects=False
+        )
+    # The feature blobs are read by whichever process calculates their envelopes - see _index_feature_batch.
+    feature_oid_batches = chunk(feature_oids, INDEX_BATCH_SIZE)
 
     progress_every = None
     if verbosity >= 1:
         progress_every = max(100, 100_000 // (10 ** (verbosity - 1)))
+    # Progress is reported each time the buffered envelopes are flushed - so flush more often at higher verbosity.
+    flush_every = min(progress_every or INDEX_FLUSH_SIZE, INDEX_FLUSH_SIZE)
 
     with sessionmaker(bind=engine)() as sess:
         if clear_existing:
@@ -383,6 +586,9 @@ def update_spatial_filter_index(
         envelope_length = sess.scalar(
             "SELECT length(envelope) FROM feature_envelopes LIMIT 1;"
         )
+        crs_cache = load_crs_cache(sess)
+
+    crs_helper = CrsHelper(repo, start_commits, stop_commits, crs_cache=crs_cache)
 
     bits_per_value = envelope_length * 8 // 4 if envelope_length else None
     encoder = EnvelopeEncoder(bits_per_value)
@@ -392,9 +598,9 @@ def update_spatial_filter_index(
     ancestor_desc = _format_commits(repo, stop_commits)
     current_desc = _format_commits(repo, start_commits)
     if not ancestor_desc:
-        click.echo(f"Indexing from the very start up to {current_desc} ...")
+        echo(f"Indexing from the very start up to {current_desc} ...")
     else:
-        click.echo(f"Indexing from {ancestor_desc} up to {current_desc} ...")
+        echo(f"Indexing from {ancestor_desc} up to {current_desc} ...")
 
     if dry_run:
         click.echo("(Not performing the indexing due to --dry-run.")
@@ -402,51 +608,304 @@ def update_spatial_filter_index(
 
     t0 = time.monotonic()
     i = 0
-    trunc = _truncate_oid(repo)
+    buffered_count = 0
+    buffered_rows = []
+    buffered_crs_cache_entries = {}
 
     # Using sqlite directly here instead of sqlalchemy is about 10x faster.
-    # Possibly due to huge number of unbatched queries.
-    # TODO - investigate further.
     db = sqlite.connect(f"file:{db_path}", uri=True)
-    with db:
-        dbcur = db.cursor()
-
-        for i, (commit_id, ds_path, feature_blob) in enumerate(feature_blob_iter):
-            if i and progress_every and i % progress_every == 0:
-                click.echo(f"  {i:,d} features... @{time.monotonic()-t0:.1f}s")
-                L.flush_bulk_warns()
+    dbcur = db.cursor()
+    orig_journal_mode = _begin_bulk_index(dbcur)
+
+    def _flush():
+        # Each flush is one transaction. If indexing is interrupted, the commits table won't have been updated,
+        # so the next indexing run will redo these - and INSERT OR REPLACE makes that harmless.
+        nonlocal buffered_count
+        dbcur.executemany(
+            "INSERT OR REPLACE INTO feature_envelopes (blob_id, envelope) VALUES (?, ?);",
+            buffered_rows,
+        )
+        save_crs_cache(dbcur, buffered_crs_cache_entries)
+        db.commit()
+        buffered_rows.clear()
+        buffered_crs_cache_entries.clear()
+        buffered_count = 0
+        if progress_every:
+            click.echo(f"  {i:,d} features... @{time.monotonic()-t0:.1f}s")
+        L.flush_bulk_warns()
 
-            transforms = crs_helper.transforms_for_dataset_at_commit(
-                ds_path,
-                commit_id,
+    try:
+        if num_processes == 1:
+            trunc = _truncate_oid(repo)
+            batch_results = (
+                _index_feature_batch(repo, crs_helper, encoder, trunc, batch)
+                for batch in feature_oid_batches
             )
-            if not transforms:
-                continue
-            geom = get_geometry(repo, feature_blob)
-            if geom is None or geom.is_empty():
-                continue
-            feature_oid = feature_blob.id.hex
-            feature_desc = f"{commit_id[:trunc]}:{ds_path}:{feature_oid[:trunc]}"
-            envelope = get_envelope_for_indexing(geom, transforms, feature_desc)
-            if envelope is None:
-                continue
-
-            params = (bytes.fromhex(feature_oid), encoder.encode(envelope))
-            dbcur.execute(
-                "INSERT OR REPLACE INTO feature_envelopes (blob_id, envelope) VALUES (?, ?);",
-                params,
+        else:
+            # The commits are walked to find the CRS definitions only once, here, rather than in every worker.
+            crs_history = crs_helper.load_crs_history()
+            buffered_crs_cache_entries.update(crs_helper.pop_new_crs_cache_entries())
+            executor = ProcessPoolExecutor(
+                max_workers=num_processes,
+                initializer=_init_index_worker,
+                initargs=(
+                    repo.path,
+                    list(start_commits),
+                    list(stop_commits),
+                    encoder.BITS_PER_VALUE,
+                    crs_history,
+                ),
+            )
+            batch_results = (
+                future.result()
+                for future in submit_with_bounded_in_flight(
+                    executor,
+                    _index_feature_batch_in_worker,
+                    feature_oid_batches,
+                    num_processes * 2,
+                )
             )
 
-        click.echo(f"  {i:,d} features... @{time.monotonic()-t0:.1f}s")
-        L.flush_bulk_warns()
-
-        # Update indexed commits.
+        # All the envelopes are written by this process, as each batch of them is calculated.
+        try:
+            for batch_count, rows, bulk_warns, crs_entries in batch_results:
+                i += batch_count
+                buffered_count += batch_count
+                buffered_rows.extend(rows)
+                buffered_crs_cache_entries.update(crs_entries)
+                add_bulk_warns(L, bulk_warns)
+                if buffered_count >= flush_every:
+                    _flush()
+        finally:
+            if num_processes > 1:
+                executor.shutdown()
+
+        # The last envelopes are written in the same transaction as the indexed commits.
         params = [(bytes.fromhex(commit_id),) for commit_id in all_independent_commits]
         dbcur.execute("DELETE FROM commits;")
         dbcur.executemany("INSERT INTO commits (commit_id) VALUES (?);", params)
+        _flush()
+        _finish_bulk_index(dbcur)
+    finally:
+        db.rollback()
+        _restore_journal_mode(dbcur, orig_journal_mode)
+        db.close()
 
     t1 = time.monotonic()
-    click.echo(f"Indexed {i} features in {t1-t0:.1f}s")
+    echo(f"Indexed {i} features in {t1-t0:.1f}s")
+
+
+def update_spatial_filter_index_after_fetch(repo):
+    """
+    If a spatial filter is active and this repo already has a spatial filter index, brings the index up to date with
+    all the refs in the repo. This is called after kart fetch and kart pull - only the newly fetched commits need to be
+    indexed. A repo that has never been indexed is left alone - building the index in the first place is left to
+    `kart spatial-filter index`.
+    """
+    if repo.spatial_filter.match_all or not _has_indexed_commits(repo):
+        return
+    # A fetch usually only brings in a few new features, which isn't worth starting a pool of worker processes for.
+    update_spatial_filter_index(
+        repo, resolve_all_commit_refs(repo), verbosity=0, num_processes=1
+    )
+
+
+def _has_indexed_commits(repo):
+    """Returns True if the spatial filter index of this repo exists and has indexed at least one commit."""
+    db_path = repo.gitdir_file(KartRepoFiles.FEATURE_ENVELOPES)
+    if not db_path.exists():
+        return False
+    with sessionmaker(bind=sqlite_engine(db_path))() as sess:
+        has_commits_table = sess.scalar(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'commits';"
+        )
+        if not has_commits_table:
+            return False
+        return bool(sess.scalar("SELECT EXISTS(SELECT 1 FROM commits);"))
+
+
+# How many features are indexed between each write to the index database - see update_spatial_filter_index.
+INDEX_FLUSH_SIZE = 100_000
+
+
+def _begin_bulk_index(dbcur):
+    """
+    Switches the index database to WAL mode with relaxed syncing, which is much faster for bulk writes.
+    A crash can lose the most recent transactions, but can't corrupt the database - and the lost envelopes will be
+    reindexed, since the indexed commits are written in the final transaction.
+    Returns the original journal mode, to be restored by _restore_journal_mode.
+    """
+    orig_journal_mode = dbcur.execute("PRAGMA journal_mode;").fetchone()[0]
+    dbcur.execute("PRAGMA journal_mode = WAL;")
+    dbcur.execute("PRAGMA synchronous = NORMAL;")
+    return orig_journal_mode
+
+
+def _finish_bulk_index(dbcur):
+    """
+    Called once indexing has succeeded - updates the query planner's statistics, and then checkpoints the WAL.
+    """
+    dbcur.execute("ANALYZE;")
+    dbcur.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+
+
+def _restore_journal_mode(dbcur, orig_journal_mode):
+    """
+    Restores the original journal mode, whether or not indexing succeeded - the index is read by the spatial-filter
+    git extension, which may not be able to write the WAL index files. This is best-effort, so that if indexing
+    failed, the original error is the one that is raised.
+    """
+    try:
+        dbcur.execute(f"PRAGMA journal_mode = {orig_journal_mode};")
+    except sqlite.Error as e:
+        L.warning("Couldn't restore the spatial filter index's journal mode: %s", e)
+
+
+# How many features are sent to a worker process at once - see _index_feature_batch.
+INDEX_BATCH_SIZE = 1000
+
+
+def _index_feature_batch(repo, crs_helper, encoder, trunc, batch):
+    """
+    Calculates the envelopes of a batch of features - where batch is a list of (commit_id, ds_path, oid),
+    and the oids may also include trees or promised blobs, which are skipped.
+    Returns (feature_count, rows, bulk_warns, crs_cache_entries) - the number of feature blobs in the batch, the
+    (blob_id, envelope) rows to write to the feature_envelopes table, any buffered bulk warnings, and any
+    newly found CRS definitions to persist.
+    """
+    # Collect this batch's warnings separately, so they can be passed back to the writing process.
+    outer_bulk_warns, outer_bulk_warn_samples = L.bulk_warns, L.bulk_warn_samples
+    L.bulk_warns, L.bulk_warn_samples = {}, {}
+    try:
+        feature_count, rows = _index_feature_batch_rows(
+            repo, crs_helper, encoder, trunc, batch
+        )
+        bulk_warns = {
+            message: (occurrences, L.bulk_warn_samples[message])
+            for message, occurrences in L.bulk_warns.items()
+        }
+    finally:
+        L.bulk_warns, L.bulk_warn_samples = outer_bulk_warns, outer_bulk_warn_samples
+    return feature_count, rows, bulk_warns, crs_helper.pop_new_crs_cache_entries()
+
+
+def _index_feature_batch_rows(repo, crs_helper, encoder, trunc, batch):
+    feature_count = 0
+    rows = []
+    transform_groups = {}
+    for commit_id, ds_path, oid in batch:
+        feature_blob = repo.get(oid)
+        if feature_blob is None or feature_blob.type_str != "blob":
+            continue
+        feature_count += 1
+
+        transforms = crs_helper.transforms_for_dataset_at_commit(
+            ds_path,
+            commit_id,
+        )
+        if not transforms:
+            continue
+        geom = get_geometry(repo, feature_blob)
+        if geom is None or geom.is_empty():
+            continue
+        feature_desc = f"{commit_id[:trunc]}:{ds_path}:{oid[:trunc]}"
+        # Features with the same transforms have their envelopes calculated together.
+        # (The same list of transforms is shared between all the commits where it applies).
+        group = transform_groups.setdefault(id(transforms), (transforms, [], []))
+        group[1].append(geom)
+        group[2].append((oid, feature_desc))
+
+    for transforms, geoms, features in transform_groups.values():
+        feature_descs = [feature_desc for oid, feature_desc in features]
+        envelopes = get_envelopes_for_indexing(geoms, transforms, feature_descs)
+        for (oid, feature_desc), envelope in zip(features, envelopes):
+            if envelope is not None:
+                rows.append((bytes.fromhex(oid), encoder.encode(envelope)))
+
+    return feature_count, rows
+
+
+# The state of an index worker process - see _init_index_worker.
+_worker_repo = None
+_worker_crs_helper = None
+_worker_encoder = None
+_worker_trunc = None
+
+
+def _init_index_worker(
+    repo_path, start_commits, stop_commits, bits_per_value, crs_history
+):
+    """
+    Initialises an index worker process, which has its own repo handle and CRS transforms -
+    see update_spatial_filter_index. The transforms are created from the CRS history found by the main process.
+    """
+    from kart.repo import KartRepo
+
+    global _worker_repo, _worker_crs_helper, _worker_encoder, _worker_trunc
+    _worker_repo = KartRepo(repo_path)
+    _worker_crs_helper = CrsHelper(
+        _worker_repo, start_commits, stop_commits, crs_history=crs_history
+    )
+    _worker_encoder = EnvelopeEncoder(bits_per_value)
+    _worker_trunc = _truncate_oid(_worker_repo)
+
+
+def _index_feature_batch_in_worker(batch):
+    return _index_feature_batch(
+        _worker_repo, _worker_crs_helper, _worker_encoder, _worker_trunc, batch
+    )
+
+
+# How many blob IDs are looked up in the index at once - see filter_feature_blobs_using_index.
+INDEX_LOOKUP_BATCH_SIZE = 500
+
+
+def filter_feature_blobs_using_index(repo, feature_blobs, envelope_wgs84):
+    """
+    Yields each of the given feature blobs, except those which the spatial filter index shows definitely don't
+    intersect the given (w, s, e, n) envelope - None is yielded in place of each of those, so the caller can still
+    count them. Blobs that aren't in the index - since they're not indexed yet, or they couldn't be indexed - are
+    always yielded. This means only the blobs that might intersect the envelope need to be read and decoded.
+    """
+    db_path = repo.gitdir_file(KartRepoFiles.FEATURE_ENVELOPES)
+    if not os.path.exists(db_path):
+        yield from feature_blobs
+        return
+
+    db = sqlite.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        dbcur = db.cursor()
+        try:
+            envelope_length = dbcur.execute(
+                "SELECT length(envelope) FROM feature_envelopes LIMIT 1;"
+            ).fetchone()
+        except sqlite.OperationalError:
+            envelope_length = None
+        if not envelope_length:
+            yield from feature_blobs
+            return
+
+        encoder = EnvelopeEncoder(envelope_length[0] * 8 // 4)
+        num_skipped = 0
+        for batch in chunk(feature_blobs, INDEX_LOOKUP_BATCH_SIZE):
+            params = [blob.id.raw for blob in batch]
+            sql = (
+                "SELECT blob_id, envelope FROM feature_envelopes "
+                f"WHERE blob_id IN ({','.join('?' * len(params))});"
+            )
+            envelopes = dict(dbcur.execute(sql, params))
+            for blob in batch:
+                envelope = envelopes.get(blob.id.raw)
+                if envelope is None or envelopes_intersect(
+                    encoder.decode(envelope), envelope_wgs84
+                ):
+                    yield blob
+                else:
+                    num_skipped += 1
+                    yield None
+        L.info("Skipped %d features using the spatial filter index", num_skipped)
+    finally:
+        db.close()
 
 
 def debug_index(repo, arg):
@@ -704,6 +1163,40 @@ def get_envelope_for_indexing(geom, transforms, feature_desc):
         return None
 
 
+def get_envelopes_for_indexing(geoms, transforms, feature_descs):
+    """
+    Returns a list of envelopes - one for each geometry - which are the same as get_envelope_for_indexing would return
+    for each geometry in turn. The envelopes are calculated together using NumPy where possible, so this is much
+    faster for large batches of small features. Any features which need special handling fall back to
+    get_envelope_for_indexing - as do all of them if NumPy is not available.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+
+    results = [None] * len(geoms)
+    # Calculating the union of envelopes in different CRSs is only done one feature at a time.
+    if np is not None and len(transforms) == 1:
+        try:
+            minmax_envelopes = geom_envelopes(geoms, calculate_if_missing=True)
+            envelopes = transform_minmax_envelopes(
+                minmax_envelopes[:, [0, 2, 1, 3]], transforms[0]
+            )
+        except Exception:
+            L.debug("Couldn't calculate envelopes as a batch", exc_info=True)
+        else:
+            for i in np.flatnonzero(~np.isnan(envelopes).any(axis=1)):
+                envelope = tuple(envelopes[i].tolist())
+                if _is_valid_envelope(envelope):
+                    results[i] = envelope
+
+    for i, geom in enumerate(geoms):
+        if results[i] is None:
+            results[i] = get_envelope_for_indexing(geom, transforms, feature_descs[i])
+    return results
+
+
 def _is_valid_envelope(env):
     return (
         (-180 <= env[0] <= 180)
@@ -889,6 +1382,50 @@ def transform_minmax_envelope(envelope, transform, buffer_for_curvature=True):
     return (w, s, e, n)
 
 
+def transform_minmax_envelopes(envelopes, transform):
+    """
+    Vectorised version of transform_minmax_envelope - given a NumPy array of envelopes in (min-x, min-y, max-x, max-y)
+    format, transforms all of their corners to EPSG:4326 using a single call to the given transform, and returns an
+    array of (w, s, e, n) envelopes. Only points, and envelopes that are less than a degree across once transformed
+    are handled - since their edges don't need segmenting to account for curvature, and they can't be split by the
+    antimeridian. The rows for any other envelope are left as NaN - so they can be transformed one at a time using
+    transform_minmax_envelope, which also raises the appropriate CannotIndex error.
+    """
+    import numpy as np
+
+    result = np.full((len(envelopes), 4), np.nan)
+    todo = np.flatnonzero(np.isfinite(envelopes).all(axis=1))
+    if not len(todo):
+        return result
+
+    # The same four corners as anticlockwise_ring_from_minmax_envelope, for every envelope.
+    corners = envelopes[todo][:, [0, 1, 2, 1, 2, 3, 0, 3]].reshape(-1, 2)
+    transformed = np.array(transform.TransformPoints(corners.tolist()), dtype=float)
+    transformed = transformed[:, :2].reshape(len(todo), 4, 2)
+    xs, ys = transformed[:, :, 0], transformed[:, :, 1]
+    min_x, max_x = xs.min(axis=1), xs.max(axis=1)
+    min_y, max_y = ys.min(axis=1), ys.max(axis=1)
+
+    # Points are transformed without a buffer - see transform_minmax_envelope.
+    is_point = (envelopes[todo, 0] == envelopes[todo, 2]) & (
+        envelopes[todo, 1] == envelopes[todo, 3]
+    )
+    biggest_dimension = np.maximum(max_x - min_x, max_y - min_y)
+    buffer = np.where(is_point, 0.0, 0.1 * biggest_dimension)
+    ok = (
+        np.isfinite(transformed).all(axis=(1, 2))
+        & (biggest_dimension < 1.0)
+        & (np.maximum(np.abs(min_y), np.abs(max_y)) <= 90)
+    )
+
+    w = _wrap_lon(min_x - buffer)
+    s = np.clip(min_y - buffer, -90, 90)
+    e = _wrap_lon(max_x + buffer)
+    n = np.clip(max_y + buffer, -90, 90)
+    result[todo[ok]] = np.stack([w, s, e, n], axis=1)[ok]
+    return result
+
+
 def anticlockwise_ring_from_minmax_envelope(envelope, segments_per_side=None):
     """Given an envelope in (min-x, min-y, max-x, max-y) format, builds an anticlockwise ring around it."""
     ring = ogr.Geometry(ogr.wkbLinearRing)
@@ -1024,6 +1561,18 @@ def _wrap_lon_envelope(w, e):
 INF = float("inf")
 
 
+def envelopes_intersect(env1, env2):
+    """
+    Returns True if two envelopes intersect (or touch), where both are in (w, s, e, n) order and both are "wrapped" -
+    see union_of_envelopes.
+    """
+    if env1[1] > env2[3] or env2[1] > env1[3]:
+        return False
+    w1, e1 = _unwrap_lon_envelope(env1[0], env1[2])
+    w2, e2 = _unwrap_lon_envelope(env2[0], env2[2])
+    return any(w1 <= e2 + shift and w2 + shift <= e1 for shift in (-360, 0, 360))
+
+
 def union_of_envelopes(env1, env2):
     """
     Returns the union of two envelopes where both are in (w, s, e, n) order and both are "wrapped" -
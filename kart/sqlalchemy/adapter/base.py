@@ -218,6 +218,22 @@ class BaseKartAdapter:
         """
         raise NotImplementedError()
 
+    @classmethod
+    def sql_delete_pks_in_table(cls, table_identifier, pk_col_name, pks_table):
+        """
+        Returns SQL that deletes every row from the given table that has a primary key value which is found in the
+        "pk" column of pks_table - a temporary table of primary key values. The default implementation uses a
+        subquery, subclasses can override this to use a DELETE ... JOIN syntax if the database supports one.
+
+        table_identifier - the quoted identifier of the table to delete from.
+        pk_col_name - the name of the primary key column of that table.
+        pks_table - a sqlalchemy table definition for the temporary table - see BaseDb.temporary_table.
+        """
+        return (
+            f"DELETE FROM {table_identifier} WHERE {cls.quote(pk_col_name)} IN "
+            f"(SELECT pk FROM {cls.quote_table(pks_table.name)});"
+        )
+
     # TODO - move other common functions - or at least declare their signatures - in BaseKartAdapter.
 
 
@@ -302,6 +302,14 @@ class KartAdapter_MySql(BaseKartAdapter, Db_MySql):
             )
         return result
 
+    @classmethod
+    def sql_delete_pks_in_table(cls, table_identifier, pk_col_name, pks_table):
+        # MySQL doesn't turn a DELETE ... WHERE pk IN (subquery) into a join, so the join is made explicit.
+        return (
+            f"DELETE T FROM {table_identifier} AS T "
+            f"INNER JOIN {cls.quote_table(pks_table.name)} AS P ON T.{cls.quote(pk_col_name)} = P.pk;"
+        )
+
     @classmethod
     def _type_def_for_column_schema(self, col, dataset=None):
         if col.data_type == "geometry":
@@ -339,6 +339,13 @@ class KartAdapter_Postgis(BaseKartAdapter, Db_Postgis):
             if value:
                 yield key, value
 
+    @classmethod
+    def sql_delete_pks_in_table(cls, table_identifier, pk_col_name, pks_table):
+        return (
+            f"DELETE FROM {table_identifier} AS T USING {cls.quote_table(pks_table.name)} AS P "
+            f"WHERE T.{cls.quote(pk_col_name)} = P.pk;"
+        )
+
     @classmethod
     def _type_def_for_column_schema(cls, col, dataset=None):
         if col.data_type == "geometry":
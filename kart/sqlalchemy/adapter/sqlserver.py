@@ -339,6 +339,13 @@ class KartAdapter_SqlServer(BaseKartAdapter, Db_SqlServer):
 
         return "geometry", extra_type_info
 
+    @classmethod
+    def sql_delete_pks_in_table(cls, table_identifier, pk_col_name, pks_table):
+        return (
+            f"DELETE T FROM {table_identifier} AS T "
+            f"INNER JOIN {cls.quote_table(pks_table.name)} AS P ON T.{cls.quote(pk_col_name)} = P.pk;"
+        )
+
     @classmethod
     def _type_def_for_column_schema(cls, col, dataset):
         if col.data_type == "geometry":
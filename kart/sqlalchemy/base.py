@@ -30,6 +30,14 @@ class BaseDb:
     def quote_table(cls, table_name, db_schema=None):
         return cls.preparer.format_table(sa.table(table_name, schema=db_schema))
 
+    @classmethod
+    def temporary_table(cls, table_name, *columns):
+        """
+        Returns a sqlalchemy Table for a temporary table with the given name and columns. Once created, the table
+        is only visible to the connection that created it, and is dropped when that connection is closed.
+        """
+        return sa.Table(table_name, sa.MetaData(), *columns, prefixes=["TEMPORARY"])
+
     @classmethod
     def list_tables(cls, sess, db_schema=None):
         """
@@ -15,7 +15,7 @@ class Db_MySql(BaseDb):
     preparer = MySQLIdentifierPreparer(MySQLDialect())
 
     @classmethod
-    def create_engine(cls, msurl):
+    def create_engine(cls, msurl, **kwargs):
         def _on_checkout(mysql_conn, connection_record, connection_proxy):
             dbcur = mysql_conn.cursor()
             # +00:00 is UTC, but unlike UTC, it works even without a timezone DB.
@@ -29,7 +29,7 @@ class Db_MySql(BaseDb):
         url_query = cls._append_to_query(url.query, {"program_name": "kart"})
         msurl = urlunsplit([cls.INTERNAL_SCHEME, url.netloc, url_path, url_query, ""])
 
-        engine = sqlalchemy.create_engine(msurl, poolclass=cls._pool_class())
+        engine = sqlalchemy.create_engine(msurl, poolclass=cls._pool_class(), **kwargs)
         sqlalchemy.event.listen(engine, "checkout", _on_checkout)
 
         return engine
@@ -39,6 +39,11 @@ class Db_SqlServer(BaseDb):
         engine = sqlalchemy.create_engine(msurl, poolclass=cls._pool_class())
         return engine
 
+    @classmethod
+    def temporary_table(cls, table_name, *columns):
+        # SQL Server has no CREATE TEMPORARY TABLE - a table is temporary if its name starts with a '#'.
+        return sqlalchemy.Table(f"#{table_name}", sqlalchemy.MetaData(), *columns)
+
     @classmethod
     def get_odbc_drivers(cls):
         """Returns a list of names of all ODBC drivers."""
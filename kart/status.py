@@ -24,8 +24,9 @@ class StatusDiffWriter(BaseDiffWriter):
     of the features outside the filter that they can't see.)
     """
 
-    def __init__(self, repo):
+    def __init__(self, repo, *, detect_unchanged=False):
         super().__init__(repo)
+        self.detect_unchanged = detect_unchanged
 
         if not self.spatial_filter.match_all:
             self.record_spatial_filter_stats = True
@@ -42,8 +43,7 @@ class StatusDiffWriter(BaseDiffWriter):
         repo_type_counts = {}
 
         for ds_path in self.all_ds_paths:
-            ds_diff = self.get_dataset_diff(ds_path)
-            ds_type_counts = ds_diff.type_counts()
+            ds_type_counts = self.get_dataset_type_counts(ds_path)
             if not ds_type_counts:
                 continue
 
@@ -55,6 +55,8 @@ class StatusDiffWriter(BaseDiffWriter):
                 and feature_type_counts
                 and feature_type_counts.get("updates")
             ):
+                # Finding out which updates are really primaryKeyConflicts requires the full diff.
+                ds_diff = self.get_dataset_diff(ds_path)
                 self.record_spatial_filter_stats_for_dataset(ds_path, ds_diff)
                 pk_conflicts = self.spatial_filter_pk_conflicts.recursive_get(
                     [ds_path, "feature"]
@@ -68,6 +70,22 @@ class StatusDiffWriter(BaseDiffWriter):
 
         return repo_type_counts
 
+    def get_dataset_type_counts(self, ds_path):
+        """
+        Same as self.get_dataset_diff(ds_path).type_counts(), but for table datasets, the counts are found
+        without generating the diff - see TableWorkingCopy.diff_dataset_to_working_copy_type_counts.
+        """
+        dataset = self.target_rs.datasets().get(ds_path)
+        table_wc = self.repo.working_copy.tabular
+        if dataset is None or dataset.DATASET_TYPE != "table" or table_wc is None:
+            return self.get_dataset_diff(ds_path).type_counts()
+
+        return table_wc.diff_dataset_to_working_copy_type_counts(
+            dataset,
+            self.repo_key_filter[ds_path],
+            detect_unchanged=self.detect_unchanged,
+        )
+
 
 @click.command()
 @click.pass_context
@@ -77,7 +95,15 @@ class StatusDiffWriter(BaseDiffWriter):
     type=click.Choice(["text", "json"]),
     default="text",
 )
-def status(ctx, output_format):
+@click.option(
+    "--detect-unchanged",
+    is_flag=True,
+    help=(
+        "Compare edited features to their original values, so that features which have been changed back to their "
+        "original values aren't counted as updates. This is slower when there are a lot of changes."
+    ),
+)
+def status(ctx, output_format, detect_unchanged):
     """Show the working copy status"""
     repo = ctx.obj.get_repo(allowed_states=KartRepoState.ALL_STATES)
     jdict = get_branch_status_json(repo)
@@ -95,7 +121,9 @@ def status(ctx, output_format):
         jdict["conflicts"] = conflicts_writer.list_conflicts()
         jdict["state"] = "merging"
     else:
-        jdict["workingCopy"] = get_working_copy_status_json(repo)
+        jdict["workingCopy"] = get_working_copy_status_json(
+            repo, detect_unchanged=detect_unchanged
+        )
 
     if output_format == "json":
         dump_json_output({"kart.status/v1": jdict}, sys.stdout)
@@ -127,7 +155,7 @@ def get_branch_status_json(repo):
     return output
 
 
-def get_working_copy_status_json(repo):
+def get_working_copy_status_json(repo, *, detect_unchanged=False):
     if repo.is_bare:
         return None
 
@@ -135,7 +163,10 @@ def get_working_copy_status_json(repo):
     table_wc = repo.working_copy.tabular
     table_wc_path = table_wc.clean_location if table_wc else None
 
-    result = {"path": table_wc_path, "changes": get_diff_status_json(repo)}
+    result = {
+        "path": table_wc_path,
+        "changes": get_diff_status_json(repo, detect_unchanged=detect_unchanged),
+    }
 
     # If we're not doing experimental point clouds, keep the JSON how it was in Kart 0.11 and earlier...
     if not os.environ.get("X_KART_POINT_CLOUDS"):
@@ -149,7 +180,7 @@ def get_working_copy_status_json(repo):
     return result
 
 
-def get_diff_status_json(repo):
+def get_diff_status_json(repo, *, detect_unchanged=False):
     """
     Returns a structured count of all the inserts, updates, and deletes (and primaryKeyConflicts) for meta items
     or  features in each dataset.
@@ -157,7 +188,7 @@ def get_diff_status_json(repo):
     if not repo.working_copy.exists():
         return {}
 
-    status_diff_writer = StatusDiffWriter(repo)
+    status_diff_writer = StatusDiffWriter(repo, detect_unchanged=detect_unchanged)
     return status_diff_writer.get_type_counts()
 
 
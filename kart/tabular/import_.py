@@ -6,7 +6,12 @@ from kart.cli_util import JsonFromFile, MutexOption, StringFromFile, call_and_ex
 from kart.core import check_git_user
 from kart.dataset_util import validate_dataset_paths
 from kart.exceptions import InvalidOperation
-from kart.fast_import import FastImportSettings, ReplaceExisting, fast_import_tables
+from kart.fast_import import (
+    FastImportSettings,
+    ImportBackend,
+    ReplaceExisting,
+    fast_import_tables,
+)
 from kart.key_filters import RepoKeyFilter
 from kart.tabular.import_source import TableImportSource
 from kart.tabular.ogr_import_source import FORMAT_TO_OGR_MAP
@@ -184,6 +189,50 @@ def any_at_all(iterable):
     type=click.INT,
     help="How many git-fast-import processes to use. Defaults to the number of available CPU cores.",
 )
+@click.option(
+    "--num-concurrent-sources",
+    type=click.INT,
+    help=(
+        "When importing several tables, how many of them to read from at once. "
+        f"Defaults to {FastImportSettings.DEFAULT_NUM_CONCURRENT_SOURCES}."
+    ),
+)
+@click.option(
+    "--checkpoint",
+    is_flag=True,
+    default=False,
+    help=(
+        "Periodically save the progress of the import, so that if it is interrupted, running the same import "
+        "again continues from where it left off. Useful for very large imports."
+    ),
+)
+@click.option(
+    "--checkpoint-interval",
+    hidden=True,
+    type=click.INT,
+    default=1_000_000,
+    help="How many features to import between each checkpoint, when --checkpoint is used (advanced users only)",
+)
+@click.option(
+    "--import-backend",
+    hidden=True,
+    type=click.Choice(["fast-import", "packfile"]),
+    default="fast-import",
+    help=(
+        "How imported data is written to the repository - streamed through git-fast-import, "
+        "or written straight to packfiles (advanced users only)"
+    ),
+)
+@click.option(
+    "--stats-file",
+    "stats_path",
+    envvar="KART_IMPORT_STATS_FILE",
+    type=click.Path(writable=True, dir_okay=False, allow_dash=True),
+    help=(
+        "Write a JSON summary of the time spent in each stage of the import to this file, "
+        "for diagnosing slow imports. Can also be set using the KART_IMPORT_STATS_FILE environment variable."
+    ),
+)
 def import_(
     ctx,
     all_tables,
@@ -201,6 +250,11 @@ def import_(
     max_delta_depth,
     do_checkout,
     num_processes,
+    num_concurrent_sources,
+    checkpoint,
+    checkpoint_interval,
+    import_backend,
+    stats_path,
 ):
     """
     Import data into a repository.
@@ -320,7 +374,11 @@ def import_(
         repo,
         import_sources,
         settings=FastImportSettings(
-            num_processes=num_processes, max_delta_depth=max_delta_depth
+            num_processes=num_processes,
+            max_delta_depth=max_delta_depth,
+            num_concurrent_sources=num_concurrent_sources,
+            checkpoint_interval=checkpoint_interval if checkpoint else None,
+            backend=ImportBackend[import_backend.upper().replace("-", "_")],
         ),
         verbosity=ctx.obj.verbosity + 1,
         message=message,
@@ -328,6 +386,7 @@ def import_(
         from_commit=repo.head_commit,
         replace_ids=replace_ids,
         allow_empty=allow_empty,
+        stats_path=stats_path,
     )
 
     # During imports we can keep old changes since they won't conflict with newly imported datasets.
@@ -167,6 +167,30 @@ class TableImportSource:
     def has_geometry(self):
         return self.schema.has_geometry
 
+    @property
+    def features_are_pk_ordered(self):
+        """
+        True if self.features() is guaranteed to yield features in ascending primary key order.
+        Some optimisations depend on this - subclasses should override it if they can guarantee it.
+        """
+        return False
+
+    @property
+    def get_features_are_pk_ordered(self):
+        """
+        True if self.get_features() is guaranteed to yield features in ascending primary key order, whatever order
+        the primary keys are supplied in. Subclasses should override it if they can guarantee it.
+        """
+        return False
+
+    def clone_for_concurrent_reads(self):
+        """
+        Returns an equivalent import source that has its own connection or handle to the underlying data, so that its
+        features can be read in another thread while other sources are being read. The clone's features() must yield
+        the same features as this source's would. Returns None if this isn't supported, which is the default.
+        """
+        return None
+
     def features(self):
         """
         Yields a dict for every feature. Dicts contain key-value pairs for each feature property,
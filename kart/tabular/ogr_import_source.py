@@ -1,4 +1,5 @@
 import functools
+import itertools
 import os
 import re
 import sys
@@ -19,7 +20,7 @@ from kart.exceptions import (
 from kart.geometry import ogr_to_gpkg_geom
 from kart.output_util import dump_json_output
 from kart.schema import ColumnSchema, Schema
-from kart.utils import chunk, ungenerator
+from kart.utils import ungenerator
 
 from .import_source import TableImportSource
 
@@ -42,6 +43,9 @@ class OgrTableImportSource(TableImportSource):
     Imports from an OGR source, currently from a whitelist of formats.
     """
 
+    # Fetching more features than this by PK is done by reading the whole layer once - see get_features.
+    MAX_PKS_PER_FILTER = 1000
+
     # NOTE: We don't support *List fields (eg IntegerList).
     OGR_TYPE_TO_V2_SCHEMA_TYPE = {
         "Integer": ("integer", 32),
@@ -234,6 +238,19 @@ class OgrTableImportSource(TableImportSource):
             meta_overrides=meta_overrides,
         )
 
+    def clone_for_concurrent_reads(self):
+        # OGR datasets can't be shared between threads - open another one.
+        ds = self._ogr_open(self.ogr_source, allowed_drivers=[self.driver.ShortName])
+        return self.__class__(
+            ds,
+            table=self.table,
+            dest_path=self.dest_path,
+            source=self.source,
+            ogr_source=self.ogr_source,
+            primary_key=self._primary_key,
+            meta_overrides=self.meta_overrides,
+        )
+
     @property
     @functools.lru_cache(maxsize=1)
     def ogrlayer(self):
@@ -393,15 +410,39 @@ class OgrTableImportSource(TableImportSource):
             assert len(x) == 1
             yield x[0]
 
+    def _ogr_feature_pk_value(self, ogr_feature):
+        pk_field = self.primary_key
+        if self.use_ogc_fid_as_pk:
+            return ogr_feature.GetFID()
+        return self.field_adapter_map[pk_field](ogr_feature.GetField(pk_field))
+
     def get_features(self, row_pks, *, ignore_missing=False):
         pk_field = self.primary_key
 
-        for batch in chunk(self._first_pk_values(row_pks), 1000):
-            quoted_pks = ",".join(self._ogr_sql_quote_literal(x) for x in batch)
+        # Read only as many PKs as we need to tell if there are too many for a single filter.
+        pk_values = self._first_pk_values(row_pks)
+        first_pk_values = list(itertools.islice(pk_values, self.MAX_PKS_PER_FILTER + 1))
+        if not first_pk_values:
+            return
+
+        if len(first_pk_values) <= self.MAX_PKS_PER_FILTER:
+            # Few enough PKs to fetch the features with a single filter - which drivers for SQL datasources
+            # pass on to the database as a WHERE clause.
+            quoted_pks = ",".join(
+                self._ogr_sql_quote_literal(x) for x in first_pk_values
+            )
             filter_sql = f"{self.quote_ident(pk_field)} IN ({quoted_pks})"
-
             for ogr_feature in self._iter_ogr_features(filter_sql=filter_sql):
                 yield self._ogr_feature_to_kart_feature(ogr_feature)
+            return
+
+        # Lots of PKs - filtering the layer once per batch of PKs would mean reading the whole layer once per batch,
+        # for most drivers. Instead, read the layer once, and pick out the features with the given PKs as we go.
+        wanted_pk_values = set(first_pk_values)
+        wanted_pk_values.update(pk_values)
+        for ogr_feature in self._iter_ogr_features():
+            if self._ogr_feature_pk_value(ogr_feature) in wanted_pk_values:
+                yield self._ogr_feature_to_kart_feature(ogr_feature)
 
     def sample_geometry(self, geom_col=None):
         for ogr_feature in self._iter_ogr_features():
@@ -1,3 +1,5 @@
+import copy
+
 import pygit2
 
 from .v2 import TableV2
@@ -263,6 +265,15 @@ class PkGeneratingTableImportSource(TableImportSource):
             # Just assign new PKs to those we couldn't find a match for.
             yield from self._assign_pk_range(buffered_inserts, next_new_pk)
 
+    def clone_for_concurrent_reads(self):
+        delegate = self.delegate.clone_for_concurrent_reads()
+        if delegate is None:
+            return None
+        # The clone shares this source's state - such as pk_to_hash - so that the PKs it generates are recorded here.
+        result = copy.copy(self)
+        result.delegate = delegate
+        return result
+
     def get_features(self, row_pks, *, ignore_missing=False):
         # we implement this so you can specifically call it with an empty
         # list of PKs.
@@ -425,6 +425,69 @@ class RichTableDataset(TableDataset):
             feature_diff.add_delta(delta)
         return feature_diff
 
+    def get_features_or_none(self, row_pks):
+        """
+        Returns a list containing the feature with each of the specified primary key values - or None, if there is no
+        such feature - in the same order as row_pks. The features are looked up in path order, so that each feature
+        tree is only resolved once, and any promised features are all fetched at once before any are decoded.
+        """
+        pk_values_list = [self.schema.sanitise_pks(pk_values) for pk_values in row_pks]
+
+        found_data = {}
+        promised_blob_ids = {}
+        for i, blob in self._find_feature_blobs(pk_values_list):
+            try:
+                found_data[i] = memoryview(blob)
+            except KeyError as e:
+                if not object_is_promised(e):
+                    raise
+                promised_blob_ids[i] = blob.oid
+
+        if promised_blob_ids:
+            fetch_promised_blobs(
+                self.repo, [oid.hex for oid in promised_blob_ids.values()]
+            )
+            for i, oid in promised_blob_ids.items():
+                found_data[i] = memoryview(self.repo[oid])
+
+        result = [None] * len(pk_values_list)
+        for i, data in found_data.items():
+            result[i] = self.get_feature(pk_values_list[i], data=data)
+        return result
+
+    def features_exist(self, row_pks):
+        """
+        Returns a list of bools - whether or not there is a feature with each of the specified primary key values,
+        in the same order as row_pks. Like get_features_or_none, but the features aren't read or decoded - so
+        features that are promised but not present locally needn't be fetched.
+        """
+        pk_values_list = [self.schema.sanitise_pks(pk_values) for pk_values in row_pks]
+        result = [False] * len(pk_values_list)
+        for i, blob in self._find_feature_blobs(pk_values_list):
+            result[i] = True
+        return result
+
+    def _find_feature_blobs(self, pk_values_list):
+        """
+        Generator. Yields (i, blob) for the feature blob for each of the (sanitised) pk_values in pk_values_list
+        that exists, where i is the index into pk_values_list. Blobs are found in path order, not pk_values_list order.
+        """
+        rel_paths = [
+            self.encode_pks_to_path(pk_values, relative=True)
+            for pk_values in pk_values_list
+        ]
+        current_tree_path = current_tree = None
+        for i in sorted(range(len(rel_paths)), key=rel_paths.__getitem__):
+            tree_path, filename = rel_paths[i].rsplit("/", 1)
+            if tree_path != current_tree_path:
+                current_tree_path = tree_path
+                current_tree = self.get_subtree(tree_path)
+            try:
+                blob = current_tree / filename
+            except KeyError:
+                continue
+            yield i, blob
+
     def fetch_missing_dirty_features(self, working_copy):
         """Fetch all the promised features in this dataset that are marked as dirty in the working copy."""
 
@@ -1,4 +1,5 @@
 import functools
+import itertools
 import os
 import sys
 
@@ -22,6 +23,8 @@ class SqlAlchemyTableImportSource(TableImportSource):
     """
 
     CURSOR_SIZE = 10000
+    # Features are fetched by PK with a simple IN (...) query if there are no more than this many PKs.
+    MAX_PKS_PER_QUERY = 10000
 
     @classmethod
     def open(cls, spec, table=None):
@@ -281,13 +284,34 @@ class SqlAlchemyTableImportSource(TableImportSource):
         with self.engine.connect() as conn:
             return conn.scalar(f"SELECT COUNT(*) FROM {self.table_identifier};")
 
+    def _db_schema(self):
+        # The raw schema from the db - self.schema can be modified.
+        return Schema.from_column_dicts(self.meta_items_from_db().get("schema.json"))
+
+    @property
+    def features_are_pk_ordered(self):
+        # Features are read ordered by the primary key from the db - which is the same as the dataset's primary key
+        # unless it has been overridden.
+        db_pk_names = [c.name for c in self._db_schema().pk_columns]
+        return bool(db_pk_names) and db_pk_names == [
+            c.name for c in self.schema.pk_columns
+        ]
+
+    def clone_for_concurrent_reads(self):
+        # Every read checks out its own connection from the engine's pool, so no clone is needed.
+        return self
+
     def features(self):
-        # Make sure to use the raw schema from the db - self.schema can be modified.
-        schema = Schema.from_column_dicts(self.meta_items_from_db().get("schema.json"))
+        schema = self._db_schema()
         table_def = self.db_type.adapter.table_def_for_schema(
             schema, db_schema=self.db_schema, table_name=self.table
         )
         query = sqlalchemy.select(table_def.columns).select_from(table_def)
+        # Features are read in primary key order, so that the same features are read in the same order every time.
+        # This is needed to resume a checkpointed import.
+        pk_cols = [table_def.c[c.name] for c in schema.pk_columns]
+        if pk_cols:
+            query = query.order_by(*pk_cols)
         with self.engine.connect() as conn:
             r = (
                 conn.execution_options(stream_results=True)
@@ -306,6 +330,10 @@ class SqlAlchemyTableImportSource(TableImportSource):
             assert len(x) == 1
             yield x[0]
 
+    @property
+    def get_features_are_pk_ordered(self):
+        return True
+
     def get_features(self, row_pks, *, ignore_missing=False):
         pk_names = [c.name for c in self.schema.pk_columns]
         if len(pk_names) != 1:
@@ -319,16 +347,59 @@ class SqlAlchemyTableImportSource(TableImportSource):
         table_def = self.db_type.adapter.table_def_for_schema(
             self.schema, db_schema=self.db_schema, table_name=self.table
         )
+        pk_col = table_def.c[pk_name]
+
+        # Read only as many PKs as we need to tell if there are too many for a single query - row_pks can be a
+        # generator of lots of PKs, which we shouldn't have to hold in memory all at once.
+        pk_values = self._first_pk_values(row_pks)
+        first_pk_values = list(itertools.islice(pk_values, self.MAX_PKS_PER_QUERY + 1))
+        if not first_pk_values:
+            return
 
         with self.engine.connect() as conn:
-            for pk_chunk in chunk(self._first_pk_values(row_pks), 10000):
+            if len(first_pk_values) <= self.MAX_PKS_PER_QUERY:
+                # Few enough PKs to fetch the features with a single query.
                 query = (
                     sqlalchemy.select(table_def.columns)
                     .select_from(table_def)
-                    .where(table_def.c[pk_name].in_(pk_chunk))
+                    .where(pk_col.in_(first_pk_values))
+                    .order_by(pk_col)
                 )
                 r = conn.execution_options(stream_results=True).execute(query)
                 yield from self._resultset_as_dicts(r)
+                return
+
+            # Lots of PKs - rather than sending them in lots of separate queries, load them into a temporary table,
+            # and fetch all of the features by joining against it.
+            pks_table = self.db_class.temporary_table(
+                "kart_import_pks", sqlalchemy.Column("pk", pk_col.type)
+            )
+            pks_table.create(conn)
+            try:
+                pk_chunks = chunk(
+                    itertools.chain(first_pk_values, pk_values), self.MAX_PKS_PER_QUERY
+                )
+                for pk_chunk in pk_chunks:
+                    conn.execute(pks_table.insert(), [{"pk": pk} for pk in pk_chunk])
+                query = (
+                    sqlalchemy.select(table_def.columns)
+                    .select_from(table_def)
+                    .where(pk_col.in_(sqlalchemy.select(pks_table.c.pk)))
+                    .order_by(pk_col)
+                )
+                r = (
+                    conn.execution_options(stream_results=True)
+                    .execute(query)
+                    .yield_per(self.CURSOR_SIZE)
+                )
+                try:
+                    yield from self._resultset_as_dicts(r)
+                finally:
+                    # The query reads from the temporary table - the results must be finished with before it's
+                    # dropped, even if the caller stopped iterating early.
+                    r.close()
+            finally:
+                pks_table.drop(conn)
 
     @property
     @functools.lru_cache(maxsize=1)
@@ -152,15 +152,19 @@ class TableDataset(BaseDataset, TableImportSource):
         if log_progress:
             plog("0.0%% 0/%d features... @0.0s", n_total)
 
-        for blob in self.feature_blobs():
+        # Blobs which the spatial filter index rules out are replaced with None, so they needn't be read.
+        feature_blobs = spatial_filter.filter_feature_blobs(
+            self.repo, self.feature_blobs()
+        )
+        for blob in feature_blobs:
             n_read += 1
             n_chunk += 1
+            feature = None
             try:
-                feature = self.get_feature_from_blob(blob)
+                if blob is not None:
+                    feature = self.get_feature_from_blob(blob)
             except KeyError as e:
-                if spatial_filter.feature_is_prefiltered(e):
-                    feature = None
-                else:
+                if not spatial_filter.feature_is_prefiltered(e):
                     raise
 
             if feature is not None and spatial_filter.matches(feature):
@@ -3,6 +3,7 @@ import os
 import re
 
 import click
+import pygit2
 
 from kart.base_dataset import (
     BaseDataset,
@@ -26,7 +27,7 @@ from kart.serialise_util import (
     msg_pack,
     msg_unpack,
 )
-from .v3_paths import PathEncoder
+from .v3_paths import IntPathEncoder, PathEncoder
 from .rich_table_dataset import RichTableDataset
 
 
@@ -179,7 +180,12 @@ class TableV3(RichTableDataset):
         which might not be the same values that are now in the schema.
         To get a feature consistent with the current schema, call get_feature.
         """
+        pk_values, data = self._get_pk_values_and_data(pk_values, path, data)
+        legend_hash, non_pk_values = msg_unpack(data)
+        legend = self.get_legend(legend_hash)
+        return legend.value_tuples_to_raw_dict(pk_values, non_pk_values)
 
+    def _get_pk_values_and_data(self, pk_values, path, data):
         # The caller must supply at least one of (pk_values, path) so we know which
         # feature is meant. We can infer whichever one is missing from the one supplied.
         # If the caller knows both already, they can supply both, to avoid redundant work.
@@ -199,17 +205,15 @@ class TableV3(RichTableDataset):
                 rel_path = self.encode_pks_to_path(pk_values, relative=True)
             data = self.get_data_at(rel_path, as_memoryview=True)
 
-        legend_hash, non_pk_values = msg_unpack(data)
-        legend = self.get_legend(legend_hash)
-        return legend.value_tuples_to_raw_dict(pk_values, non_pk_values)
+        return pk_values, data
 
     def get_feature(self, pk_values=None, *, path=None, data=None):
         """
         Gets the feature with the given primary key(s) / at the given "full" path.
         The result is a dict of values keyed by column name.
         """
-        raw_dict = self.get_raw_feature_dict(pk_values=pk_values, path=path, data=data)
-        return self.schema.feature_from_raw_dict(raw_dict)
+        pk_values, data = self._get_pk_values_and_data(pk_values, path, data)
+        return self.schema.codec.decode(pk_values, data, self.get_legend)
 
     def feature_blobs(self):
         """
@@ -268,10 +272,18 @@ class TableV3(RichTableDataset):
         """
         if schema is None:
             schema = self.schema
-        raw_dict = schema.feature_to_raw_dict(feature)
-        return self.encode_raw_feature_dict(
-            raw_dict, schema.legend, relative=relative, schema=schema
-        )
+        pk_values, data = schema.codec.encode(feature)
+        path = self.encode_pks_to_path(pk_values, relative=relative, schema=schema)
+        return path, data
+
+    def encode_features(self, features, schema=None, relative=False):
+        """Generator. Same as encode_feature, but for an iterable of features."""
+        if schema is None:
+            schema = self.schema
+        for pk_values, data in schema.codec.encode_many(features):
+            yield self.encode_pks_to_path(
+                pk_values, relative=relative, schema=schema
+            ), data
 
     def encode_pks_to_path(self, pk_values, relative=False, *, schema=None):
         """
@@ -335,9 +347,18 @@ class TableV3(RichTableDataset):
             )
 
     def import_iter_feature_blobs(
-        self, repo, resultset, source, replacing_dataset=None
+        self, repo, resultset, source, replacing_dataset=None, pk_ordered=None
     ):
+        """
+        Generates (full_path, blob_data) for each feature in the resultset, which is from the given source.
+        replacing_dataset - the dataset being replaced by this import, if any. Features that haven't changed
+            reuse the existing blob from this dataset.
+        pk_ordered - True if the resultset is in primary key order. Defaults to source.features_are_pk_ordered
+            (which is correct if the resultset is source.features()).
+        """
         schema = source.schema
+        if pk_ordered is None:
+            pk_ordered = source.features_are_pk_ordered
         if replacing_dataset:
             # Optimisation: Try to avoid rewriting features for compatible schema changes.
             # this can take some time, but often results in much fewer git objects produced.
@@ -352,37 +373,121 @@ class TableV3(RichTableDataset):
             # This optimisation is useful in the following situations:
             #  * a column was added but some values remain NULL (example above)
             #  * a column was dropped, and some rows have no other values changed
-            for feature in resultset:
+            if self._can_merge_join(replacing_dataset, pk_ordered):
+                existing_blob_iter = self._merge_join_existing_feature_blobs(
+                    replacing_dataset, resultset, schema
+                )
+            else:
+                existing_blob_iter = self._lookup_existing_feature_blobs(
+                    replacing_dataset, resultset, schema
+                )
+
+            for feature, pk_values, existing_blob in existing_blob_iter:
+                feature_path, feature_data = self.encode_feature(feature, schema)
+                if existing_blob is None:
+                    # this feature isn't in the dataset we're replacing
+                    yield feature_path, feature_data
+                    continue
+
+                if existing_blob.id == pygit2.hash(feature_data):
+                    # The common case - the feature and its legend are unchanged, so the existing blob doesn't
+                    # need to be read, let alone decoded.
+                    yield feature_path, feature_data
+                    continue
+
                 try:
-                    pk_values = (feature[replacing_dataset.primary_key],)
-                    rel_path = self.encode_pks_to_path(
-                        pk_values, relative=True, schema=schema
-                    )
-                    existing_data = replacing_dataset.get_data_at(
-                        rel_path, as_memoryview=True
-                    )
+                    existing_data = memoryview(existing_blob)
                 except KeyError:
-                    # this feature isn't in the dataset we're replacing
-                    yield self.encode_feature(feature, schema)
+                    # Promised blob - not available locally.
+                    yield feature_path, feature_data
                     continue
 
-                existing_feature_raw_dict = replacing_dataset.get_raw_feature_dict(
-                    pk_values, data=existing_data
-                )
                 # This adapts the existing feature to the new schema
-                existing_feature = schema.feature_from_raw_dict(
-                    existing_feature_raw_dict
+                existing_feature = schema.codec.decode(
+                    pk_values, existing_data, replacing_dataset.get_legend
                 )
                 if existing_feature == feature:
                     # Nothing changed? No need to rewrite the feature blob
-                    yield self.encode_pks_to_path(
-                        pk_values, schema=schema
-                    ), existing_data
+                    yield feature_path, existing_data
                 else:
-                    yield self.encode_feature(feature, schema)
+                    yield feature_path, feature_data
         else:
-            for feature in resultset:
-                yield self.encode_feature(feature, schema)
+            yield from self.encode_features(resultset, schema)
+
+    def _can_merge_join(self, replacing_dataset, pk_ordered):
+        """
+        True if the features being imported can be merge-joined with the existing features in replacing_dataset -
+        see _merge_join_existing_feature_blobs.
+        """
+        encoder = self.feature_path_encoder
+        return (
+            pk_ordered
+            and isinstance(encoder, IntPathEncoder)
+            and replacing_dataset.feature_path_encoder.to_dict() == encoder.to_dict()
+        )
+
+    def _lookup_existing_feature_blobs(self, replacing_dataset, resultset, schema):
+        """
+        Generator. Yields (feature, pk_values, existing_blob) for each feature in resultset,
+        where existing_blob is the blob of the feature with the same PK in replacing_dataset, or None.
+        Looks up each feature in replacing_dataset individually, starting from the root of the dataset.
+        """
+        for feature in resultset:
+            try:
+                pk_values = (feature[replacing_dataset.primary_key],)
+                rel_path = self.encode_pks_to_path(
+                    pk_values, relative=True, schema=schema
+                )
+                existing_blob = replacing_dataset.get_blob_at(rel_path)
+            except KeyError:
+                # this feature isn't in the dataset we're replacing
+                yield feature, None, None
+                continue
+            yield feature, pk_values, existing_blob
+
+    def _merge_join_existing_feature_blobs(self, replacing_dataset, resultset, schema):
+        """
+        Same as _lookup_existing_feature_blobs, but for a resultset that is in PK order, and datasets that use the
+        IntPathEncoder - which stores features in PK order, with sequential PKs in the same leaf tree. So the
+        existing feature tree is walked in step with the resultset: each tree in the existing dataset is read at
+        most once, the trees leading to the current leaf tree are kept open while the features stay beneath them,
+        and each feature is matched with a blob from the current leaf tree's entries.
+        """
+        # The names of the trees from the root of the dataset to the current leaf tree, and the trees themselves.
+        open_paths = []
+        root_tree = replacing_dataset.inner_tree
+        if root_tree is None:
+            root_tree = replacing_dataset._empty_tree
+        open_trees = [root_tree]
+        leaf_entries = {}
+        for feature in resultset:
+            try:
+                pk_values = (feature[replacing_dataset.primary_key],)
+            except KeyError:
+                # this feature isn't in the dataset we're replacing
+                yield feature, None, None
+                continue
+            rel_path = self.encode_pks_to_path(pk_values, relative=True, schema=schema)
+            *tree_path, filename = rel_path.split("/")
+            if tree_path != open_paths:
+                # Moved on to a new leaf tree - keep the trees that it shares with the last one.
+                depth = 0
+                while depth < len(open_paths) and open_paths[depth] == tree_path[depth]:
+                    depth += 1
+                del open_paths[depth:], open_trees[depth + 1 :]
+                for name in tree_path[depth:]:
+                    try:
+                        subtree = open_trees[-1] / name
+                    except KeyError:
+                        subtree = replacing_dataset._empty_tree
+                    open_paths.append(name)
+                    open_trees.append(subtree)
+                leaf_entries = {obj.name: obj for obj in open_trees[-1]}
+
+            existing_blob = leaf_entries.get(filename)
+            if existing_blob is not None and existing_blob.type_str != "blob":
+                existing_blob = None
+            yield feature, pk_values, existing_blob
 
     def apply_meta_diff(
         self, meta_diff, object_builder, *, resolve_missing_values_from_ds=None
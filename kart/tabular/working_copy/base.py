@@ -2,6 +2,7 @@ import contextlib
 import functools
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import click
 import pygit2
@@ -14,11 +15,11 @@ from kart.exceptions import (
     NotYetImplemented,
 )
 from kart.key_filters import DatasetKeyFilter, FeatureKeyFilter, RepoKeyFilter
-from kart.promisor_utils import LibgitSubcode
+from kart.repo import KartConfigKeys, KartRepo
 from kart.sqlalchemy.upsert import Upsert as upsert
 from kart.tabular.table_dataset import TableDataset
 from kart.schema import DefaultRoundtripContext, Schema
-from kart.utils import chunk
+from kart.utils import chunk, iterate_in_background
 from kart.working_copy import WorkingCopyDirty, WorkingCopyPart
 
 from . import TableWorkingCopyStatus, TableWorkingCopyType
@@ -46,6 +47,21 @@ class TableWorkingCopy(WorkingCopyPart):
         """Human readable name of this type of working copy, eg "PostGIS"."""
         raise NotImplementedError()
 
+    # How many datasets write_full can write at once - each using its own connection and transaction.
+    # Subclasses can raise this if the database can load several tables in parallel.
+    MAX_CONCURRENT_DATASET_WRITES = 1
+
+    # When reset replaces at least this many rows of a table, the PKs are loaded into a temporary table so that
+    # the old rows can be deleted in one statement, and the new rows are written using _write_all_features.
+    BULK_REPLACE_MIN_FEATURES = 1000
+
+    # How many dirty rows are diffed at once - the original features of each batch are looked up together.
+    DIFF_BATCH_SIZE = 10000
+
+    # Inserts and deletes are only matched up into renames if there are no more than this many of them.
+    # Can be changed using the kart.workingcopy.renameLimit config option.
+    FIND_RENAMES_MAX_CHANGES = 10000
+
     @property
     @functools.lru_cache(maxsize=1)
     def KART_STATE(self):
@@ -609,63 +625,119 @@ class TableWorkingCopy(WorkingCopyPart):
             feature_diff = DeltaDiff()
             insert_count = delete_count = 0
 
-            for row in r:
-                track_pk = row[0]  # This is always a str
-                db_obj = {k: row[k] for k in row.keys() if k != ".__track_pk"}
+            # The original features are looked up from the repo in batches - see get_features_or_none.
+            # But if we only need to know whether anything is dirty, the first changed row is enough - so
+            # look them up one at a time, to stop as soon as it is found.
+            batch_size = 1 if raise_if_dirty else self.DIFF_BATCH_SIZE
+            for rows in chunk(r, batch_size):
+                track_pks = [row[0] for row in rows]  # These are always strs
+                repo_objs = dataset.get_features_or_none(track_pks)
 
-                if db_obj[pk_field] is None:
-                    db_obj = None
+                for row, repo_obj in zip(rows, repo_objs):
+                    db_obj = {k: row[k] for k in row.keys() if k != ".__track_pk"}
 
-                repo_obj = self._get_feature_and_fetch_if_needed(dataset, track_pk)
+                    if db_obj[pk_field] is None:
+                        db_obj = None
 
-                if repo_obj == db_obj:
-                    # DB was changed and then changed back - eg INSERT then DELETE.
-                    # TODO - maybe delete track_pk from tracking table?
-                    continue
+                    if repo_obj == db_obj:
+                        # DB was changed and then changed back - eg INSERT then DELETE.
+                        # TODO - maybe delete track_pk from tracking table?
+                        continue
 
-                if raise_if_dirty:
-                    raise WorkingCopyDirty()
+                    if raise_if_dirty:
+                        raise WorkingCopyDirty()
 
-                if db_obj and not repo_obj:  # INSERT
-                    insert_count += 1
-                    delta = Delta.insert((db_obj[pk_field], db_obj))
+                    if db_obj and not repo_obj:  # INSERT
+                        insert_count += 1
+                        delta = Delta.insert((db_obj[pk_field], db_obj))
 
-                elif repo_obj and not db_obj:  # DELETE
-                    delete_count += 1
-                    delta = Delta.delete((repo_obj[pk_field], repo_obj))
+                    elif repo_obj and not db_obj:  # DELETE
+                        delete_count += 1
+                        delta = Delta.delete((repo_obj[pk_field], repo_obj))
 
-                else:  # UPDATE
-                    pk = db_obj[pk_field]
-                    delta = Delta.update((pk, repo_obj), (pk, db_obj))
+                    else:  # UPDATE
+                        pk = db_obj[pk_field]
+                        delta = Delta.update((pk, repo_obj), (pk, db_obj))
 
-                delta.flags = WORKING_COPY_EDIT
-                feature_diff.add_delta(delta)
+                    delta.flags = WORKING_COPY_EDIT
+                    feature_diff.add_delta(delta)
 
-        if find_renames and (insert_count + delete_count) <= 400:
+        if (
+            find_renames
+            and (insert_count + delete_count) <= self.find_renames_max_changes
+        ):
             self.find_renames(feature_diff, dataset)
 
         return feature_diff
 
-    def _get_feature_and_fetch_if_needed(self, dataset, feature_pk):
-        try:
-            return dataset.get_feature(feature_pk)
-        except KeyError as e:
-            # Couldn't find the feature.
-            subcode = getattr(e, "subcode", 0)
-
-            if subcode == LibgitSubcode.ENOSUCHPATH:
-                # There is no such feature. This is okay: it just means the user has inserted
-                # the feature into the working copy and it has not yet been committed.
-                return None
-            elif subcode == LibgitSubcode.EOBJECTPROMISED:
-                # A feature with this PK exists, but we don't have it locally right now. Fetch it.
-                # Note that this means the feature presumably doesn't match the user's spatial filter,
-                # so it was probably a mistake by the user that they have reused the existing feature's PK.
-                dataset.fetch_missing_dirty_features(self)
-                return dataset.get_feature(feature_pk)
-            else:
-                # Some other error has happened, or no subcode was found. Re-raise the error.
-                raise
+    def diff_dataset_to_working_copy_type_counts(
+        self, dataset, ds_filter=DatasetKeyFilter.MATCH_ALL, *, detect_unchanged=False
+    ):
+        """
+        Returns the same summary of changes as diff_dataset_to_working_copy(...).type_counts() - but without reading
+        and comparing the features. Instead, each dirty row is classified by whether it still exists in the working
+        copy, and whether a feature with the same PK exists in the dataset. This means a row that was edited and then
+        changed back to its original value is counted as an update, unless detect_unchanged is True - in which case
+        the full diff is generated so that the features can be compared.
+        """
+        if not self._is_dataset_supported(dataset):
+            return {}
+
+        with self.session() as sess:
+            meta_diff = self.diff_dataset_to_working_copy_meta(dataset)
+            if detect_unchanged or "schema.json" in meta_diff:
+                # The rows need to be read and compared to find out how they have changed.
+                ds_diff = self.diff_dataset_to_working_copy(dataset, ds_filter)
+                ds_diff.prune()
+                return ds_diff.type_counts()
+
+            feature_filter = ds_filter.get("feature", ds_filter.child_type())
+            r = self._execute_dirty_rows_query(
+                sess, dataset, feature_filter, pk_only=True
+            )
+            update_count = 0
+            insert_pks = []
+            delete_pks = []
+            for rows in chunk(r, self.DIFF_BATCH_SIZE):
+                track_pks = [row[0] for row in rows]
+                for track_pk, row, in_repo in zip(
+                    track_pks, rows, dataset.features_exist(track_pks)
+                ):
+                    in_wc = row[1] is not None
+                    if in_wc and in_repo:
+                        update_count += 1
+                    elif in_wc:
+                        insert_pks.append(track_pk)
+                    elif in_repo:
+                        delete_pks.append(track_pk)
+
+            feature_type_counts = {
+                "inserts": len(insert_pks),
+                "updates": update_count,
+                "deletes": len(delete_pks),
+            }
+            if (
+                insert_pks
+                and delete_pks
+                and (len(insert_pks) + len(delete_pks)) <= self.find_renames_max_changes
+            ):
+                # Some of the inserts and deletes might be renames - these are counted as updates instead.
+                rename_candidates = FeatureKeyFilter(insert_pks + delete_pks)
+                candidates_diff = self.diff_dataset_to_working_copy_feature(
+                    dataset, rename_candidates, meta_diff
+                )
+                feature_type_counts["inserts"] = 0
+                feature_type_counts["deletes"] = 0
+                for type_name, count in candidates_diff.type_counts().items():
+                    feature_type_counts[type_name] += count
+
+        ds_type_counts = {}
+        if meta_diff:
+            ds_type_counts["meta"] = meta_diff.type_counts()
+        feature_type_counts = {k: v for k, v in feature_type_counts.items() if v}
+        if feature_type_counts:
+            ds_type_counts["feature"] = feature_type_counts
+        return ds_type_counts
 
     @property
     def _tracking_table_requires_cast(self):
@@ -676,11 +748,18 @@ class TableWorkingCopy(WorkingCopyPart):
         return True
 
     def _execute_dirty_rows_query(
-        self, sess, dataset, feature_filter=FeatureKeyFilter.MATCH_ALL, meta_diff=None
+        self,
+        sess,
+        dataset,
+        feature_filter=FeatureKeyFilter.MATCH_ALL,
+        meta_diff=None,
+        *,
+        pk_only=False,
     ):
         """
         Does a join on the tracking table and the table for the given dataset, and returns a result
         containing all the rows that have been inserted / updated / deleted.
+        If pk_only is True, only the PK column of each row is selected.
         """
         if (
             meta_diff
@@ -694,8 +773,11 @@ class TableWorkingCopy(WorkingCopyPart):
         kart_track = self.kart_tables.kart_track
         table = self._table_def_for_schema(schema, dataset.table_name)
 
-        cols_to_select = [kart_track.c.pk.label(".__track_pk"), *table.columns]
         pk_column = table.columns[schema.pk_columns[0].name]
+        cols_to_select = [
+            kart_track.c.pk.label(".__track_pk"),
+            *([pk_column] if pk_only else table.columns),
+        ]
         tracking_col_type = kart_track.c.pk.type
 
         if self._tracking_table_requires_cast:
@@ -782,32 +864,51 @@ class TableWorkingCopy(WorkingCopyPart):
         dt.pop("type_updates")
         return sum(dt.values()) == 0
 
+    @property
+    def find_renames_max_changes(self):
+        """
+        The most inserts + deletes that find_renames will be run on. Defaults to FIND_RENAMES_MAX_CHANGES, but can
+        be changed using the kart.workingcopy.renameLimit config option - setting it to zero disables find_renames.
+        """
+        key = KartConfigKeys.KART_WORKINGCOPY_RENAMELIMIT
+        config = self.repo.config
+        if key in config:
+            return max(0, config.get_int(key))
+        return self.FIND_RENAMES_MAX_CHANGES
+
     def find_renames(self, feature_diff, dataset):
         """
         Matches inserts + deletes into renames on a best effort basis.
-        changes at most one matching insert and delete into an update per blob-hash.
+        Deletes are bucketed by the hash of their non-PK values, then each insert is matched with an unmatched
+        delete from the same bucket, if there is one - so this takes linear time.
         Modifies feature_diff in place.
         """
 
         schema = dataset.schema
-        inserts = {}
-        deletes = {}
+        inserts = []
+        deletes_by_hash = {}
 
         for delta in feature_diff.values():
             if delta.type == "insert":
-                inserts[schema.hash_feature(delta.new_value, without_pk=True)] = delta
+                inserts.append(delta)
             elif delta.type == "delete":
-                deletes[schema.hash_feature(delta.old_value, without_pk=True)] = delta
+                h = schema.hash_feature(delta.old_value, without_pk=True)
+                deletes_by_hash.setdefault(h, []).append(delta)
 
-        for h in deletes:
-            if h in inserts:
-                delete_delta = deletes[h]
-                insert_delta = inserts[h]
+        if not inserts or not deletes_by_hash:
+            return
+
+        for insert_delta in inserts:
+            h = schema.hash_feature(insert_delta.new_value, without_pk=True)
+            bucket = deletes_by_hash.get(h)
+            if not bucket:
+                continue
+            delete_delta = bucket.pop()
 
-                del feature_diff[delete_delta.key]
-                del feature_diff[insert_delta.key]
-                update_delta = delete_delta + insert_delta
-                feature_diff.add_delta(update_delta)
+            del feature_diff[delete_delta.key]
+            del feature_diff[insert_delta.key]
+            update_delta = delete_delta + insert_delta
+            feature_diff.add_delta(update_delta)
 
     def update_state_table_tree(self, tree):
         """Write the given tree to the state table."""
@@ -859,68 +960,179 @@ class TableWorkingCopy(WorkingCopyPart):
 
         Use for new working-copy checkouts.
         """
-        L = logging.getLogger(f"{self.__class__.__qualname__}.write_full")
+        write_concurrently = self._can_write_concurrently(len(datasets))
+        if write_concurrently:
+            self._write_full_concurrently(commit, *datasets)
 
         self.repo.odb.refresh()
         with pause_refreshing(self.repo.odb), self.session() as sess:
-            dataset_count = len(datasets)
-            for i, dataset in enumerate(datasets):
-                L.info(
-                    "Writing dataset %d of %d: %s", i + 1, dataset_count, dataset.path
+            if not write_concurrently:
+                dataset_count = len(datasets)
+                for i, dataset in enumerate(datasets):
+                    self._write_full_dataset(sess, commit, dataset, i, dataset_count)
+
+            self._update_state_table_tree(sess, commit.peel(pygit2.Tree).id.hex)
+            self._update_state_table_spatial_filter_hash(
+                sess, self.repo.spatial_filter.hexhash
+            )
+
+    @property
+    def max_concurrent_dataset_writes(self):
+        """
+        How many datasets write_full may write at once. Defaults to MAX_CONCURRENT_DATASET_WRITES, but can be
+        changed using the kart.workingcopy.concurrentWrites config option (for working copies that support it).
+        """
+        if self.MAX_CONCURRENT_DATASET_WRITES <= 1:
+            return 1
+        key = KartConfigKeys.KART_WORKINGCOPY_CONCURRENTWRITES
+        config = self.repo.config
+        if key in config:
+            return max(1, config.get_int(key))
+        return self.MAX_CONCURRENT_DATASET_WRITES
+
+    def _can_write_concurrently(self, dataset_count):
+        # Concurrent writes each happen in their own transaction, so they can't be part of an existing session -
+        # the tables written would be committed even if the outer session was rolled back, and they could end up
+        # waiting for locks held by the outer session.
+        # They're also only used for the initial checkout to an empty working copy: if any write fails, the tables
+        # already written are dropped again, which leaves the working copy empty, as it was. Any other change to
+        # the working copy must happen in a single transaction, so that it can't be left half-done.
+        return (
+            dataset_count > 1
+            and self.max_concurrent_dataset_writes > 1
+            and not hasattr(self, "_session")
+            and self.get_tree_id() is None
+        )
+
+    def _write_full_concurrently(self, commit, *datasets):
+        """
+        Writes the given datasets to the working copy, as write_full does, but writes up to
+        max_concurrent_dataset_writes datasets at once, each using its own connection and transaction.
+        Doesn't update the state table - the caller must do that once this returns successfully.
+        If any dataset fails to be written, any datasets that were already written are dropped again.
+        """
+        L = logging.getLogger(f"{self.__class__.__qualname__}.write_full")
+
+        dataset_count = len(datasets)
+        num_workers = min(self.max_concurrent_dataset_writes, dataset_count)
+        L.info("Writing %d datasets using %d connections", dataset_count, num_workers)
+        written = []
+        tree_id = commit.peel(pygit2.Tree).id
+
+        def write_dataset(i, dataset):
+            # A pygit2 Repository shouldn't be shared between threads - each write reads its dataset from its own.
+            repo = KartRepo(self.repo.path, validate=False)
+            repo_dataset = repo.datasets(tree_id)[dataset.path]
+            with pause_refreshing(repo.odb), self._separate_session() as sess:
+                is_written = self._write_full_dataset(
+                    sess, commit, repo_dataset, i, dataset_count
                 )
+            if is_written:
+                written.append(dataset)
 
+        self.repo.odb.refresh()
+        try:
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                futures = [
+                    executor.submit(write_dataset, i, dataset)
+                    for i, dataset in enumerate(datasets)
+                ]
                 try:
-                    # Create the table
-                    self._write_meta(sess, dataset)
-                    self._create_table_for_dataset(sess, dataset)
-                except NotYetImplemented as e:
-                    click.secho(
-                        f"Couldn't write {dataset.table_name} to working copy:\n{e}",
-                        err=True,
-                        fg="red",
-                    )
-                    continue
+                    for future in as_completed(futures):
+                        future.result()
+                except Exception:
+                    for future in futures:
+                        future.cancel()
+                    raise
+        except Exception:
+            if written:
+                L.info("Dropping %d datasets that were already written", len(written))
+                self.drop_tables(commit, *written)
+            raise
 
-                if dataset.has_geometry:
-                    self._create_spatial_index_pre(sess, dataset)
+    @contextlib.contextmanager
+    def _separate_session(self):
+        """
+        Like session, but always yields a new session with its own connection and transaction, even if session
+        is already in use. Used for writing to several tables at once.
+        """
+        sess = self.sessionmaker()
+        try:
+            yield sess
+            sess.commit()
+        except Exception:
+            sess.rollback()
+            raise
+        finally:
+            sess.close()
+
+    def _write_full_dataset(self, sess, commit, dataset, i, dataset_count):
+        """
+        Writes a single full layer into a working-copy table - see write_full.
+        Returns False if the dataset couldn't be written since it isn't supported by this type of working copy.
+        """
+        L = logging.getLogger(f"{self.__class__.__qualname__}.write_full")
+        L.info("Writing dataset %d of %d: %s", i + 1, dataset_count, dataset.path)
 
-                L.info("Creating features...")
-                sql = self._insert_into_dataset(dataset)
-                t0 = time.monotonic()
+        try:
+            # Create the table
+            self._write_meta(sess, dataset)
+            self._create_table_for_dataset(sess, dataset)
+        except NotYetImplemented as e:
+            click.secho(
+                f"Couldn't write {dataset.table_name} to working copy:\n{e}",
+                err=True,
+                fg="red",
+            )
+            return False
 
-                CHUNK_SIZE = 10000
+        if dataset.has_geometry:
+            self._create_spatial_index_pre(sess, dataset)
 
-                for row_dicts in chunk(
-                    dataset.features_with_crs_ids(
-                        self.repo.spatial_filter, log_progress=L.info
-                    ),
-                    CHUNK_SIZE,
-                ):
-                    sess.execute(sql, row_dicts)
+        L.info("Creating features...")
+        t0 = time.monotonic()
 
-                if dataset.has_geometry:
-                    self._create_spatial_index_post(sess, dataset)
-
-                if not dataset.feature_path_encoder.DISTRIBUTED_FEATURES:
-                    # Set up a sequence so that the user doesn't have to supply the next int PK.
-                    self._initialise_sequence(sess, dataset)
-
-                self._create_triggers(sess, dataset)
-                self._update_last_write_time(sess, dataset, commit)
-
-                t1 = time.monotonic()
-                L.info(
-                    "Wrote dataset %d of %d in %.1fs: %s",
-                    i + 1,
-                    dataset_count,
-                    t1 - t0,
-                    dataset.path,
-                )
+        self._write_all_features(
+            sess,
+            dataset,
+            dataset.features_with_crs_ids(
+                dataset.repo.spatial_filter, log_progress=L.info
+            ),
+        )
 
-            self._update_state_table_tree(sess, commit.peel(pygit2.Tree).id.hex)
-            self._update_state_table_spatial_filter_hash(
-                sess, self.repo.spatial_filter.hexhash
-            )
+        if dataset.has_geometry:
+            self._create_spatial_index_post(sess, dataset)
+
+        if not dataset.feature_path_encoder.DISTRIBUTED_FEATURES:
+            # Set up a sequence so that the user doesn't have to supply the next int PK.
+            self._initialise_sequence(sess, dataset)
+
+        self._create_triggers(sess, dataset)
+        self._update_last_write_time(sess, dataset, commit)
+
+        t1 = time.monotonic()
+        L.info(
+            "Wrote dataset %d of %d in %.1fs: %s",
+            i + 1,
+            dataset_count,
+            t1 - t0,
+            dataset.path,
+        )
+        return True
+
+    def _write_all_features(self, sess, dataset, features):
+        """
+        Bulk-writes the given features into the table for the dataset, which must not already contain rows with the
+        same PKs. Called by write_full to fill the newly created (and empty) table, after _create_spatial_index_pre and
+        before _create_spatial_index_post and _create_triggers. Also called by _replace_features_from_dataset once the
+        rows being replaced have been deleted. Subclasses can override this to use a faster bulk-loading mechanism if
+        one is available.
+        """
+        sql = self._insert_into_dataset(dataset)
+        CHUNK_SIZE = 10000
+        # Features are read and decoded by a background thread while each chunk is written.
+        for row_dicts in iterate_in_background(chunk(features, CHUNK_SIZE)):
+            sess.execute(sql, row_dicts)
 
     def _write_meta(self, sess, dataset):
         """
@@ -986,14 +1198,13 @@ class TableWorkingCopy(WorkingCopyPart):
         sql = self._insert_or_replace_into_dataset(dataset)
         feat_count = 0
         CHUNK_SIZE = 10000
-        for row_dicts in chunk(
-            dataset.get_features_with_crs_ids(
-                pk_list,
-                ignore_missing=ignore_missing,
-                spatial_filter=self.repo.spatial_filter,
-            ),
-            CHUNK_SIZE,
-        ):
+        features = dataset.get_features_with_crs_ids(
+            pk_list,
+            ignore_missing=ignore_missing,
+            spatial_filter=self.repo.spatial_filter,
+        )
+        # Features are read and decoded by a background thread while each chunk is written.
+        for row_dicts in iterate_in_background(chunk(features, CHUNK_SIZE)):
             sess.execute(sql, row_dicts)
             feat_count += len(row_dicts)
 
@@ -1041,6 +1252,11 @@ class TableWorkingCopy(WorkingCopyPart):
         else:
             pk_list = features_to_delete
 
+        if len(pk_list) >= self.BULK_REPLACE_MIN_FEATURES and self._can_use_pks_table(
+            dataset
+        ):
+            return self._delete_features_using_pks_table(sess, dataset, pk_list)
+
         pk_column = self.preparer.quote(dataset.primary_key)
         sql = f"""DELETE FROM {self.table_identifier(dataset)} WHERE {pk_column} IN :pks;"""
         stmt = sa.text(sql).bindparams(sa.bindparam("pks", expanding=True))
@@ -1052,6 +1268,68 @@ class TableWorkingCopy(WorkingCopyPart):
 
         return feat_count
 
+    def _can_use_pks_table(self, dataset):
+        pk_columns = dataset.schema.pk_columns
+        return len(pk_columns) == 1 and pk_columns[0].data_type in ("integer", "text")
+
+    def _delete_features_using_pks_table(self, sess, dataset, pk_list):
+        """
+        Deletes all of the features with the given PKs by loading the PKs into a temporary table, and then
+        deleting every matching row with a single statement - see BaseKartAdapter.sql_delete_pks_in_table.
+        """
+        pk_type = (
+            sa.BigInteger
+            if dataset.schema.pk_columns[0].data_type == "integer"
+            else sa.UnicodeText
+        )
+        pks_table = self.adapter.temporary_table(
+            "kart_delete_pks", sa.Column("pk", pk_type)
+        )
+        pks_table.create(sess.connection())
+        try:
+            self._fill_pks_table(sess, pks_table, pk_list)
+            r = sess.execute(
+                self.adapter.sql_delete_pks_in_table(
+                    self.table_identifier(dataset), dataset.primary_key, pks_table
+                )
+            )
+            return r.rowcount
+        finally:
+            pks_table.drop(sess.connection())
+
+    def _fill_pks_table(self, sess, pks_table, pk_list):
+        """Inserts the given PKs into the "pk" column of the given temporary table."""
+        CHUNK_SIZE = 10000
+        for pks in chunk(pk_list, CHUNK_SIZE):
+            sess.execute(pks_table.insert(), [{"pk": pk} for pk in pks])
+
+    def _replace_features_from_dataset(self, sess, dataset, pk_list):
+        """
+        Replaces the rows with the given PKs in the table for the dataset with the features from the dataset.
+        Rows are deleted if the dataset has no feature with that PK.
+        Returns a tuple (deleted_count, written_count).
+        """
+        deleted_count = self._delete_features_from_dataset(sess, dataset, pk_list)
+        if len(pk_list) < self.BULK_REPLACE_MIN_FEATURES:
+            written_count = self._write_features_from_dataset(
+                sess, dataset, pk_list, ignore_missing=True
+            )
+            return deleted_count, written_count
+
+        # None of these rows exist anymore, so the new features can be written the same way as during a checkout.
+        written_count = 0
+
+        def counted_features():
+            nonlocal written_count
+            for feature in dataset.get_features_with_crs_ids(
+                pk_list, ignore_missing=True, spatial_filter=self.repo.spatial_filter
+            ):
+                written_count += 1
+                yield feature
+
+        self._write_all_features(sess, dataset, counted_features())
+        return deleted_count, written_count
+
     def drop_tables(self, commit_or_tree, *datasets):
         """Drop the tables for all the given datasets."""
         with self.session() as sess:
@@ -1195,17 +1473,30 @@ class TableWorkingCopy(WorkingCopyPart):
             repo_key_filter,
         )
 
+        # Only possible when the working copy is empty - see _can_write_concurrently - in which case there are
+        # no old tables to drop or update. The state table is only updated once every new table is written.
+        write_concurrently = self._can_write_concurrently(len(ds_inserts))
+        if write_concurrently:
+            self._write_full_concurrently(
+                commit_or_tree, *[target_datasets[d] for d in ds_inserts]
+            )
+
         with self.session() as sess:
-            # Delete old tables
-            if ds_deletes:
-                self.drop_tables(
-                    commit_or_tree, *[base_datasets[d] for d in ds_deletes]
-                )
-            # Write new tables
-            if ds_inserts:
-                self.write_full(
-                    commit_or_tree, *[target_datasets[d] for d in ds_inserts]
+            if write_concurrently:
+                self._update_state_table_spatial_filter_hash(
+                    sess, self.repo.spatial_filter.hexhash
                 )
+            else:
+                # Delete old tables
+                if ds_deletes:
+                    self.drop_tables(
+                        commit_or_tree, *[base_datasets[d] for d in ds_deletes]
+                    )
+                # Write new tables
+                if ds_inserts:
+                    self.write_full(
+                        commit_or_tree, *[target_datasets[d] for d in ds_inserts]
+                    )
 
             # Update tables that can be updated in place.
             for ds_path in ds_updates:
@@ -1303,8 +1594,7 @@ class TableWorkingCopy(WorkingCopyPart):
             ctx = contextlib.nullcontext()
 
         with ctx:
-            self._delete_features_from_dataset(sess, target_ds, pks)
-            self._write_features_from_dataset(sess, target_ds, pks, ignore_missing=True)
+            self._replace_features_from_dataset(sess, target_ds, pks)
 
     def _is_meta_update_supported(self, meta_diff):
         """
@@ -1399,15 +1689,14 @@ class TableWorkingCopy(WorkingCopyPart):
             # todo: suspend/remove spatial index
             L.debug("Cleaning up dirty rows...")
 
-            count = self._delete_features_from_dataset(sess, base_ds, dirty_pk_list)
-            L.debug(
-                f"_reset_dirty_rows(): removed {count} features, tracking Δ count={track_count}"
+            deleted_count, written_count = self._replace_features_from_dataset(
+                sess, base_ds, dirty_pk_list
             )
-            count = self._write_features_from_dataset(
-                sess, base_ds, dirty_pk_list, ignore_missing=True
+            L.debug(
+                f"_reset_dirty_rows(): removed {deleted_count} features, tracking Δ count={track_count}"
             )
             L.debug(
-                f"_reset_dirty_rows(): wrote {count} features, tracking Δ count={track_count}"
+                f"_reset_dirty_rows(): wrote {written_count} features, tracking Δ count={track_count}"
             )
 
             self._mark_as_clean_for_table(sess, base_ds.table_name, feature_filter)
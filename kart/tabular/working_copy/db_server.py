@@ -16,6 +16,9 @@ from .base import TableWorkingCopy
 class DatabaseServer_WorkingCopy(TableWorkingCopy):
     """Functionality common to working copies that connect to a database server."""
 
+    # Database servers can load different tables in parallel, over separate connections.
+    MAX_CONCURRENT_DATASET_WRITES = 4
+
     @property
     @classmethod
     def URI_SCHEME(cls):
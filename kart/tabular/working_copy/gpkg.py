@@ -1,4 +1,5 @@
 import contextlib
+import itertools
 import logging
 import os
 import time
@@ -14,6 +15,7 @@ from kart.exceptions import InvalidOperation
 from kart.sqlalchemy import text_with_inlined_params
 from kart.sqlalchemy.adapter.gpkg import KartAdapter_GPKG
 from kart.schema import Schema
+from kart.utils import chunk, iterate_in_background
 from sqlalchemy.dialects.sqlite.base import SQLiteIdentifierPreparer
 from sqlalchemy.orm import sessionmaker
 
@@ -34,6 +36,13 @@ class WorkingCopy_GPKG(TableWorkingCopy):
 
     WORKING_COPY_TYPE_NAME = "GPKG"
 
+    # Pragmas used while checking out features into a new working copy - see session(bulk_load=True).
+    BULK_LOAD_PRAGMAS = {
+        "journal_mode": "MEMORY",
+        "synchronous": "OFF",
+        "cache_size": -512 * 1024,  # 512 MiB
+    }
+
     def __init__(self, repo, location):
         self.repo = repo
         self.path = self.location = location
@@ -101,13 +110,15 @@ class WorkingCopy_GPKG(TableWorkingCopy):
         return False
 
     @contextlib.contextmanager
-    def session(
-        self,
-    ):
+    def session(self, bulk_load=False):
         """
         Context manager for GeoPackage DB sessions, yields a connection object inside a transaction
 
         Calling again yields the _same_ connection, the transaction/etc only happen in the outer one.
+
+        If bulk_load is set (and this is the outer call), the pragmas in BULK_LOAD_PRAGMAS are applied for
+        the duration of the session. These trade durability for speed - if the process is killed partway
+        through, the GPKG may be left corrupt - so should only be used when writing to a new working copy.
         """
         L = logging.getLogger(f"{self.__class__.__qualname__}.session")
 
@@ -121,8 +132,15 @@ class WorkingCopy_GPKG(TableWorkingCopy):
         # Outer call - create new session:
         L.debug("session: new...")
         self._session = self.sessionmaker()
+        original_pragmas = None
 
         try:
+            # Pragmas such as journal_mode can't be changed once the transaction has started.
+            original_pragmas = (
+                self._set_pragmas(self._session, self.BULK_LOAD_PRAGMAS)
+                if bulk_load
+                else None
+            )
             # TODO - use tidier syntax for opening transactions from sqlalchemy.
             self._session.execute("BEGIN TRANSACTION;")
             yield self._session
@@ -132,10 +150,120 @@ class WorkingCopy_GPKG(TableWorkingCopy):
             self._session.rollback()
             raise
         finally:
+            if original_pragmas:
+                self._set_pragmas(self._session, original_pragmas)
             self._session.close()
             del self._session
             L.debug("session: new/done")
 
+    def _set_pragmas(self, sess, pragmas):
+        """Sets the given pragmas, and returns a dict of the values they had previously."""
+        original_pragmas = {}
+        for name, value in pragmas.items():
+            original_pragmas[name] = sess.scalar(f"PRAGMA {name};")
+            sess.execute(f"PRAGMA {name} = {value};")
+        return original_pragmas
+
+    def _is_newly_created(self):
+        """
+        True if nothing has been checked out to this working copy yet. The bulk-load pragmas risk corrupting the
+        whole GPKG - including any uncommitted edits - if the process is killed partway through, so they're only
+        used when writing to a newly created working copy, not when adding tables to an existing one.
+        """
+        return self.get_tree_id() is None
+
+    def reset(self, commit_or_tree, **kwargs):
+        with self.session(bulk_load=self._is_newly_created()):
+            super().reset(commit_or_tree, **kwargs)
+
+    def write_full(self, commit, *datasets):
+        with self.session(bulk_load=self._is_newly_created()):
+            super().write_full(commit, *datasets)
+
+    def _write_all_features(self, sess, dataset, features):
+        # Inserting using the sqlite3 cursor directly avoids sqlalchemy's per-row overhead - executemany can
+        # consume the features lazily, so they needn't be batched. When loading into an empty table, the R-tree
+        # triggers are suspended during the load, and the R-tree is populated in a single statement afterwards.
+        table = self._table_def_for_dataset(dataset)
+        dialect = sess.get_bind().dialect
+        col_names = [col.name for col in table.columns]
+        processors = [col.type.bind_processor(dialect) for col in table.columns]
+
+        def rows():
+            for feature in features:
+                yield tuple(
+                    proc(feature.get(name)) if proc else feature.get(name)
+                    for name, proc in zip(col_names, processors)
+                )
+
+        quoted_col_names = ", ".join(self.quote(name) for name in col_names)
+        placeholders = ", ".join("?" for name in col_names)
+        insert_sql = (
+            f"INSERT INTO {self.table_identifier(dataset)} ({quoted_col_names}) "
+            f"VALUES ({placeholders});"
+        )
+
+        # When replacing some rows of a table that is already populated, it's cheaper to let the triggers
+        # update the R-tree row by row than to repopulate the R-tree for the whole table.
+        rebuild_rtree = dataset.has_geometry and not sess.scalar(
+            f"SELECT EXISTS(SELECT 1 FROM {self.table_identifier(dataset)});"
+        )
+        suspend_rtree = (
+            self._suspend_rtree_triggers(sess, dataset)
+            if rebuild_rtree
+            else contextlib.nullcontext()
+        )
+        # Features are read, decoded and converted by a background thread while the rows are inserted.
+        CHUNK_SIZE = 1000
+        prepared_rows = itertools.chain.from_iterable(
+            iterate_in_background(chunk(rows(), CHUNK_SIZE))
+        )
+
+        with suspend_rtree:
+            dbcur = sess.connection().connection.cursor()
+            try:
+                dbcur.executemany(insert_sql, prepared_rows)
+            finally:
+                dbcur.close()
+
+            if rebuild_rtree:
+                self._populate_rtree(sess, dataset)
+
+    def _rtree_table_name(self, dataset):
+        return f"rtree_{dataset.table_name}_{dataset.geom_column_name}"
+
+    @contextlib.contextmanager
+    def _suspend_rtree_triggers(self, sess, dataset):
+        """Drops the triggers that gpkgAddSpatialIndex created to maintain the R-tree, and then restores them."""
+        prefix = f"{self._rtree_table_name(dataset)}_"
+        r = sess.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = :table_name;",
+            {"table_name": dataset.table_name},
+        )
+        rtree_triggers = [(name, sql) for name, sql in r if name.startswith(prefix)]
+        for name, sql in rtree_triggers:
+            sess.execute(f"DROP TRIGGER {self.quote(name)};")
+        yield
+        for name, sql in rtree_triggers:
+            sess.execute(sql)
+
+    def _populate_rtree(self, sess, dataset):
+        """Adds every feature in the table for the given dataset to its (empty) R-tree spatial index."""
+        L = logging.getLogger(f"{self.__class__.__qualname__}._populate_rtree")
+        t0 = time.monotonic()
+
+        geom_col = self.quote(dataset.geom_column_name)
+        # This is the same as the GeoPackage spec's rtree_<t>_<c>_insert trigger, but for all rows at once.
+        sess.execute(
+            f"""
+            INSERT OR REPLACE INTO {self.quote(self._rtree_table_name(dataset))}
+            SELECT rowid, ST_MinX({geom_col}), ST_MaxX({geom_col}), ST_MinY({geom_col}), ST_MaxY({geom_col})
+            FROM {self.table_identifier(dataset)}
+            WHERE {geom_col} NOT NULL AND NOT ST_IsEmpty({geom_col});
+            """
+        )
+        L.info("Populated spatial index in %.1fs", time.monotonic() - t0)
+
     def delete(self, keep_db_schema_if_possible=False):
         """Delete the working copy files."""
         self.full_path.unlink()
@@ -1,12 +1,17 @@
 import contextlib
+import itertools
 import logging
+import os
+import tempfile
 import time
 
 from kart import crs_util
 from kart.sqlalchemy import separate_last_path_part, text_with_inlined_params
-from kart.sqlalchemy.adapter.mysql import KartAdapter_MySql
+from kart.sqlalchemy.adapter.mysql import GeometryType, KartAdapter_MySql
 from kart.schema import Schema
+from kart.utils import chunk, iterate_in_background
 from sqlalchemy.dialects.mysql.base import MySQLIdentifierPreparer
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker
 
 from .db_server import DatabaseServer_WorkingCopy
@@ -40,6 +45,12 @@ class WorkingCopy_MySql(DatabaseServer_WorkingCopy):
     URI_FORMAT = "//HOST[:PORT]/DBNAME"
     INVALID_PATH_MESSAGE = "URI path must have one part - the database name"
 
+    # How many features are written to each file that is sent to the server using LOAD DATA LOCAL INFILE.
+    LOAD_DATA_CHUNK_SIZE = 100000
+
+    # MySQL error codes which mean that LOAD DATA LOCAL INFILE is disabled, either at the client or the server.
+    LOAD_DATA_LOCAL_DISABLED_ERRORS = (1148, 2068, 3948)
+
     def __init__(self, repo, location):
         """
         uri: connection string of the form mysql://[user[:password]@][netloc][:port][/dbname][?param1=value1&...]
@@ -144,6 +155,135 @@ class WorkingCopy_MySql(DatabaseServer_WorkingCopy):
 
         L.info("Created spatial index in %.1fs", time.monotonic() - t0)
 
+    def _is_load_data_local_enabled(self, sess):
+        return bool(sess.scalar("SELECT @@GLOBAL.local_infile;"))
+
+    def _write_all_features(self, sess, dataset, features):
+        # LOAD DATA is much faster than batches of INSERT statements, but LOAD DATA LOCAL INFILE - which is what
+        # lets the client supply the data - is disabled by default in MySQL 8. If so, we fall back to INSERTs.
+        L = logging.getLogger(f"{self.__class__.__qualname__}._write_all_features")
+
+        if not self._is_load_data_local_enabled(sess):
+            L.info("LOAD DATA LOCAL INFILE is disabled on the server - using INSERT")
+            super()._write_all_features(sess, dataset, features)
+            return
+
+        load_data_sql, format_line = self._load_data_for_dataset(dataset)
+
+        def prepared_chunks():
+            for row_dicts in chunk(features, self.LOAD_DATA_CHUNK_SIZE):
+                yield row_dicts, "".join(format_line(r) for r in row_dicts)
+
+        # Features are read, decoded and formatted by a background thread while each chunk is loaded.
+        chunks = iterate_in_background(prepared_chunks(), max_queued_items=2)
+        load_conn = self._load_data_connection()
+        with tempfile.TemporaryDirectory() as tmp_dir, load_conn as conn:
+            tmp_path = os.path.join(tmp_dir, "features.tsv")
+            for i, (row_dicts, data) in enumerate(chunks):
+                with open(tmp_path, "w", encoding="utf-8", newline="\n") as tmp_file:
+                    tmp_file.write(data)
+                try:
+                    conn.execute(load_data_sql, {"path": tmp_path})
+                except OperationalError as e:
+                    error_code = e.orig.args[0]
+                    if i > 0 or error_code not in self.LOAD_DATA_LOCAL_DISABLED_ERRORS:
+                        raise
+                    L.info("LOAD DATA LOCAL INFILE was rejected (%s) - using INSERT", e)
+                    remaining = itertools.chain.from_iterable(r for r, _ in chunks)
+                    super()._write_all_features(
+                        sess, dataset, itertools.chain(row_dicts, remaining)
+                    )
+                    return
+                self._check_load_data_warnings(conn, dataset)
+
+    @contextlib.contextmanager
+    def _load_data_connection(self):
+        """
+        Yields a connection, inside a transaction, that can run LOAD DATA LOCAL INFILE. A client that allows this
+        will upload any file the server asks for, so it is only allowed on this short-lived connection - the
+        working copy's own engine doesn't allow it. Since the features are loaded in a transaction of their own,
+        this is only used to write to a table that the caller's transaction hasn't otherwise modified.
+        """
+        engine = self.adapter.create_engine(
+            self.connect_uri, connect_args={"local_infile": True}
+        )
+        try:
+            with engine.begin() as conn:
+                yield conn
+        finally:
+            engine.dispose()
+
+    def _replace_features_from_dataset(self, sess, dataset, pk_list):
+        # The replaced rows are deleted in the caller's transaction, so LOAD DATA - which has a connection of its
+        # own, see _load_data_connection - would wait on their locks. The new rows are INSERTed instead.
+        deleted_count = self._delete_features_from_dataset(sess, dataset, pk_list)
+        written_count = self._write_features_from_dataset(
+            sess, dataset, pk_list, ignore_missing=True
+        )
+        return deleted_count, written_count
+
+    def _check_load_data_warnings(self, conn, dataset):
+        # With LOCAL, MySQL treats data errors as warnings, as if IGNORE were given - a value that can't be converted
+        # is truncated, or replaced with NULL or 0, and the row is still written. INSERT would fail instead, so we
+        # fail too, rather than leave the working copy with values that don't match the dataset.
+        warnings = [
+            row
+            for row in conn.execute("SHOW WARNINGS;")
+            if row.Level in ("Warning", "Error")
+        ]
+        if warnings:
+            messages = "\n".join(row.Message for row in warnings[:10])
+            raise RuntimeError(
+                f"Couldn't write {dataset.table_name} to working copy:\n{messages}"
+            )
+
+    def _load_data_for_dataset(self, dataset):
+        """
+        Returns a tuple (load_data_sql, format_line) - load_data_sql is a LOAD DATA LOCAL INFILE statement that
+        loads the file at :path into the table for the given dataset, and format_line(row_dict) returns a single
+        line of such a file. Geometries and blobs are written as hex, and are converted back on the server.
+        """
+        table = self._table_def_for_dataset(dataset)
+        targets = []
+        assignments = []
+        converters = []
+        for i, col in enumerate(dataset.schema.columns):
+            if col.data_type in ("geometry", "blob", "boolean"):
+                var_name = f"@v{i}"
+                targets.append(var_name)
+                if col.data_type == "geometry":
+                    crs_id = table.columns[col.name].type.crs_id or 0
+                    value_sql = f"ST_GeomFromWKB(UNHEX({var_name}), {crs_id}, '{GeometryType.AXIS_ORDER}')"
+                elif col.data_type == "blob":
+                    value_sql = f"UNHEX({var_name})"
+                else:
+                    # LOAD DATA can't write "1" or "0" to a BIT column directly - it would write the character.
+                    value_sql = f"CAST({var_name} AS UNSIGNED)"
+                assignments.append(f"{self.quote(col.name)} = {value_sql}")
+            else:
+                targets.append(self.quote(col.name))
+            converters.append((col.name, _load_data_converter(col)))
+
+        set_clause = f"SET {', '.join(assignments)}" if assignments else ""
+        load_data_sql = f"""
+            LOAD DATA LOCAL INFILE :path INTO TABLE {self.table_identifier(dataset)}
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n'
+            ({', '.join(targets)}) {set_clause};
+        """
+
+        def format_line(row_dict):
+            values = (row_dict.get(name) for name, _ in converters)
+            return (
+                "\t".join(
+                    "\\N" if value is None else convert(value)
+                    for value, (_, convert) in zip(values, converters)
+                )
+                + "\n"
+            )
+
+        return load_data_sql, format_line
+
     def _drop_spatial_index(self, sess, dataset):
         # MySQL deletes the spatial index automatically when the table is deleted.
         pass
@@ -317,3 +457,31 @@ class WorkingCopy_MySql(DatabaseServer_WorkingCopy):
             sess.execute(
                 f"""ALTER TABLE {self.table_identifier(table)} MODIFY {dest_spec};"""
             )
+
+
+# Characters that must be backslash-escaped in the data file read by LOAD DATA.
+_LOAD_DATA_ESCAPES = str.maketrans(
+    {"\\": "\\\\", "\n": "\\n", "\r": "\\r", "\t": "\\t", "\0": "\\0"}
+)
+
+
+def _load_data_converter(col):
+    """
+    Returns a function that converts a (non-null) Kart value for the given column to a field in a file that
+    LOAD DATA can read. This mirrors the ConverterTypes in KartAdapter_MySql, which do the same job when rows
+    are written using INSERT.
+    """
+    data_type = col.data_type
+    if data_type == "geometry":
+        # Converted back to binary - and then to a MySQL geometry - using UNHEX() and ST_GeomFromWKB().
+        return lambda geom: geom.to_wkb().hex() if geom else "\\N"
+    elif data_type == "blob":
+        return lambda blob: bytes(blob).hex()
+    elif data_type == "boolean":
+        return lambda value: "1" if value else "0"
+    elif data_type in ("integer", "float"):
+        return str
+    elif data_type == "timestamp":
+        return lambda value: str(value).rstrip("Z").translate(_LOAD_DATA_ESCAPES)
+
+    return lambda value: str(value).translate(_LOAD_DATA_ESCAPES)
@@ -4,8 +4,12 @@ import time
 
 from kart import crs_util
 from kart.sqlalchemy import separate_last_path_part, text_with_inlined_params
-from kart.sqlalchemy.adapter.sqlserver import KartAdapter_SqlServer
+from kart.sqlalchemy.adapter.sqlserver import (
+    GeometryType,
+    KartAdapter_SqlServer,
+)
 from kart.schema import Schema
+from kart.utils import chunk, iterate_in_background
 from sqlalchemy.dialects.mssql.base import MSIdentifierPreparer
 from sqlalchemy.orm import sessionmaker
 
@@ -29,6 +33,15 @@ class WorkingCopy_SqlServer(DatabaseServer_WorkingCopy):
     WORKING_COPY_TYPE_NAME = "SQL Server"
     URI_SCHEME = "mssql"
 
+    # How many features are bulk-inserted into the staging table before being copied to the dataset table.
+    STAGING_CHUNK_SIZE = 100000
+    STAGING_TABLE = "#kart_staging"
+
+    # These are sent as text and converted by SQL Server when they are copied from the staging table.
+    # Their text representations are all short, so they are staged with a bounded type - see _staging_input_sizes.
+    STAGING_TEXT_TYPES = ("date", "time", "timestamp", "numeric", "interval")
+    STAGING_TEXT_LENGTH = 64
+
     def __init__(self, repo, location):
         """
         uri: connection string of the form mssql://[user[:password]@][netloc][:port][/dbname/schema][?param1=value1&...]
@@ -136,6 +149,121 @@ class WorkingCopy_SqlServer(DatabaseServer_WorkingCopy):
 
         L.info("Created spatial index in %.1fs", time.monotonic() - t0)
 
+    def _write_all_features(self, sess, dataset, features):
+        # pyodbc sends an executemany as one round-trip per row, unless fast_executemany is set - then it binds
+        # each batch as arrays of parameters. The values need to go into a table with plain column types for
+        # that to work, so features are bulk-inserted as WKB into a staging table, and then copied into the
+        # dataset table - with geometry::STGeomFromWKB applied - using a single INSERT ... SELECT per chunk.
+        L = logging.getLogger(f"{self.__class__.__qualname__}._write_all_features")
+
+        (
+            staging_spec,
+            insert_staging_sql,
+            copy_sql,
+            converters,
+            input_types,
+        ) = self._staging_for_dataset(dataset)
+        sess.execute(f"DROP TABLE IF EXISTS {self.STAGING_TABLE};")
+        sess.execute(f"CREATE TABLE {self.STAGING_TABLE} ({staging_spec});")
+
+        def staging_rows():
+            for row_dict in features:
+                yield tuple(convert(row_dict.get(name)) for name, convert in converters)
+
+        t0 = time.monotonic()
+        feat_count = 0
+        cursor = sess.connection().connection.cursor()
+        try:
+            cursor.fast_executemany = True
+            # Features are read, decoded and converted by a background thread while each chunk is written.
+            for rows in iterate_in_background(
+                chunk(staging_rows(), self.STAGING_CHUNK_SIZE), max_queued_items=2
+            ):
+                cursor.setinputsizes(_staging_input_sizes(rows, input_types))
+                cursor.executemany(insert_staging_sql, rows)
+                sess.execute(copy_sql)
+                sess.execute(f"TRUNCATE TABLE {self.STAGING_TABLE};")
+                feat_count += len(rows)
+        finally:
+            cursor.close()
+
+        sess.execute(f"DROP TABLE {self.STAGING_TABLE};")
+        L.debug("Wrote %d rows in %.1fs", feat_count, time.monotonic() - t0)
+
+    def _fill_pks_table(self, sess, pks_table, pk_list):
+        # As above, fast_executemany saves a round-trip per PK.
+        insert_sql = f"INSERT INTO {self.quote(pks_table.name)} (pk) VALUES (?);"
+        cursor = sess.connection().connection.cursor()
+        try:
+            cursor.fast_executemany = True
+            for pks in chunk(pk_list, self.STAGING_CHUNK_SIZE):
+                cursor.executemany(insert_sql, [(pk,) for pk in pks])
+        finally:
+            cursor.close()
+
+    def _staging_for_dataset(self, dataset):
+        """
+        Returns a tuple (staging_spec, insert_staging_sql, copy_sql, converters, input_types) -
+        staging_spec - the column specification for a staging table for the given dataset.
+        insert_staging_sql - a statement with positional parameters that inserts one row into the staging table.
+        copy_sql - a statement that copies all rows from the staging table into the dataset table.
+        converters - a list of (column-name, function) pairs for getting a staging-table row from a feature.
+        input_types - a list of how each parameter should be bound - see _staging_input_sizes.
+        """
+        table = self._table_def_for_dataset(dataset)
+        staging_cols = []
+        select_exprs = []
+        converters = []
+        input_types = []
+        for col in dataset.schema.columns:
+            quoted_name = self.quote(col.name)
+            if col.data_type == "geometry":
+                crs_id = table.columns[col.name].type.crs_id or 0
+                staging_cols.append(f"{quoted_name} VARBINARY(max)")
+                # POINT EMPTY is handled specially since it doesn't have a WKB value the SQL Server accepts.
+                select_exprs.append(
+                    f"""
+                    CASE WHEN {quoted_name} = {GeometryType.EMPTY_POINT_WKB}
+                    THEN geometry::STGeomFromText('POINT EMPTY', {crs_id})
+                    ELSE geometry::STGeomFromWKB({quoted_name}, {crs_id}) END
+                    """
+                )
+                converters.append((col.name, _geometry_to_wkb))
+                # Geometries stay VARBINARY(max) since they can be any size - see #617 - but each chunk is still
+                # bound as an array whenever all of its geometries are small enough - see _staging_input_sizes.
+                input_types.append(("VARBINARY", None))
+            else:
+                if col.data_type in self.STAGING_TEXT_TYPES:
+                    staging_type = f"NVARCHAR({self.STAGING_TEXT_LENGTH})"
+                    input_types.append(("NVARCHAR", self.STAGING_TEXT_LENGTH))
+                else:
+                    staging_type = self.adapter.v2_type_to_sql_type(col, dataset)
+                    sql_type, _, length = staging_type.rstrip(")").partition("(")
+                    if length == "max":
+                        input_types.append((sql_type, None))
+                    else:
+                        # pyodbc gets the type of this parameter from SQL Server.
+                        input_types.append(None)
+                staging_cols.append(f"{quoted_name} {staging_type}")
+                select_exprs.append(quoted_name)
+                if col.data_type == "timestamp":
+                    convert = table.columns[col.name].type.python_prewrite
+                else:
+                    convert = _identity
+                converters.append((col.name, convert))
+
+        col_names = ", ".join(self.quote(col.name) for col in dataset.schema.columns)
+        placeholders = ", ".join("?" for col in dataset.schema.columns)
+        staging_spec = ", ".join(staging_cols)
+        insert_staging_sql = (
+            f"INSERT INTO {self.STAGING_TABLE} ({col_names}) VALUES ({placeholders});"
+        )
+        copy_sql = f"""
+            INSERT INTO {self.table_identifier(dataset)} ({col_names})
+            SELECT {", ".join(select_exprs)} FROM {self.STAGING_TABLE};
+        """
+        return staging_spec, insert_staging_sql, copy_sql, converters, input_types
+
     def _drop_spatial_index(self, sess, dataset):
         # SQL server deletes the spatial index automatically when the table is deleted.
         pass
@@ -365,3 +493,57 @@ class WorkingCopy_SqlServer(DatabaseServer_WorkingCopy):
             sess.execute(
                 f"""ALTER TABLE {self.table_identifier(table)} ALTER COLUMN {dest_spec};"""
             )
+
+
+def _identity(value):
+    return value
+
+
+def _geometry_to_wkb(geom):
+    return geom.to_wkb() if geom else None
+
+
+def _utf16_length(value):
+    # NVARCHAR lengths are in UTF-16 code units - characters outside the BMP take two.
+    return len(value) if value.isascii() else len(value.encode("utf-16-le")) // 2
+
+
+# SQL type: (pyodbc type, longest value SQL Server allows for a bounded type, function for the length of a value).
+_BOUNDED_INPUT_TYPES = {
+    "NVARCHAR": ("SQL_WVARCHAR", 4000, _utf16_length),
+    "VARCHAR": ("SQL_VARCHAR", 8000, len),
+    "VARBINARY": ("SQL_VARBINARY", 8000, len),
+}
+
+
+def _staging_input_sizes(rows, input_types):
+    """
+    Returns the parameter sizes to pass to cursor.setinputsizes before inserting the given rows into a staging table.
+    input_types - a list of (sql-type, length) pairs (or None, to let pyodbc describe that parameter) - see
+    WorkingCopy_SqlServer._staging_for_dataset. A length of None means the staging column is a (max) column:
+    pyodbc's fast_executemany sends the values of a (max) parameter separately, row by row, instead of as an array,
+    so instead the parameter is bound with the size of its longest value in these rows - as long as that size is
+    within what SQL Server allows for a bounded type. Otherwise, this chunk of rows is sent the slow way.
+    """
+    import pyodbc
+
+    sizes = []
+    for i, input_type in enumerate(input_types):
+        if input_type is None:
+            sizes.append(None)
+            continue
+        sql_type, length = input_type
+        if sql_type not in _BOUNDED_INPUT_TYPES:
+            sizes.append(None)
+            continue
+        odbc_type_name, max_length, value_length = _BOUNDED_INPUT_TYPES[sql_type]
+        odbc_type = getattr(pyodbc, odbc_type_name)
+        if length is None:
+            length = max(
+                (value_length(row[i]) for row in rows if row[i] is not None), default=1
+            )
+            if length > max_length:
+                sizes.append(None)
+                continue
+        sizes.append((odbc_type, max(length, 1), 0))
+    return sizes
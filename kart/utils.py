@@ -1,7 +1,10 @@
+import collections
 import functools
 import itertools
 import os
 import platform
+import queue
+import threading
 from pathlib import Path
 
 
@@ -39,6 +42,75 @@ def chunk(iterable, size):
         yield chunk
 
 
+class _IterationError:
+    """Wraps an exception raised by the background thread in iterate_in_background."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+_END_OF_ITERATION = object()
+
+
+def iterate_in_background(iterable, max_queued_items=4):
+    """
+    Generator. Yields every item from iterable, but the items are produced by a background thread - so that
+    producing the next items can overlap with whatever the caller is doing with the current one. At most
+    max_queued_items are produced ahead of the caller, to limit memory use. Any exception raised while producing
+    an item is re-raised in the caller's thread. Most useful when the caller spends its time waiting on I/O.
+    """
+    items = queue.Queue(maxsize=max_queued_items)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(_IterationError(e))
+            return
+        put(_END_OF_ITERATION)
+
+    thread = threading.Thread(target=produce, name="iterate_in_background", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _END_OF_ITERATION:
+                return
+            if isinstance(item, _IterationError):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def submit_with_bounded_in_flight(executor, fn, iterable, max_in_flight):
+    """
+    Submits fn(item) to the executor for each item in iterable, and yields the resulting futures in order.
+    Only max_in_flight futures are submitted ahead of those that have been yielded, so that we don't read an
+    entire source into memory if the workers can't keep up.
+    """
+    in_flight = collections.deque()
+    for item in iterable:
+        if len(in_flight) >= max_in_flight:
+            yield in_flight.popleft()
+        in_flight.append(executor.submit(fn, item))
+    while in_flight:
+        yield in_flight.popleft()
+
+
 def get_num_available_cores():
     """
     Returns the number of available CPU cores (best effort)
@@ -11,6 +11,7 @@ import pytest
 from kart import is_windows
 from kart.core import walk_tree, check_git_user
 from kart.repo import KartRepo
+from kart.utils import chunk, iterate_in_background
 
 
 def test_walk_tree_1(data_archive):
@@ -323,3 +324,26 @@ def test_proj_transformation_grid():
         # Currently the Windows proj libraries are built without network
         # support, so we can't auto-fetch grids
         assert pt == pytest.approx((-36.49819267, 175.00018527, 0.0), abs=1e-8)
+
+
+def test_iterate_in_background():
+    assert list(iterate_in_background(chunk(range(7), 3), max_queued_items=1)) == [
+        (0, 1, 2),
+        (3, 4, 5),
+        (6,),
+    ]
+
+    def fails_partway():
+        yield 1
+        raise ValueError("oops")
+
+    results = []
+    with pytest.raises(ValueError, match="oops"):
+        for item in iterate_in_background(fails_partway()):
+            results.append(item)
+    assert results == [1]
+
+    # Closing the generator early stops the background thread, even if the iterable is endless.
+    it = iterate_in_background(iter(int, 1), max_queued_items=2)
+    assert next(it) == 0
+    it.close()
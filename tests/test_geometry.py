@@ -4,6 +4,8 @@ import pytest
 from osgeo import ogr, osr
 
 from kart.geometry import (
+    geom_envelope,
+    geom_envelopes,
     gpkg_geom_to_hex_wkb,
     gpkg_geom_to_ogr,
     hex_wkb_to_gpkg_geom,
@@ -232,3 +234,37 @@ def test_gpkg_wkb_gpkg_roundtrip(
     gpkg_geom = hex_wkb_to_gpkg_geom(hex_wkb_2)
 
     assert gpkg_geom == input
+
+
+@pytest.mark.parametrize("calculate_if_missing", [False, True])
+def test_geom_envelopes(calculate_if_missing):
+    np = pytest.importorskip("numpy")
+    wkts = [
+        "POINT(1 2)",
+        "POINT(1 2 3)",
+        "POINT(1 2 3 4)",
+        "POINT EMPTY",
+        "MULTIPOINT (1 2,3 4)",
+        "LINESTRING(1 2,3 4)",
+        "POLYGON Z((0 0 0,0 1 0,1 1 0,0 0 0))",
+        "GEOMETRYCOLLECTION (POINT(1 2),MULTIPOINT EMPTY)",
+    ]
+    gpkg_geoms = [ogr_to_gpkg_geom(ewkt_to_ogr(wkt)) for wkt in wkts] + [None]
+    # Big-endian geometries are parsed too, even though Kart doesn't write them.
+    for wkt in ("POINT(5 6)", "LINESTRING(5 6,7 8)"):
+        gpkg_geoms.append(
+            ogr_to_gpkg_geom(
+                ewkt_to_ogr(wkt), _little_endian=False, _little_endian_wkb=False
+            )
+        )
+
+    actual = geom_envelopes(gpkg_geoms, calculate_if_missing=calculate_if_missing)
+    assert actual.shape == (len(gpkg_geoms), 4)
+    for gpkg_geom, row in zip(gpkg_geoms, actual):
+        expected = geom_envelope(
+            gpkg_geom, only_2d=True, calculate_if_missing=calculate_if_missing
+        )
+        if expected is None:
+            assert np.isnan(row).all()
+        else:
+            assert tuple(row) == pytest.approx(expected)
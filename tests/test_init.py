@@ -7,6 +7,8 @@ import pytest
 from kart import dataset_util
 from kart.sqlalchemy.gpkg import Db_GPKG
 from kart.repo import KartRepo
+from kart.tabular.ogr_import_source import OgrTableImportSource
+from kart.tabular.sqlalchemy_import_source import SqlAlchemyTableImportSource
 from kart.exceptions import (
     INVALID_OPERATION,
     NO_IMPORT_SOURCE,
@@ -84,6 +86,34 @@ def test_init_import_custom_message(data_archive_readonly, tmp_path, cli_runner,
         assert "Custom message" in r.stdout
 
 
+@pytest.mark.slow
+def test_import_stats_file(data_archive_readonly, tmp_path, cli_runner, chdir):
+    with data_archive_readonly("gpkg-points") as data:
+        repo_path = tmp_path / "emptydir"
+        r = cli_runner.invoke(["init", repo_path])
+        assert r.exit_code == 0, r
+        with chdir(repo_path):
+            stats_path = tmp_path / "stats.json"
+            r = cli_runner.invoke(
+                [
+                    "import",
+                    data / "nz-pa-points-topo-150k.gpkg",
+                    "--num-processes=2",
+                    f"--stats-file={stats_path}",
+                ]
+            )
+            assert r.exit_code == 0, r.stderr
+
+        stats = json.loads(stats_path.read_text())
+        assert stats["numProcesses"] == 2
+        assert stats["features"] == H.POINTS.ROWCOUNT
+        assert {"read", "encode", "write", "joinTrees"} <= set(stats["stages"])
+        assert stats["stages"]["read"]["features"] == H.POINTS.ROWCOUNT
+        assert stats["stages"]["encode"]["features"] == H.POINTS.ROWCOUNT
+        assert stats["stages"]["write"]["bytes"] > 0
+        assert [s["destPath"] for s in stats["sources"]] == [H.POINTS.LAYER]
+
+
 def test_import_table_with_prompt(data_archive_readonly, tmp_path, cli_runner, chdir):
     with data_archive_readonly("gpkg-au-census") as data:
         repo_path = tmp_path / "emptydir"
@@ -410,12 +440,144 @@ def test_import_replace_existing_with_column_renames(
             assert new_feature_tree == old_feature_tree
 
 
+def test_import_replace_existing_merge_join(
+    data_archive,
+    tmp_path,
+    cli_runner,
+    chdir,
+    monkeypatch,
+):
+    # GPKG features are imported in PK order, so re-imports walk the existing feature tree in step with them,
+    # rather than looking up each feature individually.
+    from kart.tabular.v3 import TableV3
+
+    def no_lookups(*args, **kwargs):
+        raise AssertionError("Features should be merge-joined, not looked up")
+
+    monkeypatch.setattr(TableV3, "_lookup_existing_feature_blobs", no_lookups)
+
+    def feature_blob_ids(repo, refish):
+        dataset = repo.datasets(refish)["mytable"]
+        return {blob.name: blob.id for blob in dataset.feature_blobs()}
+
+    def replace_existing(data):
+        r = cli_runner.invoke(
+            [
+                "import",
+                "--replace-existing",
+                data / "nz-waca-adjustments.gpkg",
+                "nz_waca_adjustments:mytable",
+            ]
+        )
+        assert r.exit_code == 0, r.stderr
+        r = cli_runner.invoke(["show", "-o", "json"])
+        assert r.exit_code == 0, r.stderr
+        return json.loads(r.stdout)["kart.diff/v1+hexwkb"]["mytable"]
+
+    with data_archive("gpkg-polygons") as data:
+        repo_path = tmp_path / "emptydir"
+        r = cli_runner.invoke(["init", repo_path])
+        assert r.exit_code == 0
+        with chdir(repo_path):
+            r = cli_runner.invoke(
+                [
+                    "import",
+                    data / "nz-waca-adjustments.gpkg",
+                    "nz_waca_adjustments:mytable",
+                ]
+            )
+            assert r.exit_code == 0, r.stderr
+            repo = KartRepo(repo_path)
+            dataset = repo.datasets()["mytable"]
+            edited_path = dataset.encode_1pk_to_path(1424927, relative=True)
+            edited_name = edited_path.rsplit("/", 1)[1]
+
+            # Add a column, and edit, delete and insert some features - the features are still compared against
+            # the existing features, since the new column is only a compatible schema change.
+            with Db_GPKG.create_engine(
+                data / "nz-waca-adjustments.gpkg"
+            ).connect() as conn:
+                deleted_id = conn.scalar("SELECT MIN(id) FROM nz_waca_adjustments;")
+                conn.execute(
+                    "ALTER TABLE nz_waca_adjustments ADD COLUMN newcolumn TEXT;"
+                )
+                conn.execute(
+                    "UPDATE nz_waca_adjustments SET survey_reference = 'edited' WHERE id = 1424927;"
+                )
+                conn.execute(
+                    f"DELETE FROM nz_waca_adjustments WHERE id = {deleted_id};"
+                )
+                conn.execute(
+                    """
+                    INSERT INTO nz_waca_adjustments (id, geom, date_adjusted, survey_reference, adjusted_nodes)
+                        SELECT 9999999, geom, date_adjusted, survey_reference, adjusted_nodes
+                        FROM nz_waca_adjustments WHERE id = 1424927;
+                    """
+                )
+
+            diff = replace_existing(data)
+            assert diff["meta"]["schema.json"]
+            assert {
+                (delta.get("-", {}).get("id"), delta.get("+", {}).get("id"))
+                for delta in diff["feature"]
+            } == {(1424927, 1424927), (deleted_id, None), (None, 9999999)}
+            [edited] = [delta for delta in diff["feature"] if len(delta) == 2]
+            assert edited["+"]["survey_reference"] == "edited"
+
+            # Only the features that changed have new blobs.
+            old_blob_ids = feature_blob_ids(repo, "HEAD^")
+            new_blob_ids = feature_blob_ids(repo, "HEAD")
+            assert len(new_blob_ids) == H.POLYGONS.ROWCOUNT
+            changed_names = {
+                name
+                for name in old_blob_ids.keys() | new_blob_ids.keys()
+                if old_blob_ids.get(name) != new_blob_ids.get(name)
+            }
+            assert len(changed_names) == 3
+            assert edited_name in changed_names
+
+            # Edit another feature - the features that were rewritten last time now match their blobs exactly.
+            with Db_GPKG.create_engine(
+                data / "nz-waca-adjustments.gpkg"
+            ).connect() as conn:
+                conn.execute(
+                    "UPDATE nz_waca_adjustments SET newcolumn = 'new' WHERE id = 9999999;"
+                )
+
+            diff = replace_existing(data)
+            assert "meta" not in diff
+            assert len(diff["feature"]) == 1
+            assert diff["feature"][0]["+"]["newcolumn"] == "new"
+
+            newest_blob_ids = feature_blob_ids(repo, "HEAD")
+            assert newest_blob_ids.keys() == new_blob_ids.keys()
+            changed_names = {
+                name
+                for name in new_blob_ids
+                if new_blob_ids[name] != newest_blob_ids[name]
+            }
+            assert len(changed_names) == 1
+            assert newest_blob_ids[edited_name] == new_blob_ids[edited_name]
+
+
+@pytest.mark.parametrize(
+    "max_pks_per_query",
+    [
+        pytest.param(10000, id="in-query"),
+        pytest.param(1, id="temporary-table"),
+    ],
+)
 def test_import_replace_ids(
+    max_pks_per_query,
     data_archive,
     tmp_path,
     cli_runner,
     chdir,
+    monkeypatch,
 ):
+    monkeypatch.setattr(
+        SqlAlchemyTableImportSource, "MAX_PKS_PER_QUERY", max_pks_per_query
+    )
     with data_archive("gpkg-polygons") as data:
         repo_path = tmp_path / "emptydir"
         r = cli_runner.invoke(["init", repo_path])
@@ -502,6 +664,66 @@ def test_import_replace_ids(
             ]
 
 
+@pytest.mark.parametrize(
+    "max_pks_per_filter",
+    [
+        pytest.param(1000, id="attribute-filter"),
+        pytest.param(1, id="single-read"),
+    ],
+)
+def test_import_replace_ids_from_shp(
+    max_pks_per_filter,
+    data_archive,
+    tmp_path,
+    cli_runner,
+    chdir,
+    monkeypatch,
+):
+    monkeypatch.setattr(OgrTableImportSource, "MAX_PKS_PER_FILTER", max_pks_per_filter)
+    with data_archive("shapefiles/shp-polygons.tgz") as data:
+        repo_path = tmp_path / "emptydir"
+        r = cli_runner.invoke(["init", repo_path])
+        assert r.exit_code == 0
+        with chdir(repo_path):
+            # initial import of 3 features
+            r = cli_runner.invoke(
+                [
+                    "import",
+                    data / "nz_waca_adjustments.shp",
+                    "--primary-key=id",
+                    "--replace-ids",
+                    "1424927\n4413497\n4411733",
+                    "nz_waca_adjustments:mytable",
+                ]
+            )
+            assert r.exit_code == 0, r.stderr
+            repo = KartRepo(repo_path)
+            dataset = repo.datasets()["mytable"]
+            assert sorted(f["id"] for f in dataset.features()) == [
+                1424927,
+                4411733,
+                4413497,
+            ]
+
+            # 2 more features, and one that isn't in the source.
+            r = cli_runner.invoke(
+                [
+                    "import",
+                    data / "nz_waca_adjustments.shp",
+                    "--primary-key=id",
+                    "--replace-ids",
+                    "4408774\n123\n4408145",
+                    "nz_waca_adjustments:mytable",
+                ]
+            )
+            assert r.exit_code == 0, r.stderr
+            r = cli_runner.invoke(["show", "-o", "json"])
+            assert r.exit_code == 0, r.stderr
+            features = json.loads(r.stdout)["kart.diff/v1+hexwkb"]["mytable"]["feature"]
+            assert sorted(f["+"]["id"] for f in features) == [4408145, 4408774]
+            assert all("-" not in f for f in features)
+
+
 def test_init_import_table_gpkg_types(data_archive_readonly, tmp_path, cli_runner):
     with data_archive_readonly("gpkg-types") as data:
         repo_path = tmp_path / "repo"
@@ -786,6 +786,51 @@ def test_spatial_filtered_workingcopy(
             assert H.row_count(sess, table) == matching_features[archive]
 
 
+@pytest.mark.parametrize(
+    "archive,table,filter_key,matching_features",
+    [
+        pytest.param("points", H.POINTS.LAYER, "points", 302, id="points"),
+        pytest.param("polygons", H.POLYGONS.LAYER, "polygons", 44, id="polygons"),
+        pytest.param(
+            "polygons",
+            H.POLYGONS.LAYER,
+            "polygons-with-reprojection",
+            44,
+            id="polygons-with-reprojection",
+        ),
+    ],
+)
+def test_spatial_filtered_features_using_index(
+    archive, table, filter_key, matching_features, data_archive, cli_runner
+):
+    with data_archive(archive) as repo_path:
+        repo = KartRepo(repo_path)
+        repo.config["kart.spatialfilter.geometry"] = SPATIAL_FILTER_GEOMETRY[filter_key]
+        repo.config["kart.spatialfilter.crs"] = SPATIAL_FILTER_CRS[filter_key]
+        dataset = repo.datasets()[table]
+
+        decoded = []
+        get_feature_from_blob = dataset.get_feature_from_blob
+
+        def _get_feature_from_blob(blob):
+            decoded.append(blob.id.hex)
+            return get_feature_from_blob(blob)
+
+        dataset.get_feature_from_blob = _get_feature_from_blob
+
+        # Without an index, every feature is decoded and then tested against the spatial filter.
+        features = list(dataset.features(repo.spatial_filter))
+        assert len(features) == matching_features
+        assert len(decoded) == dataset.feature_count
+
+        # With an index, features that are definitely outside the spatial filter are skipped.
+        r = cli_runner.invoke(["spatial-filter", "index"])
+        assert r.exit_code == 0, r.stderr
+        decoded.clear()
+        assert list(dataset.features(repo.spatial_filter)) == features
+        assert matching_features <= len(decoded) < dataset.feature_count
+
+
 def test_reset_wc_with_spatial_filter(data_archive, cli_runner):
     # This spatial filter matches 2 of the 5 possible changes between main^ and main.
 
@@ -8,12 +8,18 @@ from kart.crs_util import make_crs
 from kart.sqlalchemy.sqlite import sqlite_engine
 from kart.spatial_filter.index import (
     CannotIndex,
+    CrsHelper,
     EnvelopeEncoder,
     anticlockwise_ring_from_minmax_envelope,
     transform_minmax_envelope,
+    transform_minmax_envelopes,
     union_of_envelopes,
     get_ogr_envelope,
+    iter_feature_blobs,
+    iter_feature_oids_by_tree_diff,
+    load_crs_cache,
 )
+from kart.repo import KartRepo
 from sqlalchemy.orm import sessionmaker
 
 H = pytest.helpers.helpers()
@@ -234,6 +240,19 @@ def test_index_points_all(data_archive, cli_runner):
         _check_index(s, EXPECTED_POINTS_INDEX)
 
 
+@pytest.mark.parametrize("num_processes", [1, 2])
+def test_index_points_num_processes(num_processes, data_archive, cli_runner):
+    # Indexing in a single process or in worker processes should give the same results.
+    with data_archive("points.tgz") as repo_path:
+        r = cli_runner.invoke(
+            ["spatial-filter", "index", f"--num-processes={num_processes}"]
+        )
+        assert r.exit_code == 0, r.stderr
+        s = _get_index_summary(repo_path)
+        assert s.features == 2148
+        _check_index(s, EXPECTED_POINTS_INDEX)
+
+
 def test_index_points_commit_by_commit(data_archive, cli_runner):
     # Indexing one commit at a time should get the same results as indexing --all.
     with data_archive("points.tgz") as repo_path:
@@ -249,6 +268,74 @@ def test_index_points_commit_by_commit(data_archive, cli_runner):
         _check_index(s, EXPECTED_POINTS_INDEX)
 
 
+def test_index_persists_crs_definitions(data_archive, cli_runner):
+    # The CRS definitions found while indexing are kept, and reused when the index is next updated.
+    with data_archive("points.tgz") as repo_path:
+        r = cli_runner.invoke(["spatial-filter", "index", H.POINTS.HEAD1_SHA])
+        assert r.exit_code == 0, r.stderr
+
+        db_path = repo_path / ".kart" / "feature_envelopes.db"
+        engine = sqlite_engine(db_path)
+        with sessionmaker(bind=engine)() as sess:
+            crs_cache = load_crs_cache(sess)
+        assert len(crs_cache) == 1
+        ((ds_path, crs_oid), wkt) = next(iter(crs_cache.items()))
+        assert ds_path == H.POINTS.LAYER
+        assert wkt.startswith("GEOGCS[")
+
+        r = cli_runner.invoke(["spatial-filter", "index", H.POINTS.HEAD_SHA])
+        assert r.exit_code == 0, r.stderr
+        with sessionmaker(bind=engine)() as sess:
+            assert load_crs_cache(sess) == crs_cache
+        _check_index(_get_index_summary(repo_path), EXPECTED_POINTS_INDEX)
+
+
+def test_crs_helper_from_crs_history(data_archive):
+    # A CrsHelper in a worker process is given the CRS history found by the main process, so needn't walk the commits.
+    with data_archive("points.tgz") as repo_path:
+        repo = KartRepo(repo_path)
+        crs_helper = CrsHelper(repo)
+        crs_history = crs_helper.load_crs_history()
+        assert set(crs_history) == {H.POINTS.LAYER}
+
+        worker_crs_helper = CrsHelper(repo, crs_history=crs_history)
+
+        def _all_commits():
+            raise AssertionError("The commits shouldn't be walked again")
+
+        worker_crs_helper._all_commits = _all_commits
+        for commit_id in (H.POINTS.HEAD_SHA, H.POINTS.HEAD1_SHA):
+            expected = crs_helper.transforms_for_dataset_at_commit(
+                H.POINTS.LAYER, commit_id
+            )
+            actual = worker_crs_helper.transforms_for_dataset_at_commit(
+                H.POINTS.LAYER, commit_id
+            )
+            assert expected
+            assert [t.desc for t in actual] == [t.desc for t in expected]
+
+
+def test_iter_feature_oids_by_tree_diff(data_archive):
+    # Diffing the new commits' trees should find the same features as walking all their objects.
+    with data_archive("points.tgz") as repo_path:
+        repo = KartRepo(repo_path)
+        start_commits, stop_commits = {H.POINTS.HEAD_SHA}, {H.POINTS.HEAD1_SHA}
+        expected = {
+            (ds_path, blob.id.hex)
+            for commit_id, ds_path, blob in iter_feature_blobs(
+                repo, start_commits, stop_commits
+            )
+        }
+        actual = {
+            (ds_path, oid)
+            for commit_id, ds_path, oid in iter_feature_oids_by_tree_diff(
+                repo, start_commits, stop_commits
+            )
+        }
+        assert len(actual) == 5
+        assert actual == expected
+
+
 def test_index_points_idempotent(data_archive, cli_runner):
     # Indexing the commits one at a time and then indexing all commits again will also give the same result.
     # (We force everything to be indexed twice by deleting the record of whats been indexed).
@@ -285,6 +372,50 @@ def test_index_points_idempotent(data_archive, cli_runner):
         _check_index(s, EXPECTED_POINTS_INDEX)
 
 
+@pytest.mark.parametrize("build_index", [True, False])
+def test_fetch_updates_existing_index(build_index, data_archive, cli_runner, tmp_path):
+    # With a spatial filter active, kart fetch brings an existing index up to date with the fetched commits -
+    # but if the repo has never been indexed, building the index is left to kart spatial-filter index.
+    with data_archive("points.tgz") as repo1_path:
+        repo1 = KartRepo(repo1_path)
+        branch = repo1.references[repo1.head.name]
+        branch.set_target(H.POINTS.HEAD1_SHA)
+
+        repo2_path = tmp_path / "repo2"
+        r = cli_runner.invoke(
+            ["clone", "--no-checkout", f"file://{repo1_path.resolve()}", repo2_path]
+        )
+        assert r.exit_code == 0, r.stderr
+        branch.set_target(H.POINTS.HEAD_SHA)
+
+        repo2 = KartRepo(repo2_path)
+        geom = "POLYGON((174 -37,175 -37,175 -36,174 -36,174 -37))"
+        repo2.config["kart.spatialfilter.geometry"] = geom
+        repo2.config["kart.spatialfilter.crs"] = "EPSG:4326"
+
+        if build_index:
+            r = cli_runner.invoke(["-C", repo2_path, "spatial-filter", "index"])
+            assert r.exit_code == 0, r.stderr
+            assert _get_index_summary(repo2_path).features == 2143
+
+        r = cli_runner.invoke(["-C", repo2_path, "fetch"])
+        assert r.exit_code == 0, r.stderr
+        assert repo2.references["refs/remotes/origin/main"].target.hex == (
+            H.POINTS.HEAD_SHA
+        )
+
+        db_path = repo2_path / ".kart" / "feature_envelopes.db"
+        if not build_index:
+            assert not db_path.exists()
+            assert "uploadpack.allowAnySHA1InWant" not in repo2.config
+            return
+
+        assert _get_index_summary(repo2_path).features == 2148
+        with sessionmaker(bind=sqlite_engine(db_path))() as sess:
+            rows = sess.execute("SELECT commit_id FROM commits;")
+            assert {row[0].hex() for row in rows} == {H.POINTS.HEAD_SHA}
+
+
 def test_index_polygons_all(data_archive, cli_runner):
     with data_archive("polygons.tgz") as repo_path:
         r = cli_runner.invoke(["spatial-filter", "index"])
@@ -484,6 +615,35 @@ def test_transform_minmax_envelope_point(input, transform, expected_result):
     assert buffered_result == actual_result
 
 
+@pytest.mark.parametrize("transform", [IDENTITY_TRANSFORM, NZTM_TRANSFORM])
+def test_transform_minmax_envelopes(transform):
+    np = pytest.importorskip("numpy")
+
+    if transform == IDENTITY_TRANSFORM:
+        small = [
+            (1, 2, 1, 2),
+            (185, 85, 185, 85),
+            (1, 2, 1.5, 2.5),
+            (179.8, 0, 180.2, 0.5),
+        ]
+        large = [(177, -10, 184, 10), (-179, -10, 179, 10)]
+    else:
+        small = [
+            (1347679, 5456907, 1347679, 5456907),
+            (2567196, 5736624, 2567196, 5736624),
+            (1347679, 5456907, 1357679, 5466907),
+        ]
+        large = [(1347679, 5456907, 2021026, 6117225)]
+
+    # Small envelopes give exactly the same result as transforming them one at a time -
+    # the others are left as NaN, to be transformed one at a time.
+    envelopes = np.array(small + large + [(np.nan,) * 4], dtype=float)
+    actual = transform_minmax_envelopes(envelopes, transform)
+    for i, envelope in enumerate(small):
+        assert tuple(actual[i]) == transform_minmax_envelope(envelope, transform)
+    assert np.isnan(actual[len(small) :]).all()
+
+
 def test_transform_minmax_envelope_buffer_for_curvature():
     # This envelope is defined in NZTM. When coverted to EPSG:4326, this envelope's straight-line edges should be
     # curved, in theory. In practise, the way transforms work is by converting vertices only, and then assuming
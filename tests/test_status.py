@@ -260,6 +260,30 @@ def test_status(
         }
 
 
+def test_status_detect_unchanged(data_working_copy, cli_runner):
+    with data_working_copy("points") as (repo_path, wc):
+        with Db_GPKG.create_engine(wc).connect() as db:
+            name = db.scalar(f"SELECT name FROM {H.POINTS.LAYER} WHERE fid = 1;")
+            db.execute(f"UPDATE {H.POINTS.LAYER} SET name = 'test0' WHERE fid <= 2;")
+            db.execute(
+                f"UPDATE {H.POINTS.LAYER} SET name = :name WHERE fid = 1;",
+                {"name": name},
+            )
+
+        # By default, status doesn't compare feature values, so both edited features count as updates.
+        jdict = json_status(cli_runner)
+        assert jdict["kart.status/v1"]["workingCopy"]["changes"] == {
+            H.POINTS.LAYER: {"feature": {"updates": 2}}
+        }
+
+        r = cli_runner.invoke(["status", "-o", "json", "--detect-unchanged"])
+        assert r.exit_code == 0, r.stderr
+        jdict = json.loads(r.stdout)
+        assert jdict["kart.status/v1"]["workingCopy"]["changes"] == {
+            H.POINTS.LAYER: {"feature": {"updates": 1}}
+        }
+
+
 def test_status_empty(tmp_path, cli_runner, chdir):
     repo_path = tmp_path / "wiz"
     r = cli_runner.invoke(["init", str(repo_path)])
@@ -13,6 +13,7 @@ import pytest
 from memory_repo import MemoryRepo
 
 from kart import init, fast_import
+from kart.pack_util import PackfileWriter
 from kart.tabular.v3 import TableV3
 from kart.tabular.v3_paths import IntPathEncoder, MsgpackHashPathEncoder
 from kart.exceptions import WORKING_COPY_OR_IMPORT_CONFLICT
@@ -835,6 +836,24 @@ def test_pk_encoder_int_pk():
     )
 
 
+def test_get_features_or_none(data_archive):
+    with data_archive("points") as repo_path:
+        repo = KartRepo(repo_path)
+        ds = repo.datasets()[H.POINTS.LAYER]
+
+        # PKs can be given as strs, in any order, and are looked up in path order.
+        pks = [1168, "3", 9999999, 1, "1168"]
+        features = ds.get_features_or_none(pks)
+        assert features == [
+            ds.get_feature(1168),
+            ds.get_feature(3),
+            None,
+            ds.get_feature(1),
+            ds.get_feature(1168),
+        ]
+        assert ds.get_features_or_none([]) == []
+
+
 @pytest.mark.slow
 @pytest.mark.parametrize(*GPKG_IMPORTS)
 @pytest.mark.parametrize("profile", ["get_feature_by_pk", "get_feature_from_data"])
@@ -1049,6 +1068,263 @@ def test_fast_import(data_archive, tmp_path, cli_runner, chdir):
             assert feature_count == source.feature_count
 
 
+def _fast_import_points(
+    data,
+    repo_path,
+    cli_runner,
+    chdir,
+    *,
+    num_sources=1,
+    prepare_source=None,
+    **settings,
+):
+    """
+    Imports the points table - or num_sources copies of it - into a new repo at repo_path, using the given
+    FastImportSettings, and returns the tree of the resulting commit. By default, features are encoded in small
+    batches and by a worker pool if num_processes > 1, however few features there are.
+    prepare_source - optional callable, called with each source before it is imported.
+    """
+    table = H.POINTS.LAYER
+    settings.setdefault("encoding_batch_size", 100)
+    settings.setdefault("encoding_pool_min_features", 0)
+
+    repo_path.mkdir()
+    with chdir(repo_path):
+        r = cli_runner.invoke(["init"])
+        assert r.exit_code == 0, r
+
+        repo = KartRepo(repo_path)
+        source = TableImportSource.open(
+            data / "nz-pa-points-topo-150k.gpkg", table=table
+        )
+        if num_sources > 1:
+            sources = [
+                source.clone_for_table(table, dest_path=f"{table}_{i}")
+                for i in range(num_sources)
+            ]
+        else:
+            sources = [source]
+        if prepare_source:
+            for source in sources:
+                prepare_source(source)
+        fast_import.fast_import_tables(
+            repo,
+            sources,
+            from_commit=None,
+            settings=fast_import.FastImportSettings(**settings),
+        )
+
+        # Every feature blob should be readable.
+        assert len(repo.datasets()) == num_sources
+        for dataset in repo.datasets():
+            assert sum(1 for f in dataset.features()) == H.POINTS.ROWCOUNT
+        return repo.head_tree
+
+
+@pytest.mark.slow
+def test_fast_import_parallel_encoding(data_archive, tmp_path, cli_runner, chdir):
+    # Features encoded by the worker pool should result in exactly the same tree as encoding them in-process.
+    with data_archive("gpkg-points") as data:
+        tree1 = _fast_import_points(
+            data, tmp_path / "repo1", cli_runner, chdir, num_processes=1
+        )
+        tree4 = _fast_import_points(
+            data, tmp_path / "repo4", cli_runner, chdir, num_processes=4
+        )
+        assert tree1.id == tree4.id
+
+
+def test_fast_import_num_encoding_workers():
+    settings = fast_import.FastImportSettings(
+        num_processes=8, encoding_batch_size=100, encoding_pool_min_features=1000
+    )
+    # Small sources are encoded by the main process.
+    assert settings.num_encoding_workers(999) == 0
+    assert settings.num_encoding_workers(1000) == 8
+
+    settings.encoding_pool_min_features = 0
+    # There are never more workers than batches to encode.
+    assert settings.num_encoding_workers(250) == 3
+    assert settings.num_encoding_workers(100) == 0
+
+
+@pytest.mark.slow
+def test_fast_import_join_parallel_imported_trees(
+    data_archive, tmp_path, cli_runner, chdir
+):
+    # Features are spread across several top-level feature subtrees, with many features in each, so that
+    # each parallel git-fast-import process writes some of them and the trees have to be joined.
+    # Number of PKs in each top-level subtree when using the default IntPathEncoder.
+    top_level_span = 64**4
+
+    def _spread_features(source):
+        orig_features = source.features
+
+        def _features():
+            for i, feature in enumerate(orig_features()):
+                feature = dict(feature)
+                feature["fid"] = (i % 8) * top_level_span + i
+                yield feature
+
+        source.features = _features
+
+    with data_archive("gpkg-points") as data:
+        trees = [
+            _fast_import_points(
+                data,
+                tmp_path / f"repo{num_processes}",
+                cli_runner,
+                chdir,
+                num_processes=num_processes,
+                prepare_source=_spread_features,
+            )
+            for num_processes in (1, 4)
+        ]
+
+        feature_tree = trees[1] / H.POINTS.LAYER / ".table-dataset" / "feature"
+        top_level_names = [obj.name for obj in feature_tree]
+        assert len(top_level_names) == 8
+        proc_indexes = {
+            fast_import.proc_index_for_subtree(n, 4) for n in top_level_names
+        }
+        assert len(proc_indexes) > 1
+        assert trees[0].id == trees[1].id
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("num_processes", [1, 4])
+def test_fast_import_packfile_backend(
+    num_processes, data_archive, tmp_path, cli_runner, chdir
+):
+    # The packfile backend should result in exactly the same tree as the git-fast-import backend.
+    with data_archive("gpkg-points") as data:
+        trees = [
+            _fast_import_points(
+                data,
+                tmp_path / backend.name,
+                cli_runner,
+                chdir,
+                num_processes=num_processes,
+                backend=backend,
+            )
+            for backend in fast_import.ImportBackend
+        ]
+        assert trees[0].id == trees[1].id
+
+
+def test_packfile_writer_flushes_several_packs(tmp_path, cli_runner, chdir):
+    repo_path = tmp_path / "repo"
+    repo_path.mkdir()
+    with chdir(repo_path):
+        r = cli_runner.invoke(["init"])
+        assert r.exit_code == 0, r
+    repo = KartRepo(repo_path)
+    pack_dir = repo.gitdir_path / "objects" / "pack"
+    packs_before = set(pack_dir.glob("*.pack"))
+
+    pack_writer = PackfileWriter(repo, max_buffered_bytes=1000)
+    blob_ids = [pack_writer.write_blob(b"%04d" % i * 100) for i in range(10)]
+    tree_id = pack_writer.write_tree(
+        {
+            f"blob{i}": (blob_id, pygit2.GIT_FILEMODE_BLOB)
+            for i, blob_id in enumerate(blob_ids)
+        }
+    )
+    pack_writer.close()
+
+    # Each blob is 400 bytes, so a new pack is started after every third blob.
+    assert len(pack_writer.pack_filenames) > 1
+    new_packs = set(pack_dir.glob("*.pack")) - packs_before
+    assert len(new_packs) == len(pack_writer.pack_filenames)
+    for i, blob_id in enumerate(blob_ids):
+        assert repo[blob_id].data == b"%04d" % i * 100
+    assert [obj.name for obj in repo[tree_id]] == sorted(f"blob{i}" for i in range(10))
+
+
+@pytest.mark.slow
+def test_fast_import_concurrent_sources(data_archive, tmp_path, cli_runner, chdir):
+    # Reading several sources at once should result in exactly the same tree as reading them one at a time.
+    with data_archive("gpkg-points") as data:
+        trees = [
+            _fast_import_points(
+                data,
+                tmp_path / f"repo{num_concurrent_sources}",
+                cli_runner,
+                chdir,
+                num_sources=3,
+                num_processes=2,
+                num_concurrent_sources=num_concurrent_sources,
+            )
+            for num_concurrent_sources in (1, 4)
+        ]
+        assert trees[0].id == trees[1].id
+
+
+class _ImportInterrupted(Exception):
+    pass
+
+
+@pytest.mark.slow
+def test_fast_import_resume_from_checkpoint(data_archive, tmp_path, cli_runner, chdir):
+    table = H.POINTS.LAYER
+    with data_archive("gpkg-points") as data:
+        source_path = data / "nz-pa-points-topo-150k.gpkg"
+        settings = fast_import.FastImportSettings(
+            num_processes=2,
+            encoding_batch_size=50,
+            encoding_pool_min_features=0,
+            checkpoint_interval=100,
+        )
+
+        # Reference import, never interrupted.
+        ref_repo_path = tmp_path / "ref-repo"
+        ref_repo_path.mkdir()
+        with chdir(ref_repo_path):
+            r = cli_runner.invoke(["init"])
+            assert r.exit_code == 0, r
+        ref_repo = KartRepo(ref_repo_path)
+        source = TableImportSource.open(source_path, table=table)
+        fast_import.fast_import_tables(ref_repo, [source], from_commit=None)
+        expected_tree = ref_repo.datasets()[table].feature_tree.id
+
+        repo_path = tmp_path / "repo"
+        repo_path.mkdir()
+        with chdir(repo_path):
+            r = cli_runner.invoke(["init"])
+            assert r.exit_code == 0, r
+        repo = KartRepo(repo_path)
+
+        source = TableImportSource.open(source_path, table=table)
+        orig_features = source.features
+
+        def _interrupted_features():
+            for i, feature in enumerate(orig_features()):
+                if i == 250:
+                    raise _ImportInterrupted()
+                yield feature
+
+        source.features = _interrupted_features
+        with pytest.raises(_ImportInterrupted):
+            fast_import.fast_import_tables(
+                repo, [source], from_commit=None, settings=settings
+            )
+
+        state_path = repo.gitdir_path / fast_import.ImportCheckpointer.STATE_FILE_NAME
+        assert state_path.exists()
+        assert repo.head_is_unborn
+
+        # Running the same import again continues from the last checkpoint.
+        source = TableImportSource.open(source_path, table=table)
+        fast_import.fast_import_tables(
+            repo, [source], from_commit=None, settings=settings
+        )
+        assert not state_path.exists()
+        assert not [r for r in repo.references if r.startswith("refs/kart-import/")]
+
+        assert len([c for c in repo.walk(repo.head.target)]) == 1
+        assert repo.datasets()[table].feature_tree.id == expected_tree
+
+
 def test_postgis_import_with_sampled_geometry_dimension(
     postgis_db,
     data_archive,
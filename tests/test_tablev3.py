@@ -2,6 +2,7 @@ from memory_repo import MemoryTree, MemoryRepo
 
 from kart.tabular.v3 import TableV3
 from kart.schema import Legend, ColumnSchema, Schema
+from kart.serialise_util import msg_pack
 
 
 DATASET_PATH = "path/to/dataset"
@@ -271,3 +272,47 @@ def test_schema_change_roundtrip(gen_uuid):
     }
     # We guarantee that the dict iterates in row-order.
     assert tuple(roundtripped.values()) == (7, None, "Bloggs", "Joe", None)
+
+
+def test_feature_codec_many(gen_uuid):
+    old_schema = Schema(
+        [
+            ColumnSchema(gen_uuid(), "ID", "integer", 0),
+            ColumnSchema(gen_uuid(), "name", "text", None),
+            ColumnSchema(gen_uuid(), "dropped", "text", None),
+        ]
+    )
+    new_schema = Schema(
+        [
+            ColumnSchema(old_schema[1].id, "name", "text", None),
+            ColumnSchema(old_schema[0].id, "ID", "integer", 0),
+            ColumnSchema(gen_uuid(), "added", "text", None),
+        ]
+    )
+    features = [{"ID": i, "name": f"name-{i}", "dropped": "x"} for i in range(5)]
+
+    codec = old_schema.codec
+    assert codec is old_schema.codec
+    assert codec.legend_hash == old_schema.legend.hexhash()
+
+    encoded = list(codec.encode_many(features))
+    # encode_many should give the same result as encoding via the raw dict.
+    for (pk_values, data), feature in zip(encoded, features):
+        raw_dict = old_schema.feature_to_raw_dict(feature)
+        assert (pk_values, data) == (
+            (feature["ID"],),
+            msg_pack(
+                [
+                    old_schema.legend.hexhash(),
+                    old_schema.legend.raw_dict_to_value_tuples(raw_dict)[1],
+                ]
+            ),
+        )
+
+    legends = {old_schema.legend.hexhash(): old_schema.legend}
+    assert list(old_schema.codec.decode_many(encoded, legends.__getitem__)) == features
+
+    # Decoding with a different schema adapts the features to that schema.
+    assert list(new_schema.codec.decode_many(encoded, legends.__getitem__)) == [
+        {"name": f"name-{i}", "ID": i, "added": None} for i in range(5)
+    ]
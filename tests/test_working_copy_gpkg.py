@@ -57,6 +57,71 @@ def test_checkout_workingcopy(
         assert expected_col_spec in table_spec
 
 
+def test_checkout_restores_rtree_triggers(data_archive, cli_runner):
+    # The R-tree is populated after the features are written, with its triggers suspended during the write.
+    with data_archive("points") as repo_path:
+        H.clear_working_copy()
+        repo = KartRepo(repo_path)
+
+        r = cli_runner.invoke(["checkout"])
+        assert r.exit_code == 0, r.stderr
+
+        rtree_table = f"rtree_{H.POINTS.LAYER}_geom"
+        with repo.working_copy.tabular.session() as sess:
+            trigger_names = [
+                row[0]
+                for row in sess.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = :table_name;",
+                    {"table_name": H.POINTS.LAYER},
+                )
+            ]
+            assert f"{rtree_table}_insert" in trigger_names
+            assert f"{rtree_table}_delete" in trigger_names
+
+            assert sess.scalar(f'SELECT COUNT(*) FROM "{rtree_table}";') == (
+                H.POINTS.ROWCOUNT
+            )
+            sess.execute(H.POINTS.INSERT, H.POINTS.RECORD)
+            assert sess.scalar(f'SELECT COUNT(*) FROM "{rtree_table}";') == (
+                H.POINTS.ROWCOUNT + 1
+            )
+            assert sess.scalar("PRAGMA journal_mode;").lower() != "memory"
+
+
+def test_bulk_load_pragmas_only_for_new_working_copy(
+    data_archive, cli_runner, monkeypatch
+):
+    from kart.tabular.working_copy.gpkg import WorkingCopy_GPKG
+
+    pragma_calls = []
+    orig_set_pragmas = WorkingCopy_GPKG._set_pragmas
+
+    def _set_pragmas(self, sess, pragmas):
+        pragma_calls.append(pragmas)
+        return orig_set_pragmas(self, sess, pragmas)
+
+    monkeypatch.setattr(WorkingCopy_GPKG, "_set_pragmas", _set_pragmas)
+
+    with data_archive("points") as repo_path:
+        H.clear_working_copy()
+        repo = KartRepo(repo_path)
+
+        r = cli_runner.invoke(["checkout"])
+        assert r.exit_code == 0, r.stderr
+        assert WorkingCopy_GPKG.BULK_LOAD_PRAGMAS in pragma_calls
+
+        # Rewriting a table in a working copy that already exists doesn't use them.
+        pragma_calls.clear()
+        table_wc = repo.working_copy.tabular
+        dataset = repo.datasets()[H.POINTS.LAYER]
+        table_wc.drop_tables(repo.head_commit, dataset)
+        table_wc.write_full(repo.head_commit, dataset)
+        assert WorkingCopy_GPKG.BULK_LOAD_PRAGMAS not in pragma_calls
+
+        r = cli_runner.invoke(["diff", "--exit-code"])
+        assert r.exit_code == 0, r.stdout
+
+
 def test_checkout_detached(data_working_copy, cli_runner):
     """Checkout a working copy to edit"""
     with data_working_copy("points") as (repo_dir, wc):
@@ -1050,6 +1115,93 @@ def test_reset_transaction(data_working_copy, cli_runner, edit_points):
         }
 
 
+def test_reset_bulk_replace(data_working_copy, cli_runner, edit_points, monkeypatch):
+    # Replace every changed row using a temporary table of PKs, no matter how few rows there are.
+    monkeypatch.setattr(TableWorkingCopy, "BULK_REPLACE_MIN_FEATURES", 1)
+
+    with data_working_copy("points") as (repo_path, wc_path):
+        repo = KartRepo(repo_path)
+        table_wc = repo.working_copy.tabular
+        rtree_table = f"rtree_{H.POINTS.LAYER}_geom"
+        with table_wc.session() as sess:
+            edit_points(sess)
+
+        r = cli_runner.invoke(["restore"])
+        assert r.exit_code == 0, r.stderr
+        assert not table_wc.is_dirty()
+        with table_wc.session() as sess:
+            assert H.row_count(sess, H.POINTS.LAYER) == H.POINTS.ROWCOUNT
+            assert sess.scalar(f'SELECT COUNT(*) FROM "{rtree_table}";') == (
+                H.POINTS.ROWCOUNT
+            )
+
+        for commit in ("HEAD^", "main"):
+            r = cli_runner.invoke(["checkout", commit])
+            assert r.exit_code == 0, r.stderr
+            r = cli_runner.invoke(["diff", "--exit-code"])
+            assert r.exit_code == 0, r.stdout
+
+        with table_wc.session() as sess:
+            assert H.row_count(sess, H.POINTS.LAYER) == H.POINTS.ROWCOUNT
+            assert sess.scalar(f'SELECT COUNT(*) FROM "{rtree_table}";') == (
+                H.POINTS.ROWCOUNT
+            )
+
+
+def test_reset_bulk_replace_tracks_changes(data_working_copy, cli_runner, monkeypatch):
+    # Replacing rows in bulk - deleting them all, then inserting the new ones - must leave the same rows tracked
+    # as dirty as replacing them one at a time does.
+    with data_working_copy("points") as (repo_path, wc_path):
+        repo = KartRepo(repo_path)
+        table_wc = repo.working_copy.tabular
+
+        tracked = []
+        for bulk_replace_min_features in (1_000_000, 1):
+            monkeypatch.setattr(
+                TableWorkingCopy, "BULK_REPLACE_MIN_FEATURES", bulk_replace_min_features
+            )
+            r = cli_runner.invoke(["restore", "-s", "HEAD^"])
+            assert r.exit_code == 0, r.stderr
+            r = cli_runner.invoke(["diff", "HEAD^", "--exit-code"])
+            assert r.exit_code == 0, r.stdout
+            with table_wc.session() as sess:
+                tracked.append(
+                    sess.execute(
+                        'SELECT table_name, pk FROM "gpkg_kart_track" ORDER BY pk;'
+                    ).fetchall()
+                )
+
+            r = cli_runner.invoke(["restore"])
+            assert r.exit_code == 0, r.stderr
+            assert not table_wc.is_dirty()
+            with table_wc.session() as sess:
+                assert not sess.scalar('SELECT COUNT(*) FROM "gpkg_kart_track";')
+
+        assert tracked[0]
+        assert tracked[0] == tracked[1]
+
+
+def test_find_renames(data_working_copy, cli_runner):
+    with data_working_copy("points") as (repo_path, wc_path):
+        repo = KartRepo(repo_path)
+        with repo.working_copy.tabular.session() as sess:
+            sess.execute(
+                f"UPDATE {H.POINTS.LAYER} SET fid = fid + 100000 WHERE fid <= 500;"
+            )
+
+        def _feature_changes():
+            r = cli_runner.invoke(["status", "--output-format=json"])
+            assert r.exit_code == 0, r.stderr
+            changes = json.loads(r.stdout)["kart.status/v1"]["workingCopy"]["changes"]
+            return changes[H.POINTS.LAYER]["feature"]
+
+        # Every renumbered feature is matched up with its original.
+        assert _feature_changes() == {"updates": 500}
+
+        repo.config["kart.workingcopy.renameLimit"] = 100
+        assert _feature_changes() == {"inserts": 500, "deletes": 500}
+
+
 def test_meta_updates(data_working_copy, cli_runner):
     with data_working_copy("meta-updates") as (repo_path, wc_path):
         # These commits have minor schema changes.
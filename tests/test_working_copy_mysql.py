@@ -361,6 +361,72 @@ def test_values_roundtrip(data_archive, cli_runner, new_mysql_db_schema):
             assert r.exit_code == 0, r.stdout
 
 
+@pytest.mark.parametrize(
+    "load_data_enabled",
+    [
+        pytest.param(True, id="load-data"),
+        pytest.param(False, id="insert-fallback"),
+    ],
+)
+def test_checkout_bulk_load(
+    load_data_enabled, data_archive, cli_runner, new_mysql_db_schema, monkeypatch
+):
+    from kart.tabular.working_copy.mysql import WorkingCopy_MySql
+
+    if not load_data_enabled:
+        monkeypatch.setattr(
+            WorkingCopy_MySql, "_is_load_data_local_enabled", lambda self, sess: False
+        )
+
+    with data_archive("types") as repo_path:
+        repo = KartRepo(repo_path)
+        H.clear_working_copy()
+
+        with new_mysql_db_schema() as (mysql_url, mysql_schema):
+            repo.config["kart.workingcopy.location"] = mysql_url
+            r = cli_runner.invoke(["checkout", "2d-geometry-only"])
+            assert r.exit_code == 0, r.stderr
+
+            with repo.working_copy.tabular.session() as sess:
+                # We don't diff values unless they're marked as dirty in the WC - move the row to make it dirty.
+                sess.execute(f'UPDATE {mysql_schema}.manytypes SET "PK"="PK" + 1000;')
+                sess.execute(f'UPDATE {mysql_schema}.manytypes SET "PK"="PK" - 1000;')
+
+            r = cli_runner.invoke(["diff", "--exit-code"])
+            assert r.exit_code == 0, r.stdout
+
+
+def test_load_data_fails_on_conversion_warnings(
+    data_archive, cli_runner, new_mysql_db_schema
+):
+    # LOAD DATA LOCAL INFILE only warns about values that can't be converted - make sure we fail instead.
+    with data_archive("points") as repo_path:
+        repo = KartRepo(repo_path)
+        H.clear_working_copy()
+
+        with new_mysql_db_schema() as (mysql_url, mysql_schema):
+            r = cli_runner.invoke(["create-workingcopy", mysql_url])
+            assert r.exit_code == 0, r.stderr
+
+            table_wc = repo.working_copy.tabular
+            with table_wc.session() as sess:
+                if not table_wc._is_load_data_local_enabled(sess):
+                    pytest.skip("LOAD DATA LOCAL INFILE is disabled on the server")
+
+            dataset = repo.datasets()[H.POINTS.LAYER]
+            # t50_fid is a 32 bit integer column.
+            feature = {**H.POINTS.RECORD, "t50_fid": 2**40}
+            with pytest.raises(RuntimeError, match="Out of range"):
+                with table_wc.session() as sess:
+                    table_wc._write_all_features(sess, dataset, [feature])
+
+            with table_wc.session() as sess:
+                count = sess.scalar(
+                    f"SELECT COUNT(*) FROM {mysql_schema}.{H.POINTS.LAYER};"
+                )
+                assert count == H.POINTS.ROWCOUNT
+
+
 def test_meta_updates(data_archive, cli_runner, new_mysql_db_schema):
     with data_archive("meta-updates"):
         H.clear_working_copy()
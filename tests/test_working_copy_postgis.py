@@ -6,7 +6,7 @@ from sqlalchemy import inspect
 
 from kart.repo import KartRepo
 
-from kart.tabular.working_copy.base import TableWorkingCopyStatus
+from kart.tabular.working_copy.base import TableWorkingCopy, TableWorkingCopyStatus
 from kart.sqlalchemy import strip_password
 from kart.sqlalchemy.adapter.postgis import KartAdapter_Postgis
 from test_working_copy import compute_approximated_types
@@ -540,6 +540,125 @@ def test_values_roundtrip(data_archive, cli_runner, new_postgis_db_schema):
             assert r.exit_code == 0, r.stdout
 
 
+def test_copy_escaped_values_roundtrip(data_archive, cli_runner, new_postgis_db_schema):
+    # Features are written to a new working copy using COPY ... FROM STDIN, which has its own escaping rules.
+    awkward_name = "tab\there\nnewline\\backslash\\N"
+    with data_archive("points") as repo_path:
+        repo = KartRepo(repo_path)
+        H.clear_working_copy()
+
+        with new_postgis_db_schema() as (postgres_url, postgres_schema):
+            r = cli_runner.invoke(["create-workingcopy", postgres_url])
+            assert r.exit_code == 0, r.stderr
+
+            with repo.working_copy.tabular.session() as sess:
+                sess.execute(
+                    f"UPDATE {postgres_schema}.{H.POINTS.LAYER} SET name = :name WHERE fid = 1;",
+                    {"name": awkward_name},
+                )
+                sess.execute(
+                    f"UPDATE {postgres_schema}.{H.POINTS.LAYER} SET name = NULL WHERE fid = 2;"
+                )
+            r = cli_runner.invoke(["commit", "-m", "awkward values"])
+            assert r.exit_code == 0, r.stderr
+
+            r = cli_runner.invoke(
+                ["create-workingcopy", postgres_url, "--delete-existing"]
+            )
+            assert r.exit_code == 0, r.stderr
+
+            with repo.working_copy.tabular.session() as sess:
+                rows = sess.execute(
+                    f"SELECT fid, name FROM {postgres_schema}.{H.POINTS.LAYER} WHERE fid IN (1, 2) ORDER BY fid;"
+                ).fetchall()
+                assert [tuple(row) for row in rows] == [(1, awkward_name), (2, None)]
+                assert (
+                    sess.scalar(
+                        f"SELECT COUNT(*) FROM {postgres_schema}.{H.POINTS.LAYER};"
+                    )
+                    == H.POINTS.ROWCOUNT
+                )
+
+            r = cli_runner.invoke(["diff", "--exit-code"])
+            assert r.exit_code == 0, r.stdout
+
+
+def test_restore_bulk_replace_tracks_changes(
+    data_archive, cli_runner, new_postgis_db_schema, monkeypatch
+):
+    # Restoring enough rows replaces them using COPY ... FROM STDIN, which fires the tracking trigger for each row
+    # just like INSERT does. The changes tracked must be the same as when the rows are replaced one at a time.
+    with data_archive("points") as repo_path:
+        repo = KartRepo(repo_path)
+        H.clear_working_copy()
+
+        with new_postgis_db_schema() as (postgres_url, postgres_schema):
+            r = cli_runner.invoke(["create-workingcopy", postgres_url])
+            assert r.exit_code == 0, r.stderr
+            table_wc = repo.working_copy.tabular
+
+            tracked = []
+            for bulk_replace_min_features in (1_000_000, 1):
+                monkeypatch.setattr(
+                    TableWorkingCopy,
+                    "BULK_REPLACE_MIN_FEATURES",
+                    bulk_replace_min_features,
+                )
+                r = cli_runner.invoke(["restore", "-s", "HEAD^"])
+                assert r.exit_code == 0, r.stderr
+                r = cli_runner.invoke(["diff", "HEAD^", "--exit-code"])
+                assert r.exit_code == 0, r.stdout
+                with table_wc.session() as sess:
+                    tracked.append(
+                        sess.execute(
+                            f"SELECT table_name, pk FROM {table_wc.KART_TRACK} ORDER BY pk;"
+                        ).fetchall()
+                    )
+
+                # The tracking trigger is suspended while discarding the changes.
+                r = cli_runner.invoke(["restore"])
+                assert r.exit_code == 0, r.stderr
+                assert not table_wc.is_dirty()
+                with table_wc.session() as sess:
+                    assert not sess.scalar(
+                        f"SELECT COUNT(*) FROM {table_wc.KART_TRACK};"
+                    )
+
+            assert tracked[0]
+            assert tracked[0] == tracked[1]
+
+
+@pytest.mark.parametrize("concurrent_writes", [1, 2])
+def test_checkout_datasets_concurrently(
+    concurrent_writes, data_archive, cli_runner, new_postgis_db_schema
+):
+    with data_archive("empty-geometry") as repo_path:
+        repo = KartRepo(repo_path)
+        H.clear_working_copy()
+        repo.config["kart.workingcopy.concurrentWrites"] = concurrent_writes
+
+        with new_postgis_db_schema() as (postgres_url, postgres_schema):
+            r = cli_runner.invoke(["create-workingcopy", postgres_url])
+            assert r.exit_code == 0, r.stderr
+
+            table_wc = repo.working_copy.tabular
+            assert table_wc.get_tree_id() == repo.head_tree.hex
+            with table_wc.session() as sess:
+                for table in ("point_test", "polygon_test"):
+                    assert sess.scalar(
+                        f"SELECT COUNT(*) FROM {postgres_schema}.{table};"
+                    )
+
+            r = cli_runner.invoke(["diff", "--exit-code"])
+            assert r.exit_code == 0, r.stdout
+
+            # Recreating the working copy writes every dataset again.
+            r = cli_runner.invoke(["create-workingcopy", "--delete-existing"])
+            assert r.exit_code == 0, r.stderr
+            r = cli_runner.invoke(["diff", "--exit-code"])
+            assert r.exit_code == 0, r.stdout
+
+
 def test_empty_geometry_roundtrip(data_archive, cli_runner, new_postgis_db_schema):
     with data_archive("empty-geometry") as repo_path:
         repo = KartRepo(repo_path)
@@ -673,3 +673,60 @@ def test_checkout_large_geometry(
                 ]
             )
             assert r.exit_code == 0, r.stderr
+
+
+def test_checkout_in_several_staging_chunks(
+    data_archive, cli_runner, new_sqlserver_db_schema, monkeypatch
+):
+    from kart.tabular.working_copy.sqlserver import WorkingCopy_SqlServer
+
+    monkeypatch.setattr(WorkingCopy_SqlServer, "STAGING_CHUNK_SIZE", 500)
+
+    with data_archive("points") as repo_path:
+        repo = KartRepo(repo_path)
+        H.clear_working_copy()
+
+        with new_sqlserver_db_schema() as (sqlserver_url, sqlserver_schema):
+            r = cli_runner.invoke(["create-workingcopy", sqlserver_url])
+            assert r.exit_code == 0, r.stderr
+
+            with repo.working_copy.tabular.session() as sess:
+                count = sess.scalar(
+                    f"SELECT COUNT(*) FROM {sqlserver_schema}.{H.POINTS.LAYER};"
+                )
+                assert count == H.POINTS.ROWCOUNT
+                # The staging table is only used during the checkout.
+                assert sess.scalar("SELECT OBJECT_ID('tempdb..#kart_staging');") is None
+
+                sess.execute(
+                    f"UPDATE {sqlserver_schema}.{H.POINTS.LAYER} SET fid = fid + 10000;"
+                )
+                sess.execute(
+                    f"UPDATE {sqlserver_schema}.{H.POINTS.LAYER} SET fid = fid - 10000;"
+                )
+
+            r = cli_runner.invoke(["diff", "--exit-code"])
+            assert r.exit_code == 0, r.stdout
+
+
+def test_staging_input_sizes():
+    pyodbc = pytest.importorskip("pyodbc")
+    from kart.tabular.working_copy.sqlserver import _staging_input_sizes
+
+    input_types = [None, ("NVARCHAR", 64), ("VARBINARY", None), ("NVARCHAR", None)]
+    rows = [(1, "2020-01-01", b"\x01" * 100, "abc"), (2, None, None, "\U0001F600")]
+    assert _staging_input_sizes(rows, input_types) == [
+        None,
+        (pyodbc.SQL_WVARCHAR, 64, 0),
+        (pyodbc.SQL_VARBINARY, 100, 0),
+        (pyodbc.SQL_WVARCHAR, 3, 0),
+    ]
+
+    # Chunks with values too long for a bounded type are left for pyodbc to send as (max) values.
+    rows.append((3, None, b"\x01" * 8001, "x" * 4001))
+    assert _staging_input_sizes(rows, input_types) == [
+        None,
+        (pyodbc.SQL_WVARCHAR, 64, 0),
+        None,
+        None,
+    ]